@@ -1,157 +1,471 @@
-import time
-from collections import deque, Counter
-
-import cv2
-from ultralytics import YOLO
-
-# =========================
-# CONFIG
-# =========================
-MODEL_PATH = "best.pt"
-CAMERA_INDEX = 0          # 0 suele ser la webcam principal
-IMGSZ = 512
-CONF = 0.7              # súbelo si da falsos positivos (0.5-0.7). bájalo si no detecta (0.25-0.4)
-IOU = 0.5
-DEVICE = "cpu"              # "0" = GPU NVIDIA, "cpu" = sin GPU
-
-# Estabilidad (para que no “parpadee” el nombre)
-HISTORY = 12              # frames a considerar
-MIN_HITS = 7              # mínimo de frames (de HISTORY) con la misma carta para “confirmar”
-COOLDOWN_S = 1.0          # segundos para volver a anunciar otra carta
-
-# Voz (opcional)
-USE_TTS = True            # si no instalaste pyttsx3, ponlo en False
-DEBUG_FRAMES = True       # imprime info de cada frame para diagnosticar
-
-
-def _init_tts():
-    if not USE_TTS:
-        return None
-    try:
-        import pyttsx3
-        engine = pyttsx3.init()
-        engine.setProperty("rate", 175)
-        return engine
-    except Exception:
-        print("[AVISO] No pude iniciar TTS (pyttsx3). Sigo solo con texto.")
-        return None
-
-
-def main():
-    model = YOLO(MODEL_PATH)
-    names = model.names  # {id: "clase"}
-
-    # Mapeo solicitado: traducir ciertas etiquetas numéricas a nombres de lotería
-    rename_map = {
-        "2": "melon",
-        "0": "catrin",
-        "4": "paraguas",
-        "7": "escaleras",
-        "5": "soldado",
-        "8": "muerte",
-        "9": "rosa"
-    }
-
-    tts = _init_tts()
-    last_spoken = None
-    last_spoken_time = 0.0
-
-    hist = deque(maxlen=HISTORY)
-
-    cap = cv2.VideoCapture(CAMERA_INDEX)  # Sin CAP_DSHOW en Mac
-    if not cap.isOpened():
-        raise RuntimeError(f"No pude abrir la cámara index={CAMERA_INDEX}. Prueba 0, 1, 2...")
-
-    # Opcional: fija resolución (si tu cámara lo soporta)
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-
-    print("Presiona 'q' para salir.")
-
-    while True:
-        ok, frame = cap.read()
-        if not ok:
-            print("No pude leer frame de cámara.")
-            break
-
-        # Inferencia
-        results = model.predict(
-            source=frame,
-            imgsz=IMGSZ,
-            conf=CONF,
-            iou=IOU,
-            device=DEVICE,
-            verbose=False
-        )
-        r = results[0]
-
-        detected_label = None
-        detected_conf = None
-
-        if r.boxes is not None and len(r.boxes) > 0:
-            confs = r.boxes.conf.detach().cpu().numpy()
-            clss = r.boxes.cls.detach().cpu().numpy()
-            best_i = int(confs.argmax())
-            detected_conf = float(confs[best_i])
-            raw_label = names[int(clss[best_i])]
-            detected_label = rename_map.get(raw_label, raw_label)
-
-        hist.append(detected_label)
-
-        # Decide etiqueta “estable”
-        stable = None
-        counts = Counter([x for x in hist if x is not None])
-        if counts:
-            label, hits = counts.most_common(1)[0]
-            if hits >= MIN_HITS:
-                stable = label
-
-        if DEBUG_FRAMES:
-            print(f"[DEBUG] detected={detected_label} stable={stable} counts={dict(counts)} hist_len={len(hist)}")
-
-        # Render con cajas
-        annotated = r.plot()  # dibuja bounding boxes y labels del modelo
-
-        # Texto grande arriba
-        display_text = stable if stable is not None else "..."
-        cv2.putText(
-            annotated,
-            f"Carta: {display_text}",
-            (20, 50),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            1.2,
-            (255, 255, 255),
-            3,
-            cv2.LINE_AA
-        )
-
-        # Anunciar cuando cambie de carta (y está estable)
-        now = time.time()
-        # Hablar cuando haya una carta estable nueva o cuando haya pasado el cooldown aunque sea distinta.
-        if stable is not None and (stable != last_spoken) and (now - last_spoken_time) >= COOLDOWN_S:
-            msg = f"Detectada: {stable}"
-            if detected_conf is not None:
-                msg += f" (conf {detected_conf:.2f})"
-            print(msg)
-
-            if tts is not None:
-                try:
-                    tts.say(stable)
-                    tts.runAndWait()
-                except Exception:
-                    pass
-
-            last_spoken = stable
-            last_spoken_time = now
-
-        cv2.imshow("Loteria YOLO - Cam", annotated)
-        key = cv2.waitKey(1) & 0xFF
-        if key == ord("q") or key == 27:  # q o ESC
-            break
-
-    cap.release()
-    cv2.destroyAllWindows()
-
-
-if __name__ == "__main__":
-    main()
+import sys
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from config_captura import COOLDOWN_S, MOTION_GATE, MOTION_MAX_SKIP_S, MOTION_THRESHOLD, make_card_stabilizer
+from detector import Detections, Detector
+from pipeline import LatestSlot, StageStats
+from speech import SpeechWorker
+from motion import MotionGate
+from tracker import CardTracker
+
+# =========================
+# CONFIG
+# =========================
+MODEL_PATH = "best.pt"
+CAMERA_INDEX = 0          # 0 suele ser la webcam principal
+IMGSZ = 512
+CONF = 0.7              # súbelo si da falsos positivos (0.5-0.7). bájalo si no detecta (0.25-0.4)
+IOU = 0.5
+DEVICE = "cpu"              # "0" = GPU NVIDIA, "cpu" = sin GPU
+BACKEND = "torch"         # "torch", "onnx" u "openvino" (los dos últimos son mucho más rápidos en CPU)
+INT8 = False              # onnx/openvino: cuantizar a int8 (necesita CALIB_DIR)
+CALIB_DIR = None          # carpeta con frames de la cámara para calibrar int8
+
+# Estabilidad, cooldown y motion gate: en config_captura.py (los comparte la captura continua de app.py)
+
+# Tracking (varias cartas a la vez, cada una con su id)
+TRACKING = True           # False = sólo la caja más segura por frame, como antes
+DETECT_EVERY_N = 3        # YOLO corre 1 de cada N frames; en los demás el tracker extrapola las cajas
+TRACK_IOU = 0.3           # traslape mínimo para asociar una detección con un track
+TRACK_MAX_MISSES = 3      # corridas de YOLO sin ver la carta antes de borrar su track
+
+# ROI: con la carta confirmada, inferir sólo alrededor de ella
+ROI_MODE = True
+ROI_IMGSZ = 256           # imgsz para el recorte (vs IMGSZ para el frame completo)
+ROI_PAD = 0.5             # margen alrededor de la caja, en fracción de su lado mayor
+ROI_MAX_FRACTION = 0.5    # si el recorte cubre más que esto del frame, no vale la pena
+ROI_EDGE_PX = 4           # una caja a menos de esto del borde del recorte = la carta se está saliendo
+ROI_FULL_EVERY = 10       # cada tantas corridas de YOLO, una con frame completo para ver cartas nuevas
+
+# Voz (opcional)
+USE_TTS = True            # si no instalaste pyttsx3, ponlo en False
+PRERENDER_TTS = True      # pre-sintetiza un clip por carta al arrancar (anunciar = sólo reproducir)
+TTS_CACHE_DIR = ".tts_cache"
+DEBUG_FRAMES = True       # imprime info de cada frame para diagnosticar
+
+# Pipeline (captura -> inferencia -> display en hilos separados)
+PIPELINE = True           # False = modo clásico, todo en un solo hilo
+STATS_EVERY_S = 2.0       # cada cuánto imprimir FPS / cola de cada etapa
+
+def _init_tts(names):
+    if not USE_TTS:
+        return None
+
+    labels = []
+    if PRERENDER_TTS:
+        labels = names   # ya vienen con RENAME_MAP aplicado (ver detector.canonical_names)
+    # La voz corre en su propio hilo: el loop de detección nunca espera al audio
+    return SpeechWorker(rate=175, prerender=labels, cache_dir=TTS_CACHE_DIR)
+
+
+def _open_camera():
+    cap = cv2.VideoCapture(CAMERA_INDEX)  # Sin CAP_DSHOW en Mac
+    if not cap.isOpened():
+        raise RuntimeError(f"No pude abrir la cámara index={CAMERA_INDEX}. Prueba 0, 1, 2...")
+
+    # Opcional: fija resolución (si tu cámara lo soporta)
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+    return cap
+
+
+def _label(names, cls_id):
+    return None if cls_id is None else names[cls_id]
+
+
+class _Announcer:
+    """Recuerda qué carta se anunció y cuándo, para respetar COOLDOWN_S."""
+
+    def __init__(self, speech):
+        self.speech = speech
+        self.last_spoken = None
+        self.last_spoken_time = 0.0
+        self.announced_tracks = set()   # ids de track que ya se anunciaron
+
+    def update(self, stable, detected_conf):
+        now = time.time()
+        # Hablar cuando haya una carta estable nueva o cuando haya pasado el cooldown aunque sea distinta.
+        if stable is None or stable == self.last_spoken or (now - self.last_spoken_time) < COOLDOWN_S:
+            return False
+
+        msg = f"Detectada: {stable}"
+        if detected_conf is not None:
+            msg += f" (conf {detected_conf:.2f})"
+        print(msg)
+
+        if self.speech is not None:
+            self.speech.say(stable)
+
+        self.last_spoken = stable
+        self.last_spoken_time = now
+        return True
+
+
+# Resultado de un paso de inferencia (todo en coordenadas del frame completo)
+FrameResult = namedtuple("FrameResult", "frame dets best_id best_conf stable_id tracks roi")
+
+
+class _Inference:
+    """
+    Paso de inferencia + votación por frame.
+
+    - Con TRACKING, YOLO sólo corre cada DETECT_EVERY_N frames y en los demás
+      el tracker mueve las cajas.
+    - Con MOTION_GATE, si la escena no cambió se reusan las últimas detecciones.
+    - Con ROI_MODE, una vez confirmada la carta se infiere sólo sobre un recorte
+      alrededor de ella (a ROI_IMGSZ) y se regresa a frame completo si se sale.
+    """
+
+    def __init__(self, detector):
+        self.detector = detector
+        self.names = detector.names
+        self.tracker = None
+        if TRACKING:
+            self.tracker = CardTracker(
+                lambda: make_card_stabilizer(detector.names),
+                iou_threshold=TRACK_IOU,
+                max_misses=TRACK_MAX_MISSES,
+            )
+        self.stabilizer = make_card_stabilizer(detector.names)   # sin TRACKING: una sola carta
+        self.gate = MotionGate(MOTION_THRESHOLD, MOTION_MAX_SKIP_S) if MOTION_GATE else None
+        self.last_dets = None
+        self.roi = None             # recorte usado en la última inferencia (x1, y1, x2, y2)
+        self._locked = None         # (clases confirmadas, caja que las cubre)
+        self.frames = 0
+        self.detector_runs = 0
+        self.roi_runs = 0
+        self.roi_fallbacks = 0
+
+    def step(self, frame):
+        detector_turn = self.tracker is None or self.frames % DETECT_EVERY_N == 0
+        self.frames += 1
+
+        dets = None
+        if detector_turn:
+            if self.last_dets is None or self.gate is None or self.gate.should_run(frame):
+                dets = self._detect(frame)
+                self.last_dets = dets
+                self.detector_runs += 1
+            else:
+                # Escena sin cambios: las mismas detecciones siguen votando
+                dets = self.last_dets
+
+        if self.tracker is not None:
+            tracks = self.tracker.update(*dets) if dets is not None else self.tracker.predict()
+            confirmed = [t for t in tracks if t.stable_id is not None]
+            self._lock([t.stable_id for t in confirmed], [t.box for t in confirmed])
+            return FrameResult(frame, dets, None, None, None, tracks, self.roi)
+
+        # Decide etiqueta “estable”
+        best_id, best_conf, best_box = self.detector.best(dets)
+        stable_id = self.stabilizer.update(best_id, best_conf or 0.0)
+        if stable_id is None:
+            self._lock([], [])
+        elif best_id == stable_id:
+            self._lock([stable_id], [best_box])
+
+        if DEBUG_FRAMES:
+            counts = {_label(self.names, c): v for c, v in self.stabilizer.snapshot().items()}
+            print(f"[DEBUG] detected={_label(self.names, best_id)} stable={_label(self.names, stable_id)} "
+                  f"counts={counts} roi={self.roi}")
+
+        return FrameResult(frame, dets, best_id, best_conf, stable_id, None, self.roi)
+
+    # -------------------------
+    # Región de interés
+    # -------------------------
+    def _lock(self, classes, boxes):
+        if not ROI_MODE:
+            return
+        if not classes:
+            self._locked = None
+            return
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        union = np.concatenate([boxes[:, :2].min(axis=0), boxes[:, 2:].max(axis=0)])
+        self._locked = (set(classes), union)
+
+    def _crop_rect(self, shape):
+        if self._locked is None:
+            return None
+        h, w = shape[:2]
+        x1, y1, x2, y2 = self._locked[1]
+        pad = ROI_PAD * max(x2 - x1, y2 - y1)
+        rect = (
+            max(int(x1 - pad), 0),
+            max(int(y1 - pad), 0),
+            min(int(x2 + pad), w),
+            min(int(y2 + pad), h),
+        )
+        area = (rect[2] - rect[0]) * (rect[3] - rect[1])
+        if area <= 0 or area > ROI_MAX_FRACTION * w * h:
+            return None   # el recorte ya no ahorra nada
+        return rect
+
+    def _roi_ok(self, xyxy, clss, rect, shape):
+        """Cada carta confirmada sigue en el recorte, sin tocar sus bordes (ya pasó el filtro de CONF)."""
+        h, w = shape[:2]
+        x1, y1, x2, y2 = rect
+        # Los bordes que coinciden con el del frame no cuentan como "salirse"
+        lo = np.array([x1 + ROI_EDGE_PX if x1 > 0 else -1, y1 + ROI_EDGE_PX if y1 > 0 else -1], np.float32)
+        hi = np.array([x2 - ROI_EDGE_PX if x2 < w else w + 1, y2 - ROI_EDGE_PX if y2 < h else h + 1], np.float32)
+        inside = (xyxy[:, :2] >= lo).all(axis=1) & (xyxy[:, 2:] <= hi).all(axis=1)
+        return all(bool((inside & (clss == c)).any()) for c in self._locked[0])
+
+    def _detect(self, frame):
+        rect = None
+        if ROI_MODE and self.detector_runs % ROI_FULL_EVERY != 0:
+            rect = self._crop_rect(frame.shape)
+        if rect is not None:
+            x1, y1, x2, y2 = rect
+            crop = np.ascontiguousarray(frame[y1:y2, x1:x2])
+            xyxy, confs, clss = self.detector.predict(crop, imgsz=ROI_IMGSZ)
+            xyxy = xyxy + np.array([x1, y1, x1, y1], dtype=np.float32)
+            if self._roi_ok(xyxy, clss, rect, frame.shape):
+                self.roi = rect
+                self.roi_runs += 1
+                return Detections(xyxy, confs, clss)
+            # La carta se salió del recorte o bajó de CONF: otra vez frame completo
+            self.roi_fallbacks += 1
+
+        self.roi = None
+        return self.detector.predict(frame)
+
+
+def _draw_box(img, box, text, color):
+    x1, y1, x2, y2 = (int(v) for v in box)
+    cv2.rectangle(img, (x1, y1), (x2, y2), color, 2)
+    cv2.putText(
+        img,
+        text,
+        (x1, max(y1 - 8, 15)),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        0.6,
+        color,
+        2,
+        cv2.LINE_AA
+    )
+
+
+def _draw_header(img, labels, roi):
+    if roi is not None:
+        cv2.rectangle(img, roi[:2], roi[2:], (255, 255, 0), 1)
+
+    # Texto grande arriba
+    display_text = ", ".join(labels) if labels else "..."
+    cv2.putText(
+        img,
+        f"Carta: {display_text}",
+        (20, 50),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        1.2,
+        (255, 255, 255),
+        3,
+        cv2.LINE_AA
+    )
+
+
+def _process(out, names, announcer):
+    """Render + anuncio de un resultado de _Inference. Regresa el frame anotado."""
+    if out.tracks is not None:
+        return _process_tracks(out, names, announcer)
+
+    # Render con cajas (sobre el frame actual, aunque las detecciones vengan del caché)
+    annotated = out.frame.copy()
+    for box, conf, cls_id in zip(*out.dets):
+        color = (0, 200, 0) if cls_id == out.stable_id else (0, 165, 255)
+        _draw_box(annotated, box, f"{_label(names, int(cls_id))} {conf:.2f}", color)
+
+    stable = _label(names, out.stable_id)
+    _draw_header(annotated, [stable] if stable is not None else [], out.roi)
+
+    # Anunciar cuando cambie de carta (y está estable)
+    announcer.update(stable, out.best_conf)
+    return annotated
+
+
+def _process_tracks(out, names, announcer):
+    """Dibuja cada track con su id y anuncia las cartas recién confirmadas."""
+    annotated = out.frame.copy()
+    confirmed = []
+
+    for t in out.tracks:
+        stable = _label(names, t.stable_id)
+        color = (0, 200, 0) if stable is not None else (0, 165, 255)
+        _draw_box(annotated, t.box, f"#{t.id} {stable or _label(names, t.cls_id)} {t.conf:.2f}", color)
+        if stable is not None:
+            confirmed.append(stable)
+            if t.id not in announcer.announced_tracks and (
+                    announcer.update(stable, t.conf) or stable == announcer.last_spoken):
+                announcer.announced_tracks.add(t.id)
+
+    if DEBUG_FRAMES:
+        print(f"[DEBUG] tracks={[(t.id, _label(names, t.cls_id), _label(names, t.stable_id)) for t in out.tracks]} "
+              f"roi={out.roi}")
+
+    _draw_header(annotated, confirmed, out.roi)
+    return annotated
+
+
+def _print_summary(inference):
+    print(f"[RESUMEN] frames={inference.frames} yolo={inference.detector_runs} "
+          f"(roi={inference.roi_runs}, roi->completo={inference.roi_fallbacks})")
+    if inference.gate is not None:
+        print(f"[MOTION] {inference.gate}")
+
+
+def _should_quit():
+    key = cv2.waitKey(1) & 0xFF
+    return key == ord("q") or key == 27  # q o ESC
+
+
+def _run_sequential(detector, cap, announcer):
+    names = detector.names  # [nombre canónico por id de clase]
+    inference = _Inference(detector)
+
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            print("No pude leer frame de cámara.")
+            break
+
+        # Inferencia
+        annotated = _process(inference.step(frame), names, announcer)
+
+        cv2.imshow("Loteria YOLO - Cam", annotated)
+        if _should_quit():
+            break
+
+    _print_summary(inference)
+
+
+# =========================
+# PIPELINE EN HILOS
+# =========================
+def _capture_worker(cap, frames, stats, stop):
+    """Lee la cámara lo más rápido que pueda; sólo el frame más nuevo sobrevive."""
+    while not stop.is_set():
+        ok, frame = cap.read()
+        if not ok:
+            print("No pude leer frame de cámara.")
+            break
+        frames.put((time.perf_counter(), frame))
+        stats.tick()
+    stop.set()
+    frames.close()
+
+
+def _inference_worker(inference, frames, results, stats, stop):
+    """Corre YOLO siempre sobre el frame más reciente disponible."""
+    while not stop.is_set():
+        item = frames.get(timeout=0.5)
+        if item is None:
+            if frames.closed:
+                break
+            continue
+        t_capture, frame = item
+        results.put((t_capture, inference.step(frame)))
+        stats.tick()
+    results.close()
+
+
+def _run_pipeline(detector, cap, announcer):
+    names = detector.names  # [nombre canónico por id de clase]
+    inference = _Inference(detector)
+
+    frames = LatestSlot()    # captura -> inferencia
+    results = LatestSlot()   # inferencia -> display
+    cap_stats = StageStats("captura")
+    inf_stats = StageStats("inferencia")
+    disp_stats = StageStats("display")
+    stop = threading.Event()
+
+    workers = [
+        threading.Thread(target=_capture_worker, args=(cap, frames, cap_stats, stop), daemon=True),
+        threading.Thread(target=_inference_worker, args=(inference, frames, results, inf_stats, stop), daemon=True),
+    ]
+    for w in workers:
+        w.start()
+
+    latency_ms = 0.0
+    last_report = time.perf_counter()
+
+    # El display se queda en el hilo principal (cv2.imshow lo exige en Mac)
+    while True:
+        item = results.get(timeout=0.03)
+        if item is None:
+            if results.closed or _should_quit():
+                break
+            continue
+
+        t_capture, out = item
+        annotated = _process(out, names, announcer)
+        latency_ms = (time.perf_counter() - t_capture) * 1000.0
+        disp_stats.tick()
+
+        cv2.putText(
+            annotated,
+            f"cam {cap_stats.fps:.0f} | yolo {inf_stats.fps:.1f} | fps {disp_stats.fps:.1f} | {latency_ms:.0f} ms",
+            (20, annotated.shape[0] - 20),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.6,
+            (0, 255, 255),
+            2,
+            cv2.LINE_AA
+        )
+        cv2.imshow("Loteria YOLO - Cam", annotated)
+
+        now = time.perf_counter()
+        if now - last_report >= STATS_EVERY_S:
+            print(
+                f"[PIPE] {cap_stats} (cola={frames.depth()}, tirados={frames.dropped}) | "
+                f"{inf_stats} (cola={results.depth()}, tirados={results.dropped}) | "
+                f"{disp_stats} | latencia={latency_ms:.0f}ms | yolo={inference.detector_runs}/{inference.frames} frames"
+                + (f" | {inference.gate}" if inference.gate is not None else "")
+            )
+            last_report = now
+
+        if _should_quit():
+            break
+
+    stop.set()
+    for w in workers:
+        w.join(timeout=2.0)
+    _print_summary(inference)
+
+
+def main():
+    if len(sys.argv) > 1:
+        # Con archivos (videos, fotos, carpetas o globs): modo por lotes sin ventana, ver vision_lote.py
+        import vision_lote
+        vision_lote.main()
+        return
+
+    # El export se hace una sola vez y queda en .export_cache/ junto a best.pt.
+    # Con ROI_MODE el modelo exportado necesita entrada dinámica (corre a IMGSZ y a ROI_IMGSZ).
+    detector = Detector(MODEL_PATH, BACKEND, IMGSZ, CONF, IOU, DEVICE,
+                        int8=INT8, calib_dir=CALIB_DIR, dynamic=ROI_MODE)
+    speech = _init_tts(detector.names)
+    announcer = _Announcer(speech)
+    cap = _open_camera()
+
+    print("Presiona 'q' para salir.")
+
+    try:
+        if PIPELINE:
+            _run_pipeline(detector, cap, announcer)
+        else:
+            _run_sequential(detector, cap, announcer)
+    finally:
+        cap.release()
+        cv2.destroyAllWindows()
+        if speech is not None:
+            speech.close()
+
+
+if __name__ == "__main__":
+    main()
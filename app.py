@@ -1,15 +1,32 @@
+import time
+
+# Antes de los imports: en la primera ejecución también cuentan (METRICAS=1 y arranque.py)
+inicio_rerun = time.perf_counter()
+
 import streamlit as st
-import cv2
-import numpy as np
-from ultralytics import YOLO
+from detector import Detector
+from inference_server import BatchingInferenceServer
+from narrative_store import NarrativeStore
+from audio_cache import AudioCache, audio_key
+from oraculo import generar_con_gemini, stream_con_gemini, limpiar_texto, prediccion_fallback, primer_pedazo
+from streaming import LecturaEnStreaming, ReproductorProgresivo
+from upstream import CircuitOpen, Upstream, pooled_httpx_client
+from narrativa_local import Carrera
+from captura_continua import CapturaContinua, FuenteLocal
+from phash_cache import PHashCache, miniatura, phash
+from preproceso import Preproceso
 from textwrap import dedent
+from cartas import SIGNIFICADOS, DESCRIPCIONES
 import logging
-from google import genai
-from elevenlabs.client import ElevenLabs
-from elevenlabs import VoiceSettings
 import os
 from dotenv import load_dotenv
 import random
+import threading
+import mp3
+import metricas
+import arranque
+
+arranque.iniciar(inicio_rerun)
 
 load_dotenv()
 
@@ -38,9 +55,51 @@ if not ELEVENLABS_API_KEY or not GEMINI_API_KEY:
     st.stop()
 
 
-# Configurar clientes
-client_gemini = genai.Client(api_key=GEMINI_API_KEY)
-client_eleven = ElevenLabs(api_key=ELEVENLABS_API_KEY)
+# Configurar clientes (las URLs base permiten apuntar a los servidores falsos de tools/fake_upstreams.py)
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+ELEVENLABS_BASE_URL = os.getenv("ELEVENLABS_BASE_URL")
+# Deadline por llamada (con reintentos); al vencer se usa el fallback
+GEMINI_DEADLINE_S = float(os.getenv("GEMINI_DEADLINE_S", "12"))
+ELEVEN_DEADLINE_S = float(os.getenv("ELEVEN_DEADLINE_S", "20"))
+# Tope para la narrativa: si Gemini no contestó en este tiempo se usa la local (narrativa_local.py)
+NARRATIVA_DEADLINE_S = float(os.getenv("NARRATIVA_DEADLINE_S", "4"))
+# Duplicar la llamada si tarda más que el p95 (ElevenLabs cobra por caracter: apagado por defecto)
+UPSTREAM_HEDGE = os.getenv("UPSTREAM_HEDGE", "0") == "1"
+
+
+# Un juego de clientes por proceso: las conexiones keep-alive se reusan entre
+# sesiones y reruns, y el breaker/los histogramas ven todo el tráfico
+@st.cache_resource(show_spinner=False)
+def load_upstreams():
+    return (
+        Upstream("gemini", deadline_s=GEMINI_DEADLINE_S, hedge=UPSTREAM_HEDGE),
+        Upstream("elevenlabs", deadline_s=ELEVEN_DEADLINE_S, hedge=UPSTREAM_HEDGE),
+    )
+
+upstream_gemini, upstream_eleven = load_upstreams()
+
+
+# Los SDKs se importan hasta que hacen falta (google-genai y elevenlabs son
+# ~1.2 s de imports que ya no paga la primera página); precargar_en_fondo()
+# los crea en segundo plano en cuanto el modelo está listo
+@st.cache_resource(show_spinner=False)
+def cliente_gemini():
+    from google import genai
+
+    options = {"timeout": int(GEMINI_DEADLINE_S * 1000)}   # en ms
+    if GEMINI_BASE_URL:
+        options["base_url"] = GEMINI_BASE_URL
+    return genai.Client(api_key=GEMINI_API_KEY, http_options=options)
+
+
+@st.cache_resource(show_spinner=False)
+def cliente_eleven():
+    from elevenlabs.client import ElevenLabs
+
+    kwargs = {"httpx_client": pooled_httpx_client(ELEVEN_DEADLINE_S), "timeout": ELEVEN_DEADLINE_S}
+    if ELEVENLABS_BASE_URL:
+        kwargs["base_url"] = ELEVENLABS_BASE_URL
+    return ElevenLabs(api_key=ELEVENLABS_API_KEY, **kwargs)
 
 logging.basicConfig(
     level=logging.INFO, 
@@ -48,84 +107,222 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@st.cache_data(show_spinner=False, ttl=3600)
+# Narrativas guardadas en disco, compartidas entre procesos y reinicios
+# (se pueden pre-generar todas con `python narrative_store.py pregen`)
+@st.cache_resource
+def load_narrative_store():
+    return NarrativeStore()
+
+
+# Carrera Gemini vs. narrativa local, compartida para contar qué fuente gana
+@st.cache_resource
+def load_carrera():
+    return Carrera(NARRATIVA_DEADLINE_S)
+
+
+def _gemini_con_log(fn, *args):
+    try:
+        return fn(*args)
+    except CircuitOpen:
+        logger.warning("⚡ Gemini con el circuito abierto, uso el fallback")
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error Gemini: {e}")
+        raise
+
+
+@metricas.medido("narrativa")
 def generar_prediccion_ia(c1, c2, c3):
     """
     Genera una historia coherente y fluida conectando las 3 cartas.
+    Primero busca en el almacén; si no hay nada le da a Gemini hasta
+    NARRATIVA_DEADLINE_S y si no, usa la narrativa local.
     """
-    logger.info(f"🤖 Generando narrativa para: {c1} -> {c2} -> {c3}")
-    
-    # PROMPT DE INGENIERÍA NARRATIVA
-    # El truco aquí es pedirle que actúe como un personaje y prohibirle estructuras rígidas.
-    prompt = f"""
-    Actúa como un brujo místico de feria mexicana, sabio pero con jerga de barrio.
-    
-    Tienes 3 cartas de la lotería que representan la línea temporal de una persona:
-    1. PASADO (Causa): {c1}
-    2. PRESENTE (Situación actual): {c2}
-    3. FUTURO (Consecuencia/Advertencia): {c3}
-    
-    TU TAREA:
-    Escribe UNA SOLA predicción de máximo 100 palabras que conecte estas tres cartas en una historia fluida.
-    
-    REGLAS DE ORO:
-    - NO empieces las oraciones con "Tu pasado fué", "Tu presente es" o "Tu futuro será". Usa conectores como "antes", "ahorita", "por eso", "así que aguas".
-    - NO hagas listas. Debe ser un párrafo corrido.
-    - Menciona las cartas por su nombre.
-    - Tono: Divertido, místico.
-    - Termina con una advertencia o consejo contundente basado en la tercera carta.
-    - Crea historias coherentes.
-    Ejemplo de estilo deseado:
-    "Uy, se ve que el Apache te trajo problemas, y aunque ahorita el Gallo te tiene muy despierto y movido, bájale dos rayitas porque la Sirena te quiere endulzar el oído con mentiras."
-    """
-    
-    try:
-        response = client_gemini.models.generate_content(
-            model='gemini-2.5-flash', 
-            contents=prompt,
-            config={'temperature': 1.0} # Alta temperatura para más creatividad
-        )
-        
-        texto = response.text.strip()
-        # Limpieza extra
-        texto = texto.replace('"', '').replace('*', '')
+    store = load_narrative_store()
+    texto = store.get(c1, c2, c3)
+    if texto is not None:
+        logger.info(f"📚 Narrativa del almacén para: {c1} -> {c2} -> {c3}")
         return texto
 
+    logger.info(f"🤖 Generando narrativa para: {c1} -> {c2} -> {c3}")
+    # Una respuesta sin texto levanta RespuestaVacia en generar_con_gemini: gana la local y no se guarda
+    texto, fuente = load_carrera().correr(
+        lambda: _gemini_con_log(upstream_gemini.call, generar_con_gemini, cliente_gemini(), c1, c2, c3),
+        lambda: prediccion_fallback(c1, c2, c3),
+        # Lo que Gemini mande tarde se guarda para la próxima vez
+        al_llegar_tarde=lambda tarde: store.add(c1, c2, c3, tarde),
+    )
+    if fuente == "remota":
+        store.add(c1, c2, c3, texto)
+    else:
+        logger.warning(f"⏱️ Narrativa local ({fuente}) para: {c1} -> {c2} -> {c3}")
+    return texto
+
+
+def fragmentos_prediccion(c1, c2, c3):
+    """La predicción en pedazos: del almacén de una sola vez, o de Gemini conforme la va escribiendo."""
+    store = load_narrative_store()
+    texto = store.get(c1, c2, c3)
+    if texto is not None:
+        logger.info(f"📚 Narrativa del almacén para: {c1} -> {c2} -> {c3}")
+        yield texto
+        return
+
+    logger.info(f"🤖 Generando narrativa (streaming) para: {c1} -> {c2} -> {c3}")
+    stream = upstream_gemini.stream(stream_con_gemini, cliente_gemini(), c1, c2, c3)
+
+    def completar_tarde(primero):
+        # El primer pedazo llegó después del deadline: se termina de leer y se guarda
+        store.add(c1, c2, c3, limpiar_texto(primero + "".join(stream)))
+
+    # El deadline cubre hasta el primer pedazo; después el texto fluye a su ritmo
+    primero, fuente = load_carrera().correr(
+        # Un stream vacío (bloqueado) levanta RespuestaVacia: gana la local y no se guarda nada
+        lambda: _gemini_con_log(primer_pedazo, stream),
+        lambda: prediccion_fallback(c1, c2, c3),
+        al_llegar_tarde=completar_tarde,
+    )
+    if fuente != "remota":
+        logger.warning(f"⏱️ Narrativa local ({fuente}) para: {c1} -> {c2} -> {c3}")
+        yield primero
+        return
+
+    partes = [primero]
+    yield primero
+    try:
+        for delta in stream:
+            partes.append(delta)
+            yield delta
     except Exception as e:
-        logger.error(f"❌ Error Gemini: {e}")
-        # Fallback genérico pero fluido
-        return f"Vaya combinación. El {c1} dejó huella, ahora el {c2} marca tu paso, ¡pero cuidado con el {c3} que viene fuerte!"
+        logger.error(f"❌ Error Gemini a media lectura: {e}")
+        return
+    store.add(c1, c2, c3, limpiar_texto("".join(partes)))
+
 
-@st.cache_data(show_spinner=False)
-def texto_a_audio_elevenlabs(texto_prediccion):
+PAUSA_INTRO_S = 0.5
+# Reproducir la intro en cuanto se abre el modal, mientras se genera la predicción
+INTRO_ANTICIPADA = os.getenv("INTRO_ANTICIPADA", "0") == "1"
+# Mostrar el texto conforme llega de Gemini y decirlo por oraciones (ver streaming.py)
+ORACULO_STREAMING = os.getenv("ORACULO_STREAMING", "0") == "1"
+# Valor inicial del interruptor "3 cartas en una sola foto"
+TRES_EN_UNA = os.getenv("TRES_EN_UNA", "0") == "1"
+# Cámara continua (captura_continua.py): las cartas se capturan solas al estabilizarse.
+# CAMARA_FUENTE usa una webcam/video/carpeta del servidor en lugar del navegador (para pruebas)
+CAMARA_CONTINUA = os.getenv("CAMARA_CONTINUA", "0") == "1"
+CAMARA_FUENTE = os.getenv("CAMARA_FUENTE")
+CAMARA_FPS = float(os.getenv("CAMARA_FPS", "5"))     # inferencias por segundo por sesión, como tope
+# El modelo se carga y calienta en un hilo mientras la página ya se muestra (ver arranque.py)
+MODELO_EN_FONDO = os.getenv("MODELO_EN_FONDO", "1") == "1"
+CALENTAR_VECES = int(os.getenv("CALENTAR_VECES", "2"))   # inferencias de calentamiento con una foto falsa
+
+# Voz y settings de ElevenLabs (también forman parte de la llave del caché de audio)
+VOZ_ELEVEN = {
+    "voice_id": "TX3LPaxmHKxFdv7VOQHJ",  # Arnold (Voz profunda/mística)
+    "model_id": "eleven_v3",
+    "output_format": "mp3_44100_128",
+}
+# Usamos settings probados para que suene expresivo pero estable
+VOICE_SETTINGS = {
+    "stability": 0.5,         # Un poco más bajo = más emoción/variación
+    "similarity_boost": 0.5,  # Mantiene la identidad de la voz
+    "style": 0.5,             # Estilo dramático moderado
+    "use_speaker_boost": True,
+}
+
+
+# Audio en disco compartido entre procesos, con LRU por bytes y un nivel en memoria
+@st.cache_resource
+def load_audio_cache():
+    return AudioCache(
+        directory=os.getenv("AUDIO_CACHE_DIR", ".audio_cache"),
+        max_bytes=int(float(os.getenv("AUDIO_CACHE_MAX_MB", "200")) * 1024 * 1024),
+        memory_bytes=int(float(os.getenv("AUDIO_CACHE_MEM_MB", "16")) * 1024 * 1024),
+    )
+
+
+def sintetizar_voz(texto):
+    """MP3 de `texto` con la voz del oráculo: del caché si ya existe, si no de ElevenLabs (y se guarda)."""
+    cache = load_audio_cache()
+    key = audio_key(texto, **VOZ_ELEVEN, **VOICE_SETTINGS)
+    audio_bytes = cache.get(key)
+    if audio_bytes is not None:
+        logger.info(f"💾 Voz del caché para: '{texto[:40]}...' {cache.stats()}")
+        return audio_bytes
+
+    logger.info(f"🎤 Generando voz para: '{texto[:40]}...'")
+    audio_bytes = upstream_eleven.call(_convertir_elevenlabs, texto)
+    cache.put(key, audio_bytes)
+    return audio_bytes
+
+
+def _convertir_elevenlabs(texto):
+    from elevenlabs import VoiceSettings
+
+    response = cliente_eleven().text_to_speech.convert(
+        #optimize_streaming_latency="0",
+        text=texto,
+        voice_settings=VoiceSettings(**VOICE_SETTINGS),
+        **VOZ_ELEVEN
+    )
+    return b"".join(response)
+
+
+def log_upstreams():
+    logger.info(f"📊 Gemini: {upstream_gemini.stats()} | ElevenLabs: {upstream_eleven.stats()} "
+                f"| Narrativa: {load_carrera().stats()}")
+
+
+# Lo que no pide la primera foto se prepara en segundo plano cuando el modelo
+# ya está listo (para no competir con él): los clientes de los SDKs y las
+# intros, que son fijas y se sintetizan una sola vez (quedan en el caché de
+# audio; por lectura sólo se sintetiza la predicción).
+@st.cache_resource
+def precargar_en_fondo(_carga_modelo):
+    def _render():
+        _carga_modelo.esperar()
+        for cliente in (cliente_gemini, cliente_eleven):
+            try:
+                cliente()
+            except Exception as e:
+                logger.warning(f"No pude crear el cliente {cliente.__name__}: {e}")
+        for intro in INTROS_DRAMATICAS:
+            try:
+                sintetizar_voz(intro)
+            except Exception as e:
+                logger.warning(f"No pude pre-sintetizar la intro '{intro}': {e}")
+    hilo = threading.Thread(target=_render, name="precarga", daemon=True)
+    hilo.start()
+    return hilo
+
+
+@metricas.medido("voz")
+def texto_a_audio_elevenlabs(texto_prediccion, intro=None):
     """
-    Genera audio natural uniendo una intro aleatoria + la predicción fluida.
+    Genera audio natural uniendo una intro (aleatoria si no se da) + la predicción fluida.
+    La intro viene pre-sintetizada; se pega con la predicción a nivel de frame MP3.
     """
     # 1. Seleccionamos una intro al azar para variedad
-    intro = random.choice(INTROS_DRAMATICAS)
+    if intro is None:
+        intro = random.choice(INTROS_DRAMATICAS)
     
     # 2. Unimos el texto completo
     texto_final = f"{intro} ... {texto_prediccion}"
-    
-    logger.info(f"🎤 Generando voz para: '{texto_final[:40]}...'")
-    
+
     try:
-        # Usamos settings probados para que suene expresivo pero estable
-        response = client_eleven.text_to_speech.convert(
-            voice_id="TX3LPaxmHKxFdv7VOQHJ", # Arnold (Voz profunda/mística)
-            #optimize_streaming_latency="0",
-            output_format="mp3_44100_128",
-            text=texto_final,
-            model_id="eleven_v3",
-            voice_settings=VoiceSettings(
-                stability=0.5,       # Un poco más bajo = más emoción/variación
-                similarity_boost=0.5, # Mantiene la identidad de la voz
-                style=0.5,           # Estilo dramático moderado
-                use_speaker_boost=True
-            )
-        )
-        audio_bytes = b"".join(response)
-        return audio_bytes, texto_final # Devolvemos también el texto para mostrarlo si quieres
+        intro_audio = sintetizar_voz(intro)
+        prediccion_audio = sintetizar_voz(texto_prediccion)
+        # El "..." de antes: una pausa corta entre la intro y la predicción
+        pausa = mp3.silence_like(prediccion_audio, PAUSA_INTRO_S)
+        return mp3.concat(intro_audio, pausa, prediccion_audio), texto_final
+    except ValueError as e:
+        # Los clips no se pudieron pegar: sintetizamos todo junto como antes
+        logger.warning(f"No pude pegar intro + predicción ({e}), sintetizo todo junto")
+    except Exception as e:
+        logger.error(f"❌ Error ElevenLabs: {e}")
+        return None, None
+
+    try:
+        return sintetizar_voz(texto_final), texto_final # Devolvemos también el texto para mostrarlo si quieres
     except Exception as e:
         logger.error(f"❌ Error ElevenLabs: {e}")
         return None, None
@@ -159,111 +356,141 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# Diccionario con significados divertidos/místicos para cada carta
-SIGNIFICADOS = {
-    "Apache": "enfrentarás un conflicto ajeno",
-    "Arana": "tejerás una red de mentiras (o de éxito)",
-    "Arbol": "echarás raíces donde menos lo esperas",
-    "Bandera": "tendrás que defender tus ideales",
-    "Bandolon": "vendrá música y fiesta a tu vida",
-    "Barrilito": "cuidado con los excesos este fin de semana",
-    "Botella": "una verdad saldrá a la luz (o una bebida)",
-    "Calavera": "un cambio radical y necesario se acerca",
-    "Camaron": "si te duermes, te llevará la corriente",
-    "Campana": "recibirás una noticia resonante",
-    "Catrin": "conocerás a alguien elegante pero engañoso",
-    "Cazo": "cocinarás un proyecto importante",
-    "Chalupa": "un viaje pequeño te cambiará el ánimo",
-    "Corazon": "el amor tocará a tu puerta (o la de tu vecino)",
-    "Corona": "recibirás el reconocimiento que mereces",
-    "Cotorro": "cuidado con hablar de más",
-    "Dama": "una mujer influyente te ayudará",
-    "Diablito": "una tentación pondrá a prueba tu voluntad",
-    "Escalera": "subirás de nivel, pero paso a paso",
-    "Estrella": "tienes una guía divina, confía en tu suerte",
-    "Gallo": "te despertarás temprano con nuevas ideas",
-    "Garza": "necesitas equilibrio y paciencia",
-    "Gorrito": "tendrás que proteger tus ideas",
-    "Luna": "secretos románticos bajo la noche",
-    "Mano": "recibirás ayuda inesperada",
-    "Melon": "la vida será dulce contigo",
-    "Muerte": "deja ir lo viejo para que entre lo nuevo",
-    "Mundo": "el éxito global está en tus manos",
-    "Pajaro": "noticias vuelan hacia ti",
-    "Paraguas": "protégete de las malas vibras",
-    "Rosa": "florecerá una nueva amistad",
-    "Sirena": "no te dejes llevar por cantos falsos",
-    "Sol": "energía y vitalidad llenarán tu semana",
-    "Soldado": "necesitas disciplina para lograr tu meta",
-    "Tambor": "tus pasos harán mucho ruido",
-    "Valiente": "enfrenta ese miedo ahora mismo",
-    "Venado": "se rápido y astuto en los negocios",
-    "Violencello": "la armonía regresará a tu hogar"
-}
-
-# Descripciones divertidas para cada carta al detectarla
-DESCRIPCIONES = {
-    "Apache": "¡Órale! El Apache es un guerrero legendario. Trae energía de batalla, pero cuida de no meterte en pleitos que no son tuyos.",
-    "Arana": "¡Uuuy! La Araña... Cuidado con tejer mentiras, porque te puedes enredar solito. O quizás estés tejiendo tu imperio.",
-    "Arbol": "¡Perfecto! El Árbol representa estabilidad. Vas a echar raíces donde menos lo esperas. ¡A crecer se ha dicho!",
-    "Bandera": "¡Órale! La Bandera es símbolo de patriotismo y valores. Prepárate para defender lo que crees, aunque sea la última dona.",
-    "Bandolon": "¡Ay sí! El Bandolón trae música y fiesta. Se viene la pachanga, prepara tus mejores pasos de baile.",
-    "Barrilito": "¡Aguas! El Barrilito te advierte que no te pases de copas este fin. O sí, pero no digas que no te avisé.",
-    "Botella": "¡Chin! La Botella siempre trae secretos. Una verdad saldrá a flote... o será solo una chela más.",
-    "Calavera": "¡No te espantes! La Calavera no es mala, significa transformación. Algo viejo se va, algo nuevo llega. Así es la vida.",
-    "Camaron": "¡Ojo vivo! El Camarón dice que el que se duerme, se lo lleva la corriente. ¡Ponte trucha!",
-    "Campana": "¡Tan tan! La Campana anuncia noticias importantes. Puede ser buena o mala, pero resonará fuerte.",
-    "Catrin": "¡Elegante! El Catrín es todo un galán, pero cuidado, puede ser puro farol. No todo lo que brilla es oro.",
-    "Cazo": "¡A cocinar! El Cazo significa que vas a preparar algo importante. Un proyecto, una idea... o unos chilaquiles épicos.",
-    "Chalupa": "¡Súbete! La Chalupa trae viajes pequeños pero significativos. Un paseo corto puede cambiarte el día.",
-    "Corazon": "¡Ay amor! El Corazón nunca miente. Alguien está pensando en ti... o tú en alguien. Cupido anda cerca.",
-    "Corona": "¡Eres el rey/reina! La Corona trae reconocimiento y éxito. Te vas a lucir como nunca.",
-    "Cotorro": "¡Shhhh! El Cotorro te recuerda que a veces es mejor quedarse callado. No vayas a echar chisme de más.",
-    "Dama": "¡Elegancia pura! La Dama representa a una mujer importante en tu vida. Escucha sus consejos.",
-    "Diablito": "¡Ay picarón! El Diablito trae tentaciones. Esa voz en tu cabeza que dice 'dale, no pasa nada'... ¡Cuidado!",
-    "Escalera": "¡Pa' arriba! La Escalera significa progreso. Vas a subir, pero paso a paso, sin prisas pero sin pausas.",
-    "Estrella": "¡Brillas! La Estrella es la mejor carta. Tienes suerte divina de tu lado. Aprovéchala, campeón.",
-    "Gallo": "¡Quiquiriquí! El Gallo te despertará con ideas frescas. Madruga y atrapa esas oportunidades.",
-    "Garza": "¡Paciencia! La Garza te enseña que el equilibrio es clave. No te apresures, observa y actúa con calma.",
-    "Gorrito": "¡Protégete! El Gorrito significa que debes cuidar tus ideas y pensamientos. No andes compartiendo todo.",
-    "Luna": "¡Romántico! La Luna trae secretos nocturnos. Algo misterioso sucederá bajo su luz.",
-    "Mano": "¡Te echan la mano! La Mano significa ayuda inesperada. Alguien aparecerá justo cuando lo necesites.",
-    "Melon": "¡Dulce vida! El Melón trae sabor y buenos momentos. Disfruta lo bueno que viene.",
-    "Muerte": "¡No te asustes! La Muerte es cambio, no final. Algo viejo se va para dar paso a lo nuevo. Es bueno.",
-    "Mundo": "¡Todo es tuyo! El Mundo representa éxito total. Tienes el poder de lograr lo que quieras.",
-    "Pajaro": "¡Tweet tweet! El Pájaro trae noticias frescas. Alguien te va a buscar o tú buscarás a alguien.",
-    "Paraguas": "¡Protección! El Paraguas te cubre de las malas vibras. Eres inmune a la envidia, eres blindado.",
-    "Rosa": "¡Qué bonito! La Rosa trae nuevas amistades o amor floreciente. Algo hermoso está creciendo.",
-    "Sirena": "¡Aguas! La Sirena canta bonito pero engaña. No te dejes llevar por promesas falsas.",
-    "Sol": "¡Qué energía! El Sol te llena de vitalidad. Vas a brillar con luz propia esta semana.",
-    "Soldado": "¡Disciplina! El Soldado te recuerda que sin orden no hay progreso. Ponte las pilas.",
-    "Tambor": "¡Retumba! El Tambor significa que tus acciones harán ruido. Todo mundo se va a enterar.",
-    "Valiente": "¡Échale ganas! El Valiente te dice que enfrentes ese miedo de una vez. Tú puedes.",
-    "Venado": "¡Rápido! El Venado es velocidad y astucia. Muévete rápido en los negocios y llegarás lejos.",
-    "Violencello": "¡Armonía! El Violoncello trae paz al hogar. La música y la tranquilidad regresan a tu vida."
-}
 
+# Cargar Modelo
+@st.cache_resource(show_spinner=False)
+def load_model():
+    backend = os.getenv("YOLO_BACKEND", "torch")  # "torch", "onnx" u "openvino"
+    logger.info(f"Cargando modelo YOLO ({backend})...")
+    t0 = time.perf_counter()
+    # dynamic: el servicio de inferencia manda lotes de hasta INFER_MAX_BATCH fotos; un
+    # export con batch fijo (1) los rechaza. torch no lo necesita
+    detector = Detector("best.pt", backend=backend, conf=0.5, dynamic=backend != "torch")
+    metricas.gauge("modelo_carga_segundos", time.perf_counter() - t0, backend=backend)
+    return detector
 
+# Un solo servicio de inferencia para todas las sesiones: junta las fotos que
+# llegan casi al mismo tiempo y las corre como un batch de hasta INFER_MAX_BATCH.
+# Con YOLO_BACKEND onnx u openvino el modelo se exporta con batch dinámico (ver
+# load_model); un export con batch fijo sólo acepta INFER_MAX_BATCH=1
+@st.cache_resource(show_spinner=False)
+def load_inference_server(_detector):
+    return BatchingInferenceServer(
+        _detector,
+        max_batch=int(os.getenv("INFER_MAX_BATCH", "8")),
+        window_ms=float(os.getenv("INFER_WINDOW_MS", "8")),
+    )
 
-# Cargar Modelo
+# Detecciones de fotos casi iguales (misma carta, otra foto): se reusan sin correr el modelo.
+# Se comparte entre sesiones: además de la foto completa se compara cada carta detectada
 @st.cache_resource
-def load_model():
-    logger.info("Cargando modelo YOLO...")
-    return YOLO("best.pt")
-
-try:
-    model = load_model()
-    logger.info("✅ Modelo cargado exitosamente.")
-except Exception as e:
-    logger.critical(f"❌ Error fatal cargando el modelo: {e}")
-    st.error("⚠️ Error: No encuentro el archivo 'best.pt'. Ponlo en la misma carpeta.")
+def load_phash_cache():
+    return PHashCache(
+        max_entries=int(os.getenv("PHASH_CACHE_ENTRIES", "512")),
+        max_distance=int(os.getenv("PHASH_MAX_DISTANCE", "4")),
+        max_distance_carta=int(os.getenv("PHASH_MAX_DISTANCE_CARTA", "8")),
+        ttl_s=float(os.getenv("PHASH_TTL_S", "600")),
+    )
+
+# Buffers de entrada del modelo, reusados entre fotos (ver preproceso.py)
+@st.cache_resource(show_spinner=False)
+def load_preproceso(imgsz):
+    return Preproceso(imgsz)
+
+def _cargar_modelo(carga):
+    """Carga el modelo y lo calienta con una foto falsa por el mismo camino que las reales."""
+    t0 = time.perf_counter()
+    detector = load_model()
+    server = load_inference_server(detector)
+    carga.avanzar("calentando")
+    t1 = time.perf_counter()
+    # La primera inferencia arma el grafo / reserva memoria: que no la pague la primera foto
+    foto = arranque.foto_de_calentamiento()
+    for _ in range(CALENTAR_VECES):
+        with load_preproceso(detector.imgsz).preparar(foto) as (img, _letterbox):
+            server.predict(img, timeout=120)
+    t2 = time.perf_counter()
+    arranque.marcar("modelo_listo", carga_s=round(t1 - t0, 3), calentamiento_ms=round((t2 - t1) * 1000.0, 1))
+    logger.info(f"✅ Modelo cargado en {t1 - t0:.2f}s y calentado en {(t2 - t1) * 1000.0:.0f} ms.")
+    return detector, server
+
+
+# La carga arranca con la primera sesión y la página no la espera (MODELO_EN_FONDO=0: sí la espera)
+@st.cache_resource(show_spinner=False)
+def iniciar_modelo():
+    return arranque.CargaEnFondo(_cargar_modelo, nombre="modelo")
+
+MENSAJE_SIN_MODELO = "⚠️ Error: No encuentro el archivo 'best.pt'. Ponlo en la misma carpeta."
+
+carga_modelo = iniciar_modelo()
+if not MODELO_EN_FONDO:
+    carga_modelo.esperar()
+if carga_modelo.error is not None:
+    logger.critical(f"❌ Error fatal cargando el modelo: {carga_modelo.error}")
+    iniciar_modelo.clear()      # la próxima ejecución lo vuelve a intentar
+    st.error(MENSAJE_SIN_MODELO)
     st.stop()
+precargar_en_fondo(carga_modelo)
+
+
+def modelo():
+    """(detector, inference_server) ya calentados; si todavía no lo están, espera con un spinner."""
+    if not carga_modelo.listo():
+        with st.spinner("🔥 Calentando el Ojo que Todo lo Ve..."):
+            carga_modelo.esperar()
+    try:
+        return carga_modelo.resultado()
+    except Exception:
+        st.error(MENSAJE_SIN_MODELO)
+        st.stop()
+
+
+def predecir(server, img):
+    """Detecciones de una imagen ya preparada; la primera del proceso queda en los hitos del arranque."""
+    t0 = time.perf_counter()
+    dets = server.predict(img, timeout=30)
+    if arranque.marcar("primera_deteccion", primera_deteccion_ms=round((time.perf_counter() - t0) * 1000.0, 1)):
+        logger.info(f"⏱️ Arranque: {arranque.reporte()}")
+    return dets
+
+
+# Endpoint de Prometheus con los stats() de los recursos compartidos (ver metricas.py)
+@st.cache_resource
+def iniciar_metricas():
+    store = load_narrative_store()
+    metricas.fuente("gemini", upstream_gemini.stats)
+    metricas.fuente("elevenlabs", upstream_eleven.stats)
+    metricas.fuente("narrativa", load_carrera().stats)
+    metricas.fuente("almacen_narrativas", lambda: {"hits": store.hits, "misses": store.misses})
+    metricas.fuente("audio_cache", load_audio_cache().stats)
+    metricas.fuente("fotos_cache", load_phash_cache().stats)
+    metricas.fuente("arranque", arranque.reporte)
+    # El modelo puede seguir cargando: sus stats aparecen cuando esté listo
+    metricas.fuente("inferencia", lambda: carga_modelo.resultado()[1].stats() if carga_modelo.listo() else {})
+    metricas.fuente("preproceso", lambda: load_preproceso(carga_modelo.resultado()[0].imgsz).stats()
+                    if carga_modelo.listo() else {})
+    if os.getenv("METRICAS_PERFIL", "0") == "1":
+        metricas.perfilar(float(os.getenv("METRICAS_PERFIL_INTERVALO_S", "0.01")))
+    puerto = int(os.getenv("METRICAS_PUERTO", "9464"))
+    try:
+        server = metricas.servir(puerto)
+    except OSError as e:
+        # Otro proceso (p. ej. otra instancia de streamlit) ya tiene el puerto
+        logger.warning(f"No pude abrir las métricas en el puerto {puerto}: {e}")
+        return None
+    logger.info(f"📈 Métricas en http://127.0.0.1:{puerto}/metrics")
+    return server
+
+if metricas.ACTIVO:
+    iniciar_metricas()
 
 # ==========================================
 # 2. INTERFAZ GRÁFICA (CSS Y ESTILO)
 # ==========================================
 
-st.markdown("""
+# Estilos y plantillas fijas: se definen una vez por proceso y las re-ejecuciones
+# de los fragments (cada foto) ya no los vuelven a mandar al navegador
+ESTILOS_CSS = """
     <style>
     /* Fondo principal con gradiente alegre */
     .stApp {
@@ -341,174 +568,452 @@ st.markdown("""
         font-size: 14px !important;
     }
     </style>
-    """, unsafe_allow_html=True)
+    """
+
+ESTILOS_MODAL = """
+    <style>
+    .pred-title { font-size: 22px; font-weight: bold; color: #FFD700; margin: 20px 0 15px 0; text-align: center; }
+    .pred-text { font-size: 20px; color: #f0f0f0; margin-bottom: 20px; line-height: 1.6; font-weight: 400; text-align: center; }
+    .final-destiny { font-size: 26px; font-weight: bold; color: #C71585; text-align: center; margin-top: 30px; padding: 20px; background-color: #FFF0F5; border-radius: 12px; border: 2px dashed #C71585; box-shadow: 0 0 15px rgba(199, 21, 133, 0.4); }
+    </style>
+    """
+
+# (etiqueta, margen) de cada slot: Pasado, Presente, Futuro
+ETIQUETAS_SLOT = [
+    ("🌅 Pasado", "5px 0"),
+    ("⚡ Presente", "15px 0 5px 0"),
+    ("🌙 Futuro", "15px 0 5px 0"),
+]
+SLOT_CARTA = """
+            <div class='card-slot'>
+                <p style='font-size:40px; margin:0;'>🎴</p>
+                <p style='font-size:22px; font-weight:bold; color:#FF1493; margin:8px 0;'>{carta}</p>
+            </div>
+        """
+SLOT_VACIO = "<div class='card-slot'><p style='font-size:18px; color:#999;'>⏳ Esperando...</p></div>"
+
+st.markdown(ESTILOS_CSS, unsafe_allow_html=True)
 
 st.markdown("<h1 class='main-title'>🔮 El Oráculo de la Lotería 🔮</h1>", unsafe_allow_html=True)
 st.markdown("<p style='text-align:center; font-size:18px; color:white; margin-bottom:10px;'>Muestra <b>3 cartas distintas</b> para leer tu destino</p>", unsafe_allow_html=True)
 
-# Inicializar memoria de cartas encontradas
-if 'cartas_vistas' not in st.session_state:
-    st.session_state['cartas_vistas'] = []
-if 'show_modal' not in st.session_state:
-    st.session_state['show_modal'] = False
-
 # ==========================================
 # 3. LAYOUT PRINCIPAL EN DOS COLUMNAS
 # ==========================================
 
-col_left, col_right = st.columns([1, 1], gap="medium")
+def render_slot(slot, carta):
+    slot.markdown(SLOT_CARTA.format(carta=carta) if carta else SLOT_VACIO, unsafe_allow_html=True)
 
-with col_left:
+
+def render_progreso(slot, total):
+    if 0 < total < 3:
+        slot.markdown(f"<p style='text-align:center; font-size:16px; color:white; margin-top:15px;'>⏳ Faltan <b>{3-total}</b> carta(s)</p>", unsafe_allow_html=True)
+    else:
+        slot.empty()
+
+
+def render_tablero(slots, progreso):
+    """
+    Los 3 slots y el progreso. Los fragments lo llaman en cada ejecución:
+    Streamlit sólo deja que un fragment escriba en un contenedor de fuera
+    (como los slots, al registrar una carta) si ya lo escribió durante la
+    ejecución completa de la página.
+    """
+    cartas = st.session_state['cartas_vistas']
+    for i, slot in enumerate(slots):
+        render_slot(slot, cartas[i] if i < len(cartas) else None)
+    render_progreso(progreso, len(cartas))
+
+
+def reiniciar_lectura():
+    # Limpiar cartas
+    st.session_state['cartas_vistas'] = []
+    st.session_state['show_modal'] = False
+    st.session_state.pop('prediccion_cartas', None)
+    if 'captura' in st.session_state:
+        st.session_state['captura'].reiniciar()
+    # Incrementar contador para resetear la cámara
+    st.session_state['camera_reset_counter'] = st.session_state.get('camera_reset_counter', 0) + 1
+
+
+# Cada foto re-ejecuta sólo este fragment: la cámara, la detección y el slot
+# (placeholder del tablero) que cambió; el resto de la página no se toca
+@st.fragment
+@metricas.medido("fragment_deteccion")
+def panel_deteccion(slots, progreso):
+    render_tablero(slots, progreso)
     # Input de cámara con key dinámica para forzar reset
     camera_key = f"camera_{st.session_state.get('camera_reset_counter', 0)}"
+    tres_en_una = st.toggle("🃏 Las 3 cartas en una sola foto", value=TRES_EN_UNA, key="tres_en_una")
     img_file_buffer = st.camera_input("📸 El Ojo que Todo lo Ve", key=camera_key)
     
     # Área de información debajo de la cámara
     info_placeholder = st.empty()
     
     if img_file_buffer is None:
-        info_placeholder.info("📸 Captura 3 cartas diferentes", icon="📷")
+        if tres_en_una:
+            info_placeholder.info("📸 Pon las 3 cartas en fila: Pasado, Presente y Futuro, de izquierda a derecha", icon="📷")
+        else:
+            info_placeholder.info("📸 Captura 3 cartas diferentes", icon="📷")
+        return
     
-    # LÓGICA DE DETECCIÓN
-    if img_file_buffer is not None:
-        bytes_data = img_file_buffer.getvalue()
-        cv2_img = cv2.imdecode(np.frombuffer(bytes_data, np.uint8), cv2.IMREAD_COLOR)
-
-        results = model(cv2_img, conf=0.5)
-        
-        detectado_ahora = None
-        confianza_actual = 0.0
-
-        for r in results:
-            for box in r.boxes:
-                cls_id = int(box.cls[0])
-                confianza = float(box.conf[0])
-                
-                nombre_detectado = model.names[cls_id] 
-                nombre_detectado = nombre_detectado.capitalize() 
-
-                detectado_ahora = nombre_detectado
-                confianza_actual = confianza
-
-        if detectado_ahora:
-            if detectado_ahora not in st.session_state['cartas_vistas']:
-                if detectado_ahora in SIGNIFICADOS:
-                    st.session_state['cartas_vistas'].append(detectado_ahora)
-                    st.toast(f"🎉 ¡Carta capturada: {detectado_ahora}!", icon="🃏")
-                    # Mostrar descripción de la carta detectada
-                    info_placeholder.success(f"**✨ {detectado_ahora} detectado!**\n\n{DESCRIPCIONES.get(detectado_ahora, 'Una carta misteriosa...')}", icon="🎴")
-                    logger.info(f"Carta detectada: {detectado_ahora}")
-                else:
-                    st.warning(f"🤔 Veo un {detectado_ahora}, pero no sé qué significa.")
-            else:
-                # Si ya fue detectada antes
-                info_placeholder.warning(f"**🔄 {detectado_ahora}** - Ya capturaste esta carta. Muestra una diferente.", icon="⚠️")
+    # LÓGICA DE DETECCIÓN (si la foto llegó antes de que el modelo estuviera listo, aquí se espera)
+    detector, _ = modelo()
+    dets = detectar_foto(img_file_buffer.getvalue())
+
+    if tres_en_una:
+        registrar_tres(dets, info_placeholder)
+        return
+
+    # La caja más segura de la foto (nombre ya resuelto a las llaves de SIGNIFICADOS)
+    cls_id, confianza_actual, _ = detector.best(dets)
+    detectado_ahora = detector.label(cls_id)
+
+    if detectado_ahora:
+        registrar_carta(detectado_ahora, slots, progreso, info_placeholder)
+    else:
+        # No se detectó nada
+        info_placeholder.info("🔍 Analizando... Acerca las cartas a la cámara", icon="👀")
+
+
+@metricas.medido("foto")
+def detectar_foto(bytes_data):
+    """Detections de una foto: del caché si ya se vio una casi igual, si no decodifica y corre el modelo."""
+    cache = load_phash_cache()
+    gris = miniatura(bytes_data)
+    h = None if gris is None else phash(gris)
+    dets = cache.get(h, gris)
+    if dets is not None:
+        return dets
+
+    t0 = time.perf_counter()
+    detector, inference_server = modelo()
+    preproceso = load_preproceso(detector.imgsz)
+    # Decodificada reducida y ya con el letterbox del modelo (ultralytics ya no reescala)
+    with preproceso.preparar(bytes_data) as (img, letterbox):
+        dets = letterbox.a_original(predecir(inference_server, img))
+    # Sin cartas no se guarda: una carta chica que entra al cuadro casi no mueve el hash de la foto
+    if len(dets.conf):
+        cache.put(h, dets, (time.perf_counter() - t0) * 1000.0, gris, dets.xyxy)
+
+    server_stats = inference_server.stats()
+    if server_stats["batches"] % 25 == 0:
+        logger.info(f"📊 Inferencia: {server_stats} | Caché de fotos: {cache.stats()} "
+                    f"| Preproceso: {preproceso.stats()}")
+    return dets
+
+
+def mostrar_carta(info_placeholder, carta):
+    info_placeholder.success(f"**✨ {carta} detectado!**\n\n{DESCRIPCIONES.get(carta, 'Una carta misteriosa...')}", icon="🎴")
+
+
+def registrar_carta(detectado_ahora, slots, progreso, info_placeholder):
+    """Agrega la carta a la lectura (si es nueva y conocida) y actualiza su slot."""
+    if detectado_ahora not in st.session_state['cartas_vistas']:
+        if detectado_ahora in SIGNIFICADOS:
+            cartas_vistas = st.session_state['cartas_vistas']
+            cartas_vistas.append(detectado_ahora)
+            st.toast(f"🎉 ¡Carta capturada: {detectado_ahora}!", icon="🃏")
+            # Mostrar descripción de la carta detectada
+            mostrar_carta(info_placeholder, detectado_ahora)
+            logger.info(f"Carta detectada: {detectado_ahora}")
+            if len(cartas_vistas) >= 3:
+                # Tercera carta: toda la página se re-ejecuta para abrir el modal
+                st.rerun()
+            render_slot(slots[len(cartas_vistas) - 1], detectado_ahora)
+            render_progreso(progreso, len(cartas_vistas))
+        else:
+            st.warning(f"🤔 Veo un {detectado_ahora}, pero no sé qué significa.")
+    else:
+        # Si ya fue detectada antes
+        info_placeholder.warning(f"**🔄 {detectado_ahora}** - Ya capturaste esta carta. Muestra una diferente.", icon="⚠️")
+
+
+def registrar_tres(dets, info_placeholder):
+    """Una sola foto con las 3 cartas: de izquierda a derecha son Pasado, Presente y Futuro."""
+    if len(st.session_state['cartas_vistas']) >= 3:
+        return      # lectura completa: la misma foto sigue en la cámara en cada re-ejecución
+    detector, _ = modelo()
+    cartas = [detector.label(cls_id) for cls_id, _, _ in detector.distinct(dets, k=3)]
+    if len(cartas) == 3:
+        logger.info(f"Tres cartas en una foto: {cartas}")
+        st.session_state['cartas_vistas'] = cartas
+        # Toda la página se re-ejecuta para llenar los slots y abrir el modal
+        st.rerun()
+    if cartas:
+        info_placeholder.warning(f"👀 Sólo distingo {', '.join(cartas)}. Pon las 3 cartas en fila, sin encimarlas.", icon="⚠️")
+    else:
+        info_placeholder.info("🔍 No veo cartas. Acércalas a la cámara, las 3 en fila", icon="👀")
+
+
+def captura_de_sesion():
+    """La CapturaContinua de esta sesión (y su fuente local, si CAMARA_FUENTE está puesta)."""
+    if 'captura' not in st.session_state:
+        detector, inference_server = modelo()
+        st.session_state['captura'] = CapturaContinua(
+            detector, lambda frame: predecir(inference_server, frame), max_fps=CAMARA_FPS)
+    captura = st.session_state['captura']
+    if CAMARA_FUENTE:
+        fuente = st.session_state.get('captura_fuente')
+        if fuente is None or not fuente.activa():
+            # Se apaga sola si la sesión se cierra y el fragment deja de mandar latidos
+            st.session_state['captura_fuente'] = FuenteLocal(CAMARA_FUENTE, captura.recibir, inactivo_s=10.0)
+    return captura
+
+
+def camara_webrtc(captura):
+    """
+    Cámara del navegador por WebRTC: cada frame va a la captura (que tira los que
+    no alcanza a procesar) y regresa con las últimas cajas dibujadas.
+    Regresa False si streamlit-webrtc no está instalado.
+    """
+    try:
+        import av
+        from streamlit_webrtc import WebRtcMode, webrtc_streamer
+    except ImportError:
+        return False
+
+    def video_frame_callback(frame):
+        img = frame.to_ndarray(format="bgr24")
+        captura.recibir(img)
+        return av.VideoFrame.from_ndarray(captura.dibujar(img), format="bgr24")
+
+    webrtc_streamer(
+        key="camara_continua",
+        mode=WebRtcMode.SENDRECV,
+        video_frame_callback=video_frame_callback,
+        # El navegador no necesita mandar mucho más de lo que el servidor va a procesar
+        media_stream_constraints={"video": {"frameRate": {"ideal": max(CAMARA_FPS * 2, 10)}}, "audio": False},
+        async_processing=True,
+    )
+    return True
+
+
+# Recoge lo que la captura continua confirmó desde la última vez (cada medio
+# segundo, sin tocar el resto de la página)
+@st.fragment(run_every=0.5)
+@metricas.medido("fragment_capturas")
+def panel_capturas(slots, progreso):
+    render_tablero(slots, progreso)
+    captura = captura_de_sesion()
+    if CAMARA_FUENTE:
+        st.session_state['captura_fuente'].latido()
+        ultimo = st.session_state['captura_fuente'].ultimo
+        if ultimo is not None:
+            st.image(captura.dibujar(ultimo), channels="BGR", caption=f"📼 {CAMARA_FUENTE}")
+
+    info_placeholder = st.empty()
+    if len(st.session_state['cartas_vistas']) >= 3:
+        return
+    nuevas = captura.pendientes()
+    if not nuevas:
+        # El aviso de la última carta se queda unos segundos aunque el fragment se re-ejecute
+        carta, cuando = st.session_state.get('captura_ultima', (None, 0.0))
+        if carta in st.session_state['cartas_vistas'] and time.monotonic() - cuando < 4.0:
+            mostrar_carta(info_placeholder, carta)
         else:
-            # No se detectó nada
-            info_placeholder.info("🔍 Analizando... Acerca las cartas a la cámara", icon="👀")
+            info_placeholder.info("🔍 Muestra una carta a la cámara y sostenla quieta", icon="👀")
+        return
+    logger.info(f"📊 Captura continua: {captura.stats()}")
+    for carta in nuevas:
+        st.session_state['captura_ultima'] = (carta, time.monotonic())
+        registrar_carta(carta, slots, progreso, info_placeholder)
+
+
+# Mientras el modelo carga: un aviso que se refresca solo y, al terminar, re-ejecuta
+# la página completa (en la que sigue ya no se dibuja y deja de refrescarse)
+@st.fragment(run_every=0.5)
+def aviso_calentando():
+    if carga_modelo.listo():
+        st.rerun()
+    estado = "Calentando" if carga_modelo.estado == "calentando" else "Despertando"
+    st.info(f"🔥 {estado} el Ojo que Todo lo Ve... ({carga_modelo.transcurrido():.0f}s)", icon="⏳")
+
+
+col_left, col_right = st.columns([1, 1], gap="medium")
+
+cartas = st.session_state['cartas_vistas']
+total = len(cartas)
 
 with col_right:
     # ==========================================
-    # MOSTRAR SLOTS DE CARTAS EN COLUMNA DERECHA
+    # SLOTS DE CARTAS EN COLUMNA DERECHA (placeholders que actualiza el fragment)
     # ==========================================
-    
-    cartas = st.session_state['cartas_vistas']
-    total = len(cartas)
-    
     st.markdown("<h3 style='text-align:center; color:#FFD700; margin-bottom:15px;'>🎴 Cartas Detectadas</h3>", unsafe_allow_html=True)
-    
-    # Carta 1: Pasado
-    st.markdown("<p style='text-align:center; color:#FFD700; font-size:16px; margin:5px 0;'>🌅 Pasado</p>", unsafe_allow_html=True)
-    if total >= 1:
-        st.markdown(f"""
-            <div class='card-slot'>
-                <p style='font-size:40px; margin:0;'>🎴</p>
-                <p style='font-size:22px; font-weight:bold; color:#FF1493; margin:8px 0;'>{cartas[0]}</p>
-            </div>
-        """, unsafe_allow_html=True)
-    else:
-        st.markdown("<div class='card-slot'><p style='font-size:18px; color:#999;'>⏳ Esperando...</p></div>", unsafe_allow_html=True)
-    
-    # Carta 2: Presente
-    st.markdown("<p style='text-align:center; color:#FFD700; font-size:16px; margin:15px 0 5px 0;'>⚡ Presente</p>", unsafe_allow_html=True)
-    if total >= 2:
-        st.markdown(f"""
-            <div class='card-slot'>
-                <p style='font-size:40px; margin:0;'>🎴</p>
-                <p style='font-size:22px; font-weight:bold; color:#FF1493; margin:8px 0;'>{cartas[1]}</p>
-            </div>
-        """, unsafe_allow_html=True)
-    else:
-        st.markdown("<div class='card-slot'><p style='font-size:18px; color:#999;'>⏳ Esperando...</p></div>", unsafe_allow_html=True)
-    
-    # Carta 3: Futuro
-    st.markdown("<p style='text-align:center; color:#FFD700; font-size:16px; margin:15px 0 5px 0;'>🌙 Futuro</p>", unsafe_allow_html=True)
-    if total >= 3:
-        st.markdown(f"""
-            <div class='card-slot'>
-                <p style='font-size:40px; margin:0;'>🎴</p>
-                <p style='font-size:22px; font-weight:bold; color:#FF1493; margin:8px 0;'>{cartas[2]}</p>
-            </div>
-        """, unsafe_allow_html=True)
-    else:
-        st.markdown("<div class='card-slot'><p style='font-size:18px; color:#999;'>⏳ Esperando...</p></div>", unsafe_allow_html=True)
-    
-    # Botón de reinicio
-    if total > 0:
-        st.markdown("<div style='margin-top:20px;'></div>", unsafe_allow_html=True)
-        if st.button("🔄 Reiniciar Lectura", use_container_width=True):
-            # Limpiar cartas
-            st.session_state['cartas_vistas'] = []
-            st.session_state['show_modal'] = False
-            # Incrementar contador para resetear la cámara
-            st.session_state['camera_reset_counter'] = st.session_state.get('camera_reset_counter', 0) + 1
-            st.rerun()
-    
+
+    slots = []
+    for i, (etiqueta, margen) in enumerate(ETIQUETAS_SLOT):
+        st.markdown(f"<p style='text-align:center; color:#FFD700; font-size:16px; margin:{margen};'>{etiqueta}</p>", unsafe_allow_html=True)
+        slots.append(st.empty())
+        render_slot(slots[i], cartas[i] if i < total else None)
+
+    # Botón de reinicio (siempre visible: la primera carta llega por el fragment,
+    # que no puede agregar botones fuera de él)
+    st.markdown("<div style='margin-top:20px;'></div>", unsafe_allow_html=True)
+    if st.button("🔄 Reiniciar Lectura", use_container_width=True):
+        reiniciar_lectura()
+        st.rerun()
+
     # Progreso
-    if total > 0 and total < 3:
-        st.markdown(f"<p style='text-align:center; font-size:16px; color:white; margin-top:15px;'>⏳ Faltan <b>{3-total}</b> carta(s)</p>", unsafe_allow_html=True)
+    progreso = st.empty()
+    render_progreso(progreso, total)
+
+with col_left:
+    calentando = not carga_modelo.listo()
+    if calentando:
+        aviso_calentando()
+    if not CAMARA_CONTINUA:
+        # La cámara ya se muestra: una foto tomada antes de tiempo espera al modelo
+        panel_deteccion(slots, progreso)
+    elif calentando:
+        pass        # la captura continua arranca con el modelo listo
+    elif CAMARA_FUENTE or camara_webrtc(captura_de_sesion()):
+        panel_capturas(slots, progreso)
+    else:
+        st.warning("Instala streamlit-webrtc para la cámara continua; uso las fotos por clic.")
+        panel_deteccion(slots, progreso)
 
 # ==========================================
 # 4. MODAL DE REVELACIÓN FINAL (CON VOZ Y LOGS 🎙️)
 # ==========================================
-@st.dialog("🔮 Tu Destino Revelado 🔮")
-def mostrar_revelacion(c1, c2, c3):
-    st.markdown("""
-    <style>
-    .pred-title { font-size: 22px; font-weight: bold; color: #FFD700; margin: 20px 0 15px 0; text-align: center; }
-    .pred-text { font-size: 20px; color: #f0f0f0; margin-bottom: 20px; line-height: 1.6; font-weight: 400; text-align: center; }
-    .final-destiny { font-size: 26px; font-weight: bold; color: #C71585; text-align: center; margin-top: 30px; padding: 20px; background-color: #FFF0F5; border-radius: 12px; border: 2px dashed #C71585; box-shadow: 0 0 15px rgba(199, 21, 133, 0.4); }
-    </style>
-    """, unsafe_allow_html=True)
+def revelar_completo(c1, c2, c3, intro, nueva_lectura):
+    """Flujo clásico: texto completo de Gemini, luego el audio completo, luego se muestra todo."""
+    # Opcional: la intro (pre-sintetizada) empieza a sonar ya, mientras se genera lo demás
+    intro_fin = None
+    if INTRO_ANTICIPADA and nueva_lectura:
+        audio_slot = st.empty()
+        try:
+            intro_audio = sintetizar_voz(intro)
+            audio_slot.audio(intro_audio, format='audio/mp3', autoplay=True)
+            intro_fin = time.perf_counter() + mp3.duration(intro_audio) + PAUSA_INTRO_S
+        except Exception as e:
+            logger.warning(f"No pude reproducir la intro por adelantado: {e}")
 
-    # 1. GENERAR PREDICCIÓN CON IA
-    st.markdown("<div class='pred-title'>🔮 El Oráculo Consulta las Cartas...</div>", unsafe_allow_html=True)
-    
     with st.spinner("✨ Interpretando el destino..."):
-        prediccion_ia = generar_prediccion_ia(c1, c2, c3)
-        resultado_audio = texto_a_audio_elevenlabs(prediccion_ia)
+        # La misma lectura aunque el modal se vuelva a ejecutar (el almacén da una variante al azar)
+        if nueva_lectura:
+            st.session_state['prediccion_ia'] = generar_prediccion_ia(c1, c2, c3)
+            st.session_state['prediccion_cartas'] = (c1, c2, c3)
+        prediccion_ia = st.session_state['prediccion_ia']
+        if intro_fin is None:
+            resultado_audio = texto_a_audio_elevenlabs(prediccion_ia, intro)
+        else:
+            # La intro ya está sonando: sólo falta la predicción
+            try:
+                resultado_audio = sintetizar_voz(prediccion_ia), prediccion_ia
+            except Exception as e:
+                logger.error(f"❌ Error ElevenLabs: {e}")
+                resultado_audio = None, None
     
     # 2. MOSTRAR PREDICCIÓN
     st.markdown(f"<div class='pred-text'>{prediccion_ia}</div>", unsafe_allow_html=True)
-    st.markdown(f"<div class='final-destiny'>¡Las cartas {c1}, {c2} y {c3} han hablado!</div>", unsafe_allow_html=True)
 
     # 3. Reproducir AUDIO
     if resultado_audio and resultado_audio[0]:  # resultado_audio es (audio_bytes, texto_final)
         audio_bytes, texto_completo = resultado_audio
-        st.audio(audio_bytes, format='audio/mp3', autoplay=True)
+        if intro_fin is None:
+            st.audio(audio_bytes, format='audio/mp3', autoplay=True)
+        else:
+            # La intro sigue sonando en su reproductor: éste arranca ya, con silencio hasta que ella
+            # acabe, y el navegador encadena las voces sin que la sesión se quede esperando
+            try:
+                restante = intro_fin - time.perf_counter()
+                if restante > 0:
+                    audio_bytes = mp3.concat(mp3.silence_like(audio_bytes, restante), audio_bytes)
+                st.audio(audio_bytes, format='audio/mp3', autoplay=True)
+            except ValueError as e:
+                # Sin silencio que pegar sólo queda cortar la intro, no encimar las voces
+                logger.warning(f"No pude encadenar la predicción tras la intro: {e}")
+                audio_slot.audio(audio_bytes, format='audio/mp3', autoplay=True)
         logger.info(f"✅ Audio reproducido: '{texto_completo[:50]}...'")
     else:
         st.warning("🔇 El oráculo está afónico, pero tu destino está escrito arriba.")
         logger.warning("Fallo en audio")
 
+
+@metricas.medido("revelacion_streaming")
+def revelar_en_streaming(c1, c2, c3, intro, nueva_lectura):
+    """
+    El texto aparece conforme Gemini lo escribe y cada oración se sintetiza en
+    cuanto cierra; los clips suenan uno tras otro, empezando por la intro.
+    """
+    if not nueva_lectura:
+        # Re-ejecución del modal: ya se leyó, sólo se vuelve a mostrar
+        st.markdown(f"<div class='pred-text'>{st.session_state['prediccion_ia']}</div>", unsafe_allow_html=True)
+        if st.session_state.get('prediccion_audio'):
+            st.audio(st.session_state['prediccion_audio'], format='audio/mp3')
+        return
+
+    texto_slot = st.empty()
+    # Un reproductor por clip, cada uno con silencio hasta que acabe el anterior: el navegador los encadena
+    reproductor = ReproductorProgresivo(st.container())
+    try:
+        reproductor.encolar(sintetizar_voz(intro), pausa_s=PAUSA_INTRO_S)
+    except Exception as e:
+        logger.warning(f"No pude reproducir la intro: {e}")
+
+    texto_slot.markdown("<div class='pred-text'>✨ Interpretando el destino...</div>", unsafe_allow_html=True)
+    lectura = LecturaEnStreaming(fragmentos_prediccion(c1, c2, c3), sintetizar_voz)
+    oraciones_con_audio = 0
+    for tipo, dato, oracion in lectura.eventos():
+        if tipo == "texto":
+            texto_slot.markdown(f"<div class='pred-text'>{lectura.texto.strip()} ▌</div>", unsafe_allow_html=True)
+        elif tipo == "audio":
+            reproductor.encolar(dato)
+            oraciones_con_audio += 1
+        elif tipo == "error_audio":
+            logger.error(f"❌ Error ElevenLabs en '{oracion[:40]}...': {dato}")
+
+    prediccion_ia = lectura.texto.strip()
+    texto_slot.markdown(f"<div class='pred-text'>{prediccion_ia}</div>", unsafe_allow_html=True)
+    logger.info(f"⏱️ Streaming: primera palabra {lectura.t_primer_texto or 0:.2f}s, "
+                f"primer audio {lectura.t_primer_audio or 0:.2f}s")
+
+    audio_bytes = None
+    if oraciones_con_audio:
+        # Sin esperar a que termine de sonar: la lectura completa queda aparte para repetirla
+        try:
+            audio_bytes = mp3.concat(*reproductor.clips)
+            with st.expander("🔁 Escuchar otra vez"):
+                st.audio(audio_bytes, format='audio/mp3')
+        except ValueError as e:
+            logger.warning(f"No pude pegar los clips de la lectura: {e}")
+        logger.info(f"✅ Audio reproducido en {oraciones_con_audio} oraciones")
+    else:
+        st.warning("🔇 El oráculo está afónico, pero tu destino está escrito arriba.")
+        logger.warning("Fallo en audio")
+
+    st.session_state['prediccion_ia'] = prediccion_ia
+    st.session_state['prediccion_audio'] = audio_bytes
+    st.session_state['prediccion_cartas'] = (c1, c2, c3)
+
+
+@st.dialog("🔮 Tu Destino Revelado 🔮")
+def mostrar_revelacion(c1, c2, c3):
+    st.markdown(ESTILOS_MODAL, unsafe_allow_html=True)
+
+    # 1. GENERAR PREDICCIÓN CON IA
+    st.markdown("<div class='pred-title'>🔮 El Oráculo Consulta las Cartas...</div>", unsafe_allow_html=True)
+    
+    # Lectura nueva (y no una re-ejecución del modal)
+    nueva_lectura = st.session_state.get('prediccion_cartas') != (c1, c2, c3)
+    if nueva_lectura:
+        st.session_state['prediccion_intro'] = random.choice(INTROS_DRAMATICAS)
+    intro = st.session_state['prediccion_intro']
+
+    if ORACULO_STREAMING:
+        revelar_en_streaming(c1, c2, c3, intro, nueva_lectura)
+    else:
+        revelar_completo(c1, c2, c3, intro, nueva_lectura)
+    if nueva_lectura:
+        log_upstreams()
+
+    st.markdown(f"<div class='final-destiny'>¡Las cartas {c1}, {c2} y {c3} han hablado!</div>", unsafe_allow_html=True)
+
     # 4. BOTÓN REINICIO
     st.markdown("<br>", unsafe_allow_html=True)
     if st.button("✨ Leer otra fortuna ✨", type="primary", use_container_width=True):
-        # Limpiar cartas
-        st.session_state['cartas_vistas'] = [] 
-        st.session_state['show_modal'] = False
-        # Incrementar contador para resetear la cámara
-        st.session_state['camera_reset_counter'] = st.session_state.get('camera_reset_counter', 0) + 1
+        reiniciar_lectura()
         st.rerun()
 
 # Lógica de disparo del modal
@@ -519,4 +1024,9 @@ if total >= 3:
         st.rerun()
     
     if st.session_state['show_modal']:
-        mostrar_revelacion(cartas[0], cartas[1], cartas[2])
\ No newline at end of file
+        mostrar_revelacion(cartas[0], cartas[1], cartas[2])
+
+# Duración de la re-ejecución completa (las que terminan en st.rerun()/st.stop() no llegan aquí)
+metricas.observar("rerun", (time.perf_counter() - inicio_rerun) * 1000.0)
+if arranque.marcar("primer_render"):
+    logger.info(f"⏱️ Arranque: {arranque.reporte()}")
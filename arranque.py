@@ -0,0 +1,103 @@
+"""
+Arranque en frío de app.py: el modelo se carga y se calienta en un hilo
+mientras la página ya se muestra, y se registran los hitos del arranque.
+
+Streamlit no ejecuta app.py al levantar el servidor sino cuando llega la
+primera sesión; el inicio de esa primera ejecución es el cero (`iniciar`):
+
+  imports            app.py terminó sus imports (los SDKs ya no están aquí)
+  primer_render      terminó la primera ejecución completa de app.py
+  modelo_listo       el modelo cargó y ya corrió la inferencia de calentamiento
+  primera_deteccion  regresó la primera detección de una foto o frame real
+
+`reporte()` junta los hitos (segundos desde el cero) con los detalles que se
+pasen al marcarlos (duración de la carga, del calentamiento, de la primera
+detección en sí) para los logs y para /metrics.
+"""
+import threading
+import time
+
+import cv2
+import numpy as np
+
+_lock = threading.Lock()
+_t0 = None
+_hitos = {}         # hito -> segundos desde el cero
+_detalles = {}
+
+
+def iniciar(t0):
+    """Fija el cero (sólo la primera vez: las re-ejecuciones no lo mueven) y marca `imports`."""
+    global _t0
+    with _lock:
+        if _t0 is None:
+            _t0 = t0
+    marcar("imports")
+
+
+def marcar(hito, **detalles):
+    """Registra `hito` la primera vez que se llama; regresa True sólo esa vez."""
+    with _lock:
+        if hito in _hitos:
+            return False
+        _hitos[hito] = time.perf_counter() - (_t0 if _t0 is not None else time.perf_counter())
+        _detalles.update(detalles)
+    return True
+
+
+def reporte():
+    with _lock:
+        out = {f"{hito}_s": round(s, 3) for hito, s in _hitos.items()}
+        out.update(_detalles)
+    return out
+
+
+def foto_de_calentamiento(ancho=640, alto=480):
+    """JPEG gris 4:3 como los de la cámara: pasa por el mismo decode y letterbox que una foto real."""
+    return cv2.imencode(".jpg", np.full((alto, ancho, 3), 114, np.uint8))[1].tobytes()
+
+
+class CargaEnFondo:
+    """
+    Corre `cargar(self)` en un hilo daemon desde que se crea. `cargar` puede
+    ir reportando en qué va con `avanzar()`; `resultado()` espera y regresa lo
+    que regresó, o levanta la excepción con la que falló.
+    """
+
+    def __init__(self, cargar, nombre="carga"):
+        self.estado = "cargando"
+        self.error = None
+        self._valor = None
+        self._listo = threading.Event()
+        self._t0 = time.perf_counter()
+        self._hilo = threading.Thread(target=self._run, args=(cargar,), name=nombre, daemon=True)
+        self._hilo.start()
+
+    def _run(self, cargar):
+        try:
+            self._valor = cargar(self)
+            self.estado = "listo"
+        except Exception as e:
+            self.error = e
+            self.estado = "error"
+        finally:
+            self._listo.set()
+
+    def avanzar(self, estado):
+        self.estado = estado
+
+    def listo(self):
+        """True si ya terminó, bien o con error."""
+        return self._listo.is_set()
+
+    def esperar(self, timeout=None):
+        return self._listo.wait(timeout)
+
+    def transcurrido(self):
+        return time.perf_counter() - self._t0
+
+    def resultado(self):
+        self._listo.wait()
+        if self.error is not None:
+            raise self.error
+        return self._valor
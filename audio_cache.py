@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:   # Windows: sin candado entre procesos, la evicción sigue siendo segura (sólo borra)
+    fcntl = None
+
+
+def audio_key(text, **params):
+    """Llave por contenido: el texto exacto que se sintetiza + voz/modelo/formato/settings."""
+    payload = json.dumps({"text": text, **params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """
+    Caché de audio en dos niveles:
+      - memoria: LRU limitado por bytes (`memory_bytes`, 0 = apagado), por proceso
+      - disco: un archivo por llave en `directory`, compartido entre procesos,
+        con evicción LRU (por mtime) cuando el total pasa de `max_bytes`.
+    """
+
+    def __init__(self, directory=".audio_cache", max_bytes=200 * 1024 * 1024, memory_bytes=16 * 1024 * 1024,
+                 ext=".mp3"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.ext = ext
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._mem = OrderedDict()
+        self._mem_size = 0
+        self._disk_size = self._scan_size()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.ext)
+
+    def _scan(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for e in it:
+                if e.is_file() and e.name.endswith(self.ext):
+                    st = e.stat()
+                    entries.append((st.st_mtime, st.st_size, e.path))
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._scan())
+
+    # -------------------------
+    # Memoria
+    # -------------------------
+    def _remember(self, key, data):
+        if len(data) > self.memory_bytes:
+            return
+        with self._lock:
+            old = self._mem.pop(key, None)
+            if old is not None:
+                self._mem_size -= len(old)
+            self._mem[key] = data
+            self._mem_size += len(data)
+            while self._mem_size > self.memory_bytes:
+                _, dropped = self._mem.popitem(last=False)
+                self._mem_size -= len(dropped)
+
+    # -------------------------
+    # API
+    # -------------------------
+    def get(self, key):
+        with self._lock:
+            data = self._mem.get(key)
+            if data is not None:
+                self._mem.move_to_end(key)
+                self.hits_memory += 1
+                return data
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)   # "tocar" el archivo lo marca como usado recientemente
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits_disk += 1
+        self._remember(key, data)
+        return data
+
+    def put(self, key, data):
+        # Escritura atómica: otro proceso nunca ve un MP3 a medias
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        path = self._path(key)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            # Si la llave ya estaba (otra sesión la generó a la vez) se reemplaza: no crece el disco
+            try:
+                previous = os.path.getsize(path)
+            except OSError:
+                previous = 0
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        self._remember(key, data)
+
+        with self._lock:
+            self._disk_size += len(data) - previous
+            over = self._disk_size > self.max_bytes
+        if over:
+            self._evict()
+
+    def _evict(self):
+        lock_file = open(os.path.join(self.directory, ".lock"), "a")
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            entries = sorted(self._scan())     # más viejo primero
+            total = sum(size for _, size, _ in entries)
+            evicted = 0
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                evicted += 1
+        finally:
+            lock_file.close()
+
+        with self._lock:
+            self._disk_size = total
+            self.evictions += evicted
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "memory_bytes": self._mem_size,
+                "memory_entries": len(self._mem),
+                "disk_bytes": self._disk_size,
+            }
@@ -0,0 +1,239 @@
+"""
+Backends de inferencia para CPU: torch (best.pt tal cual), onnx (ONNX Runtime)
+u openvino. El modelo exportado se guarda una sola vez junto a best.pt, en
+.export_cache/, con una llave que incluye el hash del checkpoint y el imgsz,
+así que cambiar de pesos o de tamaño genera otro artefacto automáticamente.
+
+Verificar que el modelo exportado da la misma carta que el de torch:
+    python backends.py --backend onnx --parity carpeta_de_fotos/
+    python backends.py --backend openvino --int8 --calib frames_calibracion/ --parity carpeta_de_fotos/
+"""
+import argparse
+import glob
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+BACKENDS = ("torch", "onnx", "openvino")
+CACHE_DIRNAME = ".export_cache"
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def _file_hash(path, chunk=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(chunk)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()[:12]
+
+
+def list_images(folder):
+    return sorted(p for p in glob.glob(os.path.join(folder, "**", "*"), recursive=True)
+                  if p.lower().endswith(IMAGE_EXTS))
+
+
+def _calib_hash(calib_dir):
+    h = hashlib.sha256()
+    for p in list_images(calib_dir):
+        h.update(f"{os.path.relpath(p, calib_dir)}:{os.path.getsize(p)}".encode())
+    return h.hexdigest()[:8]
+
+
+def artifact_dir(model_path, backend, imgsz, int8=False, calib_dir=None, dynamic=False):
+    """Carpeta de caché para esta combinación de pesos / backend / imgsz / cuantización."""
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    key = f"{stem}-{_file_hash(model_path)}-{backend}-{imgsz}"
+    if dynamic:
+        key += "-dyn"
+    if int8:
+        key += f"-int8-{_calib_hash(calib_dir)}"
+    return os.path.join(os.path.dirname(os.path.abspath(model_path)), CACHE_DIRNAME, key)
+
+
+def _find_artifact(folder, backend):
+    if backend == "onnx":
+        found = glob.glob(os.path.join(folder, "*.onnx"))
+    else:
+        found = glob.glob(os.path.join(folder, "*_openvino_model"))
+    return found[0] if found else None
+
+
+def _calibration_reader(calib_dir, input_name, imgsz):
+    """Frames de muestra, ya con letterbox, para calibrar la cuantización estática de ONNX."""
+    import cv2
+    import numpy as np
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self):
+            self._paths = iter(list_images(calib_dir))
+
+        def get_next(self):
+            for path in self._paths:
+                img = cv2.imread(path)
+                if img is None:
+                    continue
+                h, w = img.shape[:2]
+                s = min(imgsz / h, imgsz / w)
+                nh, nw = round(h * s), round(w * s)
+                canvas = np.full((imgsz, imgsz, 3), 114, np.uint8)
+                top, left = (imgsz - nh) // 2, (imgsz - nw) // 2
+                canvas[top:top + nh, left:left + nw] = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+                x = canvas[:, :, ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+                return {input_name: np.ascontiguousarray(x)}
+            return None
+
+    return _Reader()
+
+
+def _quantize_onnx(fp32_path, calib_dir, imgsz):
+    import onnxruntime
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+
+    input_name = onnxruntime.InferenceSession(fp32_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    int8_path = fp32_path.replace(".onnx", "_int8.onnx")
+    quantize_static(
+        fp32_path,
+        int8_path,
+        _calibration_reader(calib_dir, input_name, imgsz),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+    os.remove(fp32_path)
+    return int8_path
+
+
+def export_model(model_path, backend, imgsz, int8=False, calib_dir=None, dynamic=False):
+    """
+    Exporta best.pt al backend pedido (sólo la primera vez) y regresa la ruta del artefacto.
+    int8 necesita `calib_dir`: una carpeta con frames representativos de la cámara.
+    """
+    if backend not in BACKENDS or backend == "torch":
+        raise ValueError(f"Backend de exportación desconocido: {backend!r}. Usa 'onnx' u 'openvino'.")
+    if int8 and not (calib_dir and list_images(calib_dir)):
+        raise ValueError("Para int8 hace falta --calib con una carpeta de frames de muestra.")
+
+    final_dir = artifact_dir(model_path, backend, imgsz, int8, calib_dir, dynamic)
+    cached = _find_artifact(final_dir, backend) if os.path.isdir(final_dir) else None
+    if cached:
+        return cached
+
+    from ultralytics import YOLO
+
+    os.makedirs(os.path.dirname(final_dir), exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix="export-", dir=os.path.dirname(final_dir))
+    try:
+        # Exportamos desde una copia para que los archivos salgan en la carpeta de caché y no junto a best.pt
+        pt_copy = shutil.copy2(model_path, work_dir)
+        model = YOLO(pt_copy)
+        print(f"[EXPORT] {os.path.basename(model_path)} -> {backend} imgsz={imgsz}{' int8' if int8 else ''}...")
+
+        if backend == "openvino":
+            data = None
+            if int8:
+                data = os.path.join(work_dir, "calib.yaml")
+                with open(data, "w", encoding="utf-8") as f:
+                    calib = os.path.abspath(calib_dir)
+                    f.write(f"path: {calib}\ntrain: {calib}\nval: {calib}\nnames:\n")
+                    for cls_id, name in model.names.items():
+                        f.write(f"  {cls_id}: '{name}'\n")
+            model.export(format="openvino", imgsz=imgsz, int8=int8, data=data, dynamic=dynamic)
+        else:
+            path = model.export(format="onnx", imgsz=imgsz, dynamic=dynamic, simplify=True)
+            if int8:
+                _quantize_onnx(str(path), calib_dir, imgsz)
+
+        os.remove(pt_copy)
+        os.replace(work_dir, final_dir)
+    except Exception:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+
+    return _find_artifact(final_dir, backend)
+
+
+def load_model(model_path="best.pt", backend="torch", imgsz=640, int8=False, calib_dir=None, dynamic=False):
+    """Regresa un YOLO listo para .predict(), corriendo en el backend pedido."""
+    from ultralytics import YOLO
+
+    if backend == "torch":
+        return YOLO(model_path)
+    return YOLO(export_model(model_path, backend, imgsz, int8, calib_dir, dynamic), task="detect")
+
+
+def _top1(model, img, imgsz, conf):
+    r = model.predict(source=img, imgsz=imgsz, conf=conf, device="cpu", verbose=False)[0]
+    if r.boxes is None or len(r.boxes) == 0:
+        return None
+    confs = r.boxes.conf.detach().cpu().numpy()
+    return r.names[int(r.boxes.cls[int(confs.argmax())])]
+
+
+def check_parity(model_path, backend, imgsz, images_dir, int8=False, calib_dir=None, conf=0.5, dynamic=False):
+    """Compara la carta top-1 de torch contra el backend exportado en un set de prueba."""
+    import cv2
+
+    reference = load_model(model_path, "torch")
+    candidate = load_model(model_path, backend, imgsz, int8, calib_dir, dynamic)
+
+    report = {"images": 0, "agree": 0, "mismatches": [], "ms_torch": 0.0, f"ms_{backend}": 0.0}
+    for path in list_images(images_dir):
+        img = cv2.imread(path)
+        if img is None:
+            continue
+        t0 = time.perf_counter()
+        ref = _top1(reference, img, imgsz, conf)
+        t1 = time.perf_counter()
+        got = _top1(candidate, img, imgsz, conf)
+        t2 = time.perf_counter()
+
+        report["images"] += 1
+        report["ms_torch"] += (t1 - t0) * 1000.0
+        report[f"ms_{backend}"] += (t2 - t1) * 1000.0
+        if ref == got:
+            report["agree"] += 1
+        else:
+            report["mismatches"].append((os.path.relpath(path, images_dir), ref, got))
+
+    n = max(report["images"], 1)
+    report["ms_torch"] /= n
+    report[f"ms_{backend}"] /= n
+    report["agreement"] = report["agree"] / n
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="best.pt")
+    parser.add_argument("--backend", choices=BACKENDS[1:], required=True)
+    parser.add_argument("--imgsz", type=int, default=512)
+    parser.add_argument("--int8", action="store_true", help="cuantizar a int8 (requiere --calib)")
+    parser.add_argument("--calib", help="carpeta de frames para calibrar int8")
+    parser.add_argument("--dynamic", action="store_true", help="exportar con tamaño de entrada dinámico")
+    parser.add_argument("--parity", metavar="CARPETA", help="fotos de prueba para comparar contra torch")
+    parser.add_argument("--conf", type=float, default=0.5)
+    args = parser.parse_args()
+
+    path = export_model(args.model, args.backend, args.imgsz, args.int8, args.calib, args.dynamic)
+    print(f"[EXPORT] Listo: {path}")
+
+    if args.parity:
+        report = check_parity(args.model, args.backend, args.imgsz, args.parity, args.int8, args.calib, args.conf,
+                              args.dynamic)
+        print(f"[PARIDAD] {report['agree']}/{report['images']} iguales ({report['agreement']:.1%}) | "
+              f"torch {report['ms_torch']:.1f} ms vs {args.backend} {report[f'ms_{args.backend}']:.1f} ms")
+        for name, ref, got in report["mismatches"]:
+            print(f"  {name}: torch={ref} {args.backend}={got}")
+        if report["mismatches"]:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Captura continua para app.py: en lugar de una foto por clic, los frames llegan
+solos (cámara del navegador vía streamlit-webrtc, o una fuente local) y cada
+carta se captura en cuanto el estabilizador (el mismo de Vision.py, ver
+config_captura.py) la confirma.
+
+  - `recibir(frame)` sólo deja el frame en un LatestSlot: si la inferencia va
+    ocupada el frame anterior se tira, nunca se encola
+  - un hilo toma el más reciente a lo más `max_fps` veces por segundo (el
+    servidor pone el ritmo, no el navegador), corre el modelo y vota
+  - cada carta estable nueva queda en `capturas` para que la UI la recoja
+
+`FuenteLocal` alimenta la captura desde el servidor, sin navegador: una
+webcam por índice, un video (en loop) o una carpeta de fotos que se
+"sostienen" frente a la cámara unos segundos cada una.
+
+    CAMARA_CONTINUA=1 streamlit run app.py
+    CAMARA_CONTINUA=1 CAMARA_FUENTE=fotos_cartas/ streamlit run app.py
+    python -m tools.e2e_captura --fuente fotos_cartas/ --segundos 20
+"""
+import glob
+import logging
+import os
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from config_captura import COOLDOWN_S, MOTION_GATE, MOTION_MAX_SKIP_S, MOTION_THRESHOLD, make_card_stabilizer
+from motion import MotionGate
+from pipeline import LatestSlot, StageStats
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONES_IMAGEN = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+class CapturaContinua:
+    """
+    Una por sesión. `predict(frame)` regresa Detections (en app.py, el
+    BatchingInferenceServer compartido). El hilo de inferencia se apaga solo
+    tras `inactivo_s` sin frames y `recibir` lo vuelve a levantar.
+    """
+
+    def __init__(self, detector, predict, max_fps=5.0, motion_gate=MOTION_GATE, inactivo_s=30.0):
+        self.detector = detector
+        self.predict = predict
+        self.intervalo_s = 1.0 / max_fps
+        self.inactivo_s = inactivo_s
+        self.capturas = queue.Queue()       # nombres de cartas recién estabilizadas
+        self.gate = MotionGate(MOTION_THRESHOLD, MOTION_MAX_SKIP_S) if motion_gate else None
+        self.recibidos = StageStats("recibidos")
+        self.inferidos = StageStats("inferencia")
+        self.errores = 0
+        self.total_capturas = 0
+        self._frames = LatestSlot()
+        self._lock = threading.Lock()
+        self._stabilizer = make_card_stabilizer(detector.names)
+        self._dets = None
+        self._stable_id = None
+        self._anunciada = None
+        self._t_anunciada = 0.0
+        self._hilo = None
+
+    def recibir(self, frame):
+        """Frame BGR de la cámara. No bloquea: si hay uno pendiente se sobrescribe."""
+        self.recibidos.tick()
+        self._frames.put(frame)
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._run, name="captura-continua", daemon=True)
+                self._hilo.start()
+
+    def _run(self):
+        while True:
+            frame = self._frames.get(timeout=self.inactivo_s)
+            if frame is None:       # sin frames (sesión cerrada o cámara apagada) o cerrado
+                return
+            t0 = time.perf_counter()
+            self._paso(frame)
+            # Tope de ritmo: lo que llegue mientras tanto se sobrescribe en el slot
+            espera = self.intervalo_s - (time.perf_counter() - t0)
+            if espera > 0:
+                time.sleep(espera)
+
+    def _paso(self, frame):
+        dets = self._dets
+        if dets is None or self.gate is None or self.gate.should_run(frame):
+            try:
+                dets = self.predict(frame)
+            except Exception as e:
+                self.errores += 1
+                logger.warning(f"Captura continua: falló la inferencia: {e}")
+                return
+            self.inferidos.tick()
+        # Escena sin cambios: las mismas detecciones siguen votando, como en Vision.py
+
+        best_id, best_conf, _ = self.detector.best(dets)
+        with self._lock:
+            stable_id = self._stabilizer.update(best_id, best_conf or 0.0)
+            self._dets, self._stable_id = dets, stable_id
+            nueva = self._anunciar(stable_id)
+        if nueva is not None:
+            self.total_capturas += 1
+            self.capturas.put(nueva)
+
+    def _anunciar(self, stable_id):
+        """Mismo criterio que _Announcer de Vision.py: carta estable distinta y fuera del cooldown."""
+        now = time.time()
+        if stable_id is None or stable_id == self._anunciada or now - self._t_anunciada < COOLDOWN_S:
+            return None
+        self._anunciada, self._t_anunciada = stable_id, now
+        return self.detector.label(stable_id)
+
+    def pendientes(self):
+        """Las capturas nuevas desde la última llamada, en orden."""
+        out = []
+        while True:
+            try:
+                out.append(self.capturas.get_nowait())
+            except queue.Empty:
+                return out
+
+    def reiniciar(self):
+        """Lectura nueva: se olvidan los votos y la última carta, para poder volver a capturarla."""
+        with self._lock:
+            self._stabilizer = make_card_stabilizer(self.detector.names)
+            self._dets = self._stable_id = self._anunciada = None
+            self._t_anunciada = 0.0
+        self.pendientes()
+
+    def dibujar(self, frame):
+        """Copia del frame con las últimas cajas (verde = la carta estable)."""
+        with self._lock:
+            dets, stable_id = self._dets, self._stable_id
+        out = frame.copy()
+        if dets is None:
+            return out
+        for box, conf, cls_id in zip(*dets):
+            x1, y1, x2, y2 = (int(v) for v in box)
+            color = (0, 200, 0) if cls_id == stable_id else (0, 165, 255)
+            cv2.rectangle(out, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(out, f"{self.detector.label(int(cls_id))} {conf:.2f}", (x1, max(y1 - 8, 15)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2, cv2.LINE_AA)
+        return out
+
+    def cerrar(self):
+        self._frames.close()
+
+    def stats(self):
+        gate = self.gate
+        return {
+            "recibidos": self.recibidos.total,
+            "tirados": self._frames.dropped,
+            "inferencias": self.inferidos.total,
+            "fps_recibidos": round(self.recibidos.fps, 1),
+            "fps_inferencia": round(self.inferidos.fps, 1),
+            "saltados_gate": gate.skipped if gate is not None else 0,
+            "errores": self.errores,
+            "capturas": self.total_capturas,
+        }
+
+
+class FuenteLocal:
+    """
+    Manda frames a `destino(frame)` a `fps` desde un hilo:
+      - "0", "1"...: webcam por índice
+      - carpeta o imagen: cada foto se sostiene `sostener_s` segundos con un
+        poco de ruido, como si alguien la mostrara a la cámara
+      - cualquier otra ruta: video con cv2.VideoCapture, en loop
+
+    Se detiene sola si nadie llama `latido()` en `inactivo_s` (p. ej. la sesión
+    de Streamlit que la creó se cerró); `None` lo desactiva.
+    """
+
+    def __init__(self, fuente, destino, fps=15.0, sostener_s=2.0, ruido=6, inactivo_s=None):
+        self.fuente = str(fuente)
+        self.destino = destino
+        self.intervalo_s = 1.0 / fps
+        self.sostener_s = sostener_s
+        self.ruido = ruido
+        self.inactivo_s = inactivo_s
+        self.ultimo = None          # último frame mandado (para una vista previa)
+        self.enviados = 0
+        self._latido = time.monotonic()
+        self._stop = threading.Event()
+        self._hilo = threading.Thread(target=self._run, name="fuente-local", daemon=True)
+        self._hilo.start()
+
+    def latido(self):
+        self._latido = time.monotonic()
+
+    def activa(self):
+        return self._hilo.is_alive()
+
+    def _imagenes(self):
+        if os.path.isdir(self.fuente):
+            rutas = sorted(p for p in glob.glob(os.path.join(self.fuente, "*"))
+                           if p.lower().endswith(EXTENSIONES_IMAGEN))
+        elif self.fuente.lower().endswith(EXTENSIONES_IMAGEN):
+            rutas = [self.fuente]
+        else:
+            return None
+        imagenes = [img for img in (cv2.imread(p) for p in rutas) if img is not None]
+        if not imagenes:
+            raise ValueError(f"No encontré imágenes en {self.fuente!r}")
+        return imagenes
+
+    def _frames_fotos(self, imagenes):
+        rng = np.random.default_rng()
+        por_foto = max(1, round(self.sostener_s / self.intervalo_s))
+        while True:
+            for img in imagenes:
+                for _ in range(por_foto):
+                    if self.ruido:
+                        ruido = rng.integers(0, self.ruido, img.shape, dtype=np.uint8)
+                        yield cv2.add(img, ruido)
+                    else:
+                        yield img
+
+    def _frames_captura(self):
+        fuente = int(self.fuente) if self.fuente.isdigit() else self.fuente
+        cap = cv2.VideoCapture(fuente)
+        if not cap.isOpened():
+            raise ValueError(f"No pude abrir la fuente de video {self.fuente!r}")
+        try:
+            while True:
+                ok, frame = cap.read()
+                if not ok:
+                    if isinstance(fuente, int):
+                        return
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)     # fin del video: otra vuelta
+                    continue
+                yield frame
+        finally:
+            cap.release()
+
+    def _run(self):
+        try:
+            imagenes = self._imagenes()
+            frames = self._frames_fotos(imagenes) if imagenes is not None else self._frames_captura()
+            siguiente = time.perf_counter()
+            for frame in frames:
+                if self._stop.is_set():
+                    return
+                if self.inactivo_s is not None and time.monotonic() - self._latido > self.inactivo_s:
+                    logger.info(f"Fuente local {self.fuente!r} sin latido, me detengo")
+                    return
+                self.ultimo = frame
+                self.destino(frame)
+                self.enviados += 1
+                siguiente += self.intervalo_s
+                time.sleep(max(0.0, siguiente - time.perf_counter()))
+        except Exception as e:
+            logger.error(f"Fuente local {self.fuente!r}: {e}")
+
+    def cerrar(self):
+        self._stop.set()
+        self._hilo.join(timeout=2.0)
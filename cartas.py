@@ -0,0 +1,94 @@
+# Diccionario con significados divertidos/místicos para cada carta
+SIGNIFICADOS = {
+    "Apache": "enfrentarás un conflicto ajeno",
+    "Arana": "tejerás una red de mentiras (o de éxito)",
+    "Arbol": "echarás raíces donde menos lo esperas",
+    "Bandera": "tendrás que defender tus ideales",
+    "Bandolon": "vendrá música y fiesta a tu vida",
+    "Barrilito": "cuidado con los excesos este fin de semana",
+    "Botella": "una verdad saldrá a la luz (o una bebida)",
+    "Calavera": "un cambio radical y necesario se acerca",
+    "Camaron": "si te duermes, te llevará la corriente",
+    "Campana": "recibirás una noticia resonante",
+    "Catrin": "conocerás a alguien elegante pero engañoso",
+    "Cazo": "cocinarás un proyecto importante",
+    "Chalupa": "un viaje pequeño te cambiará el ánimo",
+    "Corazon": "el amor tocará a tu puerta (o la de tu vecino)",
+    "Corona": "recibirás el reconocimiento que mereces",
+    "Cotorro": "cuidado con hablar de más",
+    "Dama": "una mujer influyente te ayudará",
+    "Diablito": "una tentación pondrá a prueba tu voluntad",
+    "Escalera": "subirás de nivel, pero paso a paso",
+    "Estrella": "tienes una guía divina, confía en tu suerte",
+    "Gallo": "te despertarás temprano con nuevas ideas",
+    "Garza": "necesitas equilibrio y paciencia",
+    "Gorrito": "tendrás que proteger tus ideas",
+    "Luna": "secretos románticos bajo la noche",
+    "Mano": "recibirás ayuda inesperada",
+    "Melon": "la vida será dulce contigo",
+    "Muerte": "deja ir lo viejo para que entre lo nuevo",
+    "Mundo": "el éxito global está en tus manos",
+    "Pajaro": "noticias vuelan hacia ti",
+    "Paraguas": "protégete de las malas vibras",
+    "Rosa": "florecerá una nueva amistad",
+    "Sirena": "no te dejes llevar por cantos falsos",
+    "Sol": "energía y vitalidad llenarán tu semana",
+    "Soldado": "necesitas disciplina para lograr tu meta",
+    "Tambor": "tus pasos harán mucho ruido",
+    "Valiente": "enfrenta ese miedo ahora mismo",
+    "Venado": "se rápido y astuto en los negocios",
+    "Violencello": "la armonía regresará a tu hogar"
+}
+
+# Descripciones divertidas para cada carta al detectarla
+DESCRIPCIONES = {
+    "Apache": "¡Órale! El Apache es un guerrero legendario. Trae energía de batalla, pero cuida de no meterte en pleitos que no son tuyos.",
+    "Arana": "¡Uuuy! La Araña... Cuidado con tejer mentiras, porque te puedes enredar solito. O quizás estés tejiendo tu imperio.",
+    "Arbol": "¡Perfecto! El Árbol representa estabilidad. Vas a echar raíces donde menos lo esperas. ¡A crecer se ha dicho!",
+    "Bandera": "¡Órale! La Bandera es símbolo de patriotismo y valores. Prepárate para defender lo que crees, aunque sea la última dona.",
+    "Bandolon": "¡Ay sí! El Bandolón trae música y fiesta. Se viene la pachanga, prepara tus mejores pasos de baile.",
+    "Barrilito": "¡Aguas! El Barrilito te advierte que no te pases de copas este fin. O sí, pero no digas que no te avisé.",
+    "Botella": "¡Chin! La Botella siempre trae secretos. Una verdad saldrá a flote... o será solo una chela más.",
+    "Calavera": "¡No te espantes! La Calavera no es mala, significa transformación. Algo viejo se va, algo nuevo llega. Así es la vida.",
+    "Camaron": "¡Ojo vivo! El Camarón dice que el que se duerme, se lo lleva la corriente. ¡Ponte trucha!",
+    "Campana": "¡Tan tan! La Campana anuncia noticias importantes. Puede ser buena o mala, pero resonará fuerte.",
+    "Catrin": "¡Elegante! El Catrín es todo un galán, pero cuidado, puede ser puro farol. No todo lo que brilla es oro.",
+    "Cazo": "¡A cocinar! El Cazo significa que vas a preparar algo importante. Un proyecto, una idea... o unos chilaquiles épicos.",
+    "Chalupa": "¡Súbete! La Chalupa trae viajes pequeños pero significativos. Un paseo corto puede cambiarte el día.",
+    "Corazon": "¡Ay amor! El Corazón nunca miente. Alguien está pensando en ti... o tú en alguien. Cupido anda cerca.",
+    "Corona": "¡Eres el rey/reina! La Corona trae reconocimiento y éxito. Te vas a lucir como nunca.",
+    "Cotorro": "¡Shhhh! El Cotorro te recuerda que a veces es mejor quedarse callado. No vayas a echar chisme de más.",
+    "Dama": "¡Elegancia pura! La Dama representa a una mujer importante en tu vida. Escucha sus consejos.",
+    "Diablito": "¡Ay picarón! El Diablito trae tentaciones. Esa voz en tu cabeza que dice 'dale, no pasa nada'... ¡Cuidado!",
+    "Escalera": "¡Pa' arriba! La Escalera significa progreso. Vas a subir, pero paso a paso, sin prisas pero sin pausas.",
+    "Estrella": "¡Brillas! La Estrella es la mejor carta. Tienes suerte divina de tu lado. Aprovéchala, campeón.",
+    "Gallo": "¡Quiquiriquí! El Gallo te despertará con ideas frescas. Madruga y atrapa esas oportunidades.",
+    "Garza": "¡Paciencia! La Garza te enseña que el equilibrio es clave. No te apresures, observa y actúa con calma.",
+    "Gorrito": "¡Protégete! El Gorrito significa que debes cuidar tus ideas y pensamientos. No andes compartiendo todo.",
+    "Luna": "¡Romántico! La Luna trae secretos nocturnos. Algo misterioso sucederá bajo su luz.",
+    "Mano": "¡Te echan la mano! La Mano significa ayuda inesperada. Alguien aparecerá justo cuando lo necesites.",
+    "Melon": "¡Dulce vida! El Melón trae sabor y buenos momentos. Disfruta lo bueno que viene.",
+    "Muerte": "¡No te asustes! La Muerte es cambio, no final. Algo viejo se va para dar paso a lo nuevo. Es bueno.",
+    "Mundo": "¡Todo es tuyo! El Mundo representa éxito total. Tienes el poder de lograr lo que quieras.",
+    "Pajaro": "¡Tweet tweet! El Pájaro trae noticias frescas. Alguien te va a buscar o tú buscarás a alguien.",
+    "Paraguas": "¡Protección! El Paraguas te cubre de las malas vibras. Eres inmune a la envidia, eres blindado.",
+    "Rosa": "¡Qué bonito! La Rosa trae nuevas amistades o amor floreciente. Algo hermoso está creciendo.",
+    "Sirena": "¡Aguas! La Sirena canta bonito pero engaña. No te dejes llevar por promesas falsas.",
+    "Sol": "¡Qué energía! El Sol te llena de vitalidad. Vas a brillar con luz propia esta semana.",
+    "Soldado": "¡Disciplina! El Soldado te recuerda que sin orden no hay progreso. Ponte las pilas.",
+    "Tambor": "¡Retumba! El Tambor significa que tus acciones harán ruido. Todo mundo se va a enterar.",
+    "Valiente": "¡Échale ganas! El Valiente te dice que enfrentes ese miedo de una vez. Tú puedes.",
+    "Venado": "¡Rápido! El Venado es velocidad y astucia. Muévete rápido en los negocios y llegarás lejos.",
+    "Violencello": "¡Armonía! El Violoncello trae paz al hogar. La música y la tranquilidad regresan a tu vida."
+}
+
+# Mapeo solicitado: traducir ciertas etiquetas numéricas a nombres de lotería
+RENAME_MAP = {
+    "2": "melon",
+    "0": "catrin",
+    "4": "paraguas",
+    "7": "escaleras",
+    "5": "soldado",
+    "8": "muerte",
+    "9": "rosa"
+}
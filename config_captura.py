@@ -0,0 +1,30 @@
+"""
+Ajustes de captura compartidos por Vision.py (cámara local) y
+captura_continua.py (captura continua de app.py): cuándo una carta queda
+confirmada, cada cuánto se puede anunciar otra y cuándo vale la pena correr
+YOLO. Viven aquí para que la app no tenga que importar el CLI de Vision.py.
+"""
+from stabilizer import make_stabilizer
+
+# Estabilidad (para que no “parpadee” el nombre)
+HISTORY = 12              # frames a considerar
+MIN_HITS = 7              # mínimo de frames (de HISTORY) con la misma carta para “confirmar”
+COOLDOWN_S = 1.0          # segundos para volver a anunciar otra carta
+STABILITY_POLICY = "majority"  # "majority" (HISTORY/MIN_HITS), "ema" o "hysteresis"
+EMA_ALPHA = 0.3           # ema/hysteresis: peso del frame nuevo
+ENTER_SCORE = 0.45        # ema/hysteresis: confianza promedio para confirmar
+EXIT_SCORE = 0.2          # hysteresis: por debajo de esto se suelta la carta
+
+# Motion gate: no correr YOLO si la escena no cambió
+MOTION_GATE = True
+MOTION_THRESHOLD = 4.0    # diferencia promedio por pixel (0-255) en la miniatura gris para considerar "cambio"
+MOTION_MAX_SKIP_S = 1.0   # aunque no haya cambios, refrescar la inferencia al menos cada tantos segundos
+
+
+def make_card_stabilizer(names):
+    """Estabilizador con la política de arriba, uno por carta (o por sesión) según quien lo use."""
+    if STABILITY_POLICY == "majority":
+        return make_stabilizer("majority", len(names), history=HISTORY, min_hits=MIN_HITS)
+    if STABILITY_POLICY == "hysteresis":
+        return make_stabilizer("hysteresis", len(names), alpha=EMA_ALPHA, enter=ENTER_SCORE, exit=EXIT_SCORE)
+    return make_stabilizer(STABILITY_POLICY, len(names), alpha=EMA_ALPHA, threshold=ENTER_SCORE)
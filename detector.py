@@ -0,0 +1,129 @@
+import unicodedata
+from collections import namedtuple
+
+import numpy as np
+
+from backends import load_model
+from cartas import RENAME_MAP, SIGNIFICADOS
+from tracker import iou_matrix
+
+IMGSZ = 512
+IOU = 0.5
+SPREAD_IOU = 0.3    # distinct(): traslape a partir del cual dos cajas son la misma carta física
+
+# Cajas de una imagen como arreglos numpy: xyxy (N,4), conf (N,), cls (N,)
+Detections = namedtuple("Detections", "xyxy conf cls")
+EMPTY = Detections(np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int64))
+
+
+def _normalize(name):
+    sin_acentos = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    return sin_acentos.strip().lower()
+
+
+def canonical_names(model_names, rename_map=RENAME_MAP, known=SIGNIFICADOS):
+    """
+    Tabla id de clase -> nombre canónico de la carta (las llaves de SIGNIFICADOS).
+
+    Aplica RENAME_MAP y luego empata sin importar mayúsculas, acentos ni el
+    plural ("escaleras" -> "Escalera"). Lo que no empata se capitaliza, como
+    hacía app.py, y queda marcado como desconocido.
+    """
+    by_norm = {_normalize(k): k for k in known}
+    names, is_known = [], []
+    for cls_id in range(len(model_names)):
+        raw = model_names[cls_id]
+        mapped = rename_map.get(raw, raw)
+        norm = _normalize(mapped)
+        match = by_norm.get(norm) or (by_norm.get(norm[:-1]) if norm.endswith("s") else None)
+        names.append(match or mapped.capitalize())
+        is_known.append(match is not None)
+    return names, is_known
+
+
+class Detector:
+    """
+    YOLO + post-proceso compartido por Vision.py y app.py.
+
+    Los nombres se resuelven una sola vez al cargar; por cada imagen el
+    post-proceso es una sola copia del tensor de cajas a numpy, sin loops de
+    Python por caja.
+    """
+
+    def __init__(self, model_path="best.pt", backend="torch", imgsz=IMGSZ, conf=0.5, iou=IOU,
+                 device="cpu", **backend_kwargs):
+        self.model = load_model(model_path, backend, imgsz, **backend_kwargs)
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou = iou
+        self.device = device
+        self.names, self.known = canonical_names(self.model.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def label(self, cls_id):
+        return None if cls_id is None else self.names[cls_id]
+
+    def _predict(self, source, imgsz):
+        return self.model.predict(
+            source=source,
+            imgsz=imgsz or self.imgsz,
+            conf=self.conf,
+            iou=self.iou,
+            device=self.device,
+            verbose=False
+        )
+
+    def _to_detections(self, r):
+        data = r.boxes.data if r.boxes is not None else None
+        if data is None or len(data) == 0:
+            return EMPTY
+        data = data.detach().cpu().numpy()
+        return Detections(data[:, :4], data[:, 4], data[:, 5].astype(np.int64))
+
+    def predict(self, frame, imgsz=None):
+        """Detecciones de una imagen BGR."""
+        r = self._predict(frame, imgsz)[0]
+        return self._to_detections(r)
+
+    def predict_batch(self, frames, imgsz=None):
+        """Detecciones de varias imágenes en una sola pasada del modelo."""
+        frames = list(frames)
+        if not frames:
+            return []
+        return [self._to_detections(r) for r in self._predict(frames, imgsz)]
+
+    def best(self, dets):
+        """(id de clase, confianza, caja) de la detección más segura, o (None, None, None)."""
+        if len(dets.conf) == 0:
+            return None, None, None
+        i = int(dets.conf.argmax())
+        return int(dets.cls[i]), float(dets.conf[i]), dets.xyxy[i]
+
+    def distinct(self, dets, k=3, min_conf=None, iou=SPREAD_IOU, known_only=True):
+        """
+        Hasta `k` cartas distintas de una sola imagen, ordenadas de izquierda a
+        derecha por el centro de su caja: [(id de clase, confianza, caja)].
+
+        De la más segura a la menos: se salta una clase ya tomada y una caja que
+        se encima (IoU >= `iou`) con otra ya tomada aunque sea de otra clase
+        (NMS sin clase: dos etiquetas sobre el mismo cartón son una sola carta).
+        """
+        min_conf = self.conf if min_conf is None else min_conf
+        order = np.argsort(-dets.conf)
+        order = order[dets.conf[order] >= min_conf]
+        if known_only:
+            order = order[np.asarray(self.known, bool)[dets.cls[order]]]
+        overlaps = iou_matrix(dets.xyxy[order], dets.xyxy[order]) >= iou
+        taken, classes = [], set()
+        for pos, i in enumerate(order):
+            cls_id = int(dets.cls[i])
+            if cls_id in classes or any(overlaps[pos, p] for p, _ in taken):
+                continue
+            taken.append((pos, i))
+            classes.add(cls_id)
+            if len(taken) == k:
+                break
+        cards = [(int(dets.cls[i]), float(dets.conf[i]), dets.xyxy[i]) for _, i in taken]
+        return sorted(cards, key=lambda card: card[2][0] + card[2][2])
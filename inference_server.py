@@ -0,0 +1,118 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import metricas
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    i = min(int(q * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[i]
+
+
+class _Request:
+    __slots__ = ("frame", "future", "t_submit")
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.future = Future()
+        self.t_submit = time.perf_counter()
+
+
+class BatchingInferenceServer:
+    """
+    Servicio de inferencia dentro del proceso, compartido por todas las sesiones
+    de Streamlit.
+
+    Un solo hilo es dueño del modelo: junta las peticiones que llegan dentro de
+    `window_ms` desde la primera (o hasta `max_batch`), las corre como un batch
+    con `Detector.predict_batch` y resuelve el Future de cada una. Así las
+    sesiones no se pelean por el pool de hilos de torch y el costo fijo por
+    llamada se reparte en el batch.
+    """
+
+    def __init__(self, detector, max_batch=8, window_ms=8.0, stats_window=2000):
+        self.detector = detector
+        self.max_batch = max_batch
+        self.window_s = window_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._queue_wait_ms = deque(maxlen=stats_window)
+        self._latency_ms = deque(maxlen=stats_window)
+        self._batch_sizes = deque(maxlen=stats_window)
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+        self._thread = threading.Thread(target=self._run, name="inference-server", daemon=True)
+        self._thread.start()
+
+    def submit(self, frame):
+        """Encola una imagen BGR; regresa un Future con sus Detections."""
+        req = _Request(frame)
+        self._queue.put(req)
+        return req.future
+
+    def predict(self, frame, timeout=None):
+        """Atajo síncrono: encola y espera el resultado."""
+        return self.submit(frame).result(timeout)
+
+    def _collect(self):
+        first = self._queue.get()
+        batch = [first]
+        deadline = first.t_submit + self.window_s
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            t_start = time.perf_counter()
+            try:
+                results = self.detector.predict_batch([req.frame for req in batch])
+            except Exception as e:
+                with self._lock:
+                    self.errors += len(batch)
+                for req in batch:
+                    req.future.set_exception(e)
+                continue
+
+            t_done = time.perf_counter()
+            metricas.observar("modelo", (t_done - t_start) * 1000.0)
+            for req, dets in zip(batch, results):
+                req.future.set_result(dets)
+
+            with self._lock:
+                self.requests += len(batch)
+                self.batches += 1
+                self._batch_sizes.append(len(batch))
+                for req in batch:
+                    self._queue_wait_ms.append((t_start - req.t_submit) * 1000.0)
+                    self._latency_ms.append((t_done - req.t_submit) * 1000.0)
+
+    def stats(self):
+        """Resumen para logs/métricas: tamaño de batch, espera en cola y latencia por petición."""
+        with self._lock:
+            waits = sorted(self._queue_wait_ms)
+            lats = sorted(self._latency_ms)
+            sizes = list(self._batch_sizes)
+            out = {"requests": self.requests, "batches": self.batches, "errors": self.errors}
+        out.update({
+            "queue_depth": self._queue.qsize(),
+            "batch_size_avg": sum(sizes) / len(sizes) if sizes else 0.0,
+            "batch_size_max": max(sizes, default=0),
+            "queue_wait_ms_p50": _percentile(waits, 0.50),
+            "queue_wait_ms_p95": _percentile(waits, 0.95),
+            "latency_ms_p50": _percentile(lats, 0.50),
+            "latency_ms_p95": _percentile(lats, 0.95),
+            "latency_ms_p99": _percentile(lats, 0.99),
+        })
+        return out
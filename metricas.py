@@ -0,0 +1,315 @@
+"""
+Métricas del proceso en formato Prometheus, apagadas por defecto.
+
+Con METRICAS=1 se activan:
+  - spans: `with span("decode"):` o `@medido("narrativa")` alimentan un
+    histograma de latencias por nombre (oraculo_span_seconds{span="..."})
+  - contadores y gauges: `contar("cache", fuente="audio", resultado="hit")`,
+    `gauge("modelo_carga_segundos", 3.2)`
+  - fuentes: funciones que regresan un dict (los stats() de Upstream, Carrera,
+    BatchingInferenceServer, AudioCache...) y se leen al momento del scrape
+  - memoria del proceso (RSS) y uptime, también al momento del scrape
+
+`servir(puerto)` expone /metrics en 127.0.0.1 desde un hilo. Con
+METRICAS_PERFIL=1 un hilo muestrea las pilas de todos los hilos cada
+`intervalo_s` y /perfil regresa los conteos en formato "folded" (una pila
+por línea, lista para flamegraph.pl o speedscope).
+
+Apagado, `span()` regresa un contexto nulo compartido, `medido()` regresa la
+función tal cual y `contar`/`gauge`/`observar` salen en la primera línea.
+
+    METRICAS=1 METRICAS_PUERTO=9464 streamlit run app.py
+    curl -s 127.0.0.1:9464/metrics | grep oraculo_span
+    curl -s 127.0.0.1:9464/perfil > perfil.folded      # con METRICAS_PERFIL=1
+"""
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from upstream import LatencyHistogram
+
+ACTIVO = os.getenv("METRICAS", "0") == "1"
+PREFIJO = "oraculo"
+# Cubetas (ms) para spans: de un decode de milisegundos a una lectura de varios segundos
+SPAN_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+_NULO = nullcontext()
+_lock = threading.Lock()
+_histogramas = {}                   # nombre de span -> LatencyHistogram
+_contadores = defaultdict(float)    # (nombre, labels) -> valor
+_gauges = {}                        # (nombre, labels) -> valor
+_fuentes = {}                       # nombre -> fn() -> dict
+_inicio = time.time()
+_perfilador = None
+
+
+def activar(activo=True):
+    """Prende/apaga las métricas en tiempo de ejecución (las de `medido` se deciden al decorar)."""
+    global ACTIVO
+    ACTIVO = activo
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def observar(nombre, ms):
+    """Agrega una duración (ms) al histograma del span `nombre`."""
+    if not ACTIVO:
+        return
+    hist = _histogramas.get(nombre)
+    if hist is None:
+        with _lock:
+            hist = _histogramas.setdefault(nombre, LatencyHistogram(SPAN_BUCKETS_MS))
+    hist.observe(ms)
+
+
+class _Span:
+    __slots__ = ("nombre", "t0")
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        # También cuenta si salió con excepción (p. ej. st.rerun() dentro del span)
+        observar(self.nombre, (time.perf_counter() - self.t0) * 1000.0)
+
+
+def span(nombre):
+    """`with span("decode"):` mide el bloque. Apagado es un contexto nulo compartido."""
+    return _Span(nombre) if ACTIVO else _NULO
+
+
+def medido(nombre):
+    """Decorador: mide cada llamada como el span `nombre`. Apagado regresa la función sin envolver."""
+    def decorador(fn):
+        if not ACTIVO:
+            return fn
+
+        @functools.wraps(fn)
+        def envuelta(*args, **kwargs):
+            with _Span(nombre):
+                return fn(*args, **kwargs)
+        return envuelta
+    return decorador
+
+
+def contar(nombre, n=1, **labels):
+    if not ACTIVO:
+        return
+    with _lock:
+        _contadores[(nombre, _labels(labels))] += n
+
+
+def gauge(nombre, valor, **labels):
+    if not ACTIVO:
+        return
+    with _lock:
+        _gauges[(nombre, _labels(labels))] = valor
+
+
+def fuente(nombre, fn):
+    """Registra `fn() -> dict`; sus valores numéricos se exportan como gauges oraculo_<nombre>_<llave>."""
+    with _lock:
+        _fuentes[nombre] = fn
+
+
+def histogramas():
+    """{nombre de span: LatencyHistogram} con lo observado hasta ahora."""
+    with _lock:
+        return dict(_histogramas)
+
+
+def reiniciar():
+    """Borra spans, contadores y gauges (las fuentes se quedan), p. ej. entre fases de una prueba de carga."""
+    with _lock:
+        _histogramas.clear()
+        _contadores.clear()
+        _gauges.clear()
+
+
+def rss_bytes():
+    """Memoria residente actual (de /proc en Linux; si no, el pico de getrusage; 0 en Windows)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def _nombre(*partes):
+    crudo = "_".join((PREFIJO,) + partes)
+    return "".join(c if c.isalnum() or c == "_" else "_" for c in crudo)
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in labels) + "}"
+
+
+def _num(valor):
+    if isinstance(valor, bool):
+        return float(valor)
+    if isinstance(valor, (int, float)):
+        return valor
+    return None
+
+
+def exponer():
+    """Todas las métricas en el formato de texto de Prometheus."""
+    lineas = []
+    with _lock:
+        histogramas = dict(_histogramas)
+        contadores = dict(_contadores)
+        gauges = dict(_gauges)
+        fuentes = dict(_fuentes)
+
+    if histogramas:
+        nombre = _nombre("span_seconds")
+        lineas += [f"# HELP {nombre} Duración de cada etapa instrumentada.", f"# TYPE {nombre} histogram"]
+        for span_nombre, hist in sorted(histogramas.items()):
+            for limite_ms, acumulado in hist.buckets():
+                le = "+Inf" if limite_ms == float("inf") else f"{limite_ms / 1000.0:g}"
+                lineas.append(f'{nombre}_bucket{_fmt_labels((("span", span_nombre), ("le", le)))} {acumulado}')
+            etiqueta = _fmt_labels((("span", span_nombre),))
+            lineas.append(f"{nombre}_sum{etiqueta} {hist.sum_ms / 1000.0:.6f}")
+            lineas.append(f"{nombre}_count{etiqueta} {hist.count}")
+
+    for tipo, valores, sufijo in (("counter", contadores, "_total"), ("gauge", gauges, "")):
+        por_nombre = defaultdict(list)
+        for (n, labels), valor in valores.items():
+            por_nombre[n].append((labels, valor))
+        for n, filas in sorted(por_nombre.items()):
+            nombre = _nombre(n) + sufijo
+            lineas.append(f"# TYPE {nombre} {tipo}")
+            lineas += [f"{nombre}{_fmt_labels(labels)} {valor}" for labels, valor in sorted(filas)]
+
+    for fuente_nombre, fn in sorted(fuentes.items()):
+        try:
+            stats = fn()
+        except Exception as e:
+            lineas.append(f"# fuente {fuente_nombre} falló: {e}")
+            continue
+        for llave, valor in stats.items():
+            valor_num = _num(valor)
+            if valor_num is not None:
+                lineas.append(f"{_nombre(fuente_nombre, llave)} {valor_num}")
+            elif isinstance(valor, str):
+                # Estados como el del breaker: una serie con el valor como label
+                lineas.append(f"{_nombre(fuente_nombre, llave)}{_fmt_labels((('valor', valor),))} 1")
+
+    lineas.append(f"{_nombre('proceso_rss_bytes')} {rss_bytes()}")
+    lineas.append(f"{_nombre('proceso_uptime_segundos')} {time.time() - _inicio:.1f}")
+    lineas.append(f"{_nombre('proceso_hilos')} {threading.active_count()}")
+    return "\n".join(lineas) + "\n"
+
+
+class Perfilador:
+    """
+    Perfilador por muestreo: cada `intervalo_s` toma las pilas de todos los hilos
+    (sys._current_frames) y cuenta cada pila completa. Cuesta una pasada por los
+    frames de cada hilo por muestra; sólo corre si se pide.
+    """
+
+    def __init__(self, intervalo_s=0.01, max_profundidad=64):
+        self.intervalo_s = intervalo_s
+        self.max_profundidad = max_profundidad
+        self.muestras = 0
+        self._pilas = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._hilo = threading.Thread(target=self._run, name="perfilador", daemon=True)
+        self._hilo.start()
+
+    def _run(self):
+        propio = threading.get_ident()
+        nombres = {}
+        while not self._stop.wait(self.intervalo_s):
+            for hilo in threading.enumerate():
+                nombres[hilo.ident] = hilo.name
+            pilas = []
+            for ident, frame in sys._current_frames().items():
+                if ident == propio:
+                    continue
+                marcos = []
+                while frame is not None and len(marcos) < self.max_profundidad:
+                    codigo = frame.f_code
+                    marcos.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+                    frame = frame.f_back
+                marcos.append(nombres.get(ident, str(ident)))
+                pilas.append(";".join(reversed(marcos)))
+            with self._lock:
+                self._pilas.update(pilas)
+                self.muestras += 1
+
+    def folded(self):
+        """Una línea por pila: 'hilo;archivo:funcion;... conteo'."""
+        with self._lock:
+            return "".join(f"{pila} {n}\n" for pila, n in self._pilas.most_common())
+
+    def reiniciar(self):
+        with self._lock:
+            self._pilas.clear()
+            self.muestras = 0
+
+    def detener(self):
+        self._stop.set()
+
+
+def perfilar(intervalo_s=0.01):
+    """Arranca (una vez) el perfilador de muestreo que se sirve en /perfil."""
+    global _perfilador
+    with _lock:
+        if _perfilador is None:
+            _perfilador = Perfilador(intervalo_s)
+        return _perfilador
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith("/metrics"):
+            cuerpo, tipo = exponer(), "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path.startswith("/perfil") and _perfilador is not None:
+            cuerpo, tipo = _perfilador.folded(), "text/plain; charset=utf-8"
+            if "reiniciar" in self.path:
+                _perfilador.reiniciar()
+        else:
+            self.send_error(404)
+            return
+        data = cuerpo.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def servir(puerto=9464, host="127.0.0.1"):
+    """Sirve /metrics (y /perfil) desde un hilo. Regresa el server; detener con server.shutdown()."""
+    server = ThreadingHTTPServer((host, puerto), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metricas", daemon=True).start()
+    return server
@@ -0,0 +1,46 @@
+import time
+
+import cv2
+
+
+class MotionGate:
+    """
+    Detector de cambios barato para no correr YOLO si la escena no se movió.
+
+    Compara una copia chiquita en escala de grises contra el frame de la última
+    inferencia (no contra el anterior, así los cambios lentos también cuentan).
+    Cada `max_skip_s` segundos fuerza una inferencia aunque no haya cambios.
+    """
+
+    def __init__(self, threshold=4.0, max_skip_s=1.0, size=(64, 36)):
+        self.threshold = threshold      # diferencia promedio por pixel (0-255)
+        self.max_skip_s = max_skip_s
+        self.size = size
+        self.executed = 0
+        self.skipped = 0
+        self.last_diff = 0.0
+        self._ref = None
+        self._ref_time = 0.0
+
+    def should_run(self, frame):
+        small = cv2.cvtColor(cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        now = time.perf_counter()
+
+        if self._ref is None or now - self._ref_time >= self.max_skip_s:
+            run = True
+        else:
+            self.last_diff = float(cv2.absdiff(small, self._ref).mean())
+            run = self.last_diff >= self.threshold
+
+        if run:
+            self._ref = small
+            self._ref_time = now
+            self.executed += 1
+        else:
+            self.skipped += 1
+        return run
+
+    def __str__(self):
+        total = self.executed + self.skipped
+        saved = self.skipped / total if total else 0.0
+        return f"yolo ejecutado={self.executed} saltado={self.skipped} ({saved:.0%} ahorrado)"
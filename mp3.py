@@ -0,0 +1,110 @@
+"""
+Utilidades mínimas de MP3 para pegar clips a nivel de frame sin re-codificar.
+
+Un MP3 es una secuencia de frames independientes, así que dos clips con el
+mismo formato (p. ej. mp3_44100_128 de ElevenLabs) se pueden concatenar
+quitando las etiquetas ID3 y el frame Xing/Info del principio, que guarda la
+duración del clip original y confundiría al reproductor.
+"""
+
+# Kbps por índice, para MPEG-1 y MPEG-2/2.5 Layer III
+_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 0],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 0],
+}
+_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],   # MPEG-1
+    2: [22050, 24000, 16000],   # MPEG-2
+    0: [11025, 12000, 8000],    # MPEG-2.5
+}
+
+
+def _parse_header(data, i):
+    """(largo del frame, sample rate, muestras por frame) si en `i` empieza un frame Layer III válido."""
+    if i + 4 > len(data) or data[i] != 0xFF or (data[i + 1] & 0xE0) != 0xE0:
+        return None
+    version = (data[i + 1] >> 3) & 0x3
+    layer = (data[i + 1] >> 1) & 0x3
+    bitrate_idx = data[i + 2] >> 4
+    sr_idx = (data[i + 2] >> 2) & 0x3
+    padding = (data[i + 2] >> 1) & 0x1
+    if version == 1 or layer != 1 or sr_idx == 3 or bitrate_idx in (0, 15):
+        return None
+    mpeg1 = version == 3
+    bitrate = _BITRATES[1 if mpeg1 else 2][bitrate_idx] * 1000
+    sample_rate = _SAMPLE_RATES[version][sr_idx]
+    samples = 1152 if mpeg1 else 576
+    length = (samples // 8) * bitrate // sample_rate + padding
+    return length, sample_rate, samples
+
+
+def _skip_id3(data):
+    start, end = 0, len(data)
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        start = 10 + size + (10 if data[5] & 0x10 else 0)
+    if end - start >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128
+    return start, end
+
+
+def frames(data):
+    """Lista de (offset, largo, sample rate, muestras) de cada frame de audio."""
+    i, end = _skip_id3(data)
+    out = []
+    while i < end:
+        h = _parse_header(data, i)
+        if h is None:
+            i += 1          # basura o resincronización
+            continue
+        length, sample_rate, samples = h
+        if i + length > end:
+            break
+        out.append((i, length, sample_rate, samples))
+        i += length
+    return out
+
+
+def _audio_frames(data):
+    fr = frames(data)
+    # El primer frame puede ser sólo metadatos (Xing/Info/VBRI): se descarta
+    if fr:
+        off, length, _, _ = fr[0]
+        first = data[off:off + length]
+        if b"Xing" in first or b"Info" in first or b"VBRI" in first:
+            fr = fr[1:]
+    return fr
+
+
+def duration(data):
+    """Duración en segundos, contando frames."""
+    return sum(samples / sr for _, _, sr, samples in _audio_frames(data))
+
+
+def silence_like(clip, seconds):
+    """Frames de silencio con el mismo formato que `clip` (encabezado copiado, datos en ceros)."""
+    fr = _audio_frames(clip)
+    if not fr:
+        raise ValueError("El clip no tiene frames MP3")
+    off, _, sample_rate, samples = fr[0]
+    header = bytearray(clip[off:off + 4])
+    header[1] |= 0x01           # sin CRC
+    header[2] &= ~0x02 & 0xFF   # sin padding
+    length = _parse_header(header, 0)[0]
+    frame = bytes(header) + bytes(length - 4)
+    return frame * max(1, round(seconds * sample_rate / samples))
+
+
+def concat(*clips):
+    """Une clips MP3 del mismo sample rate en un solo stream reproducible."""
+    parts, rate = [], None
+    for clip in clips:
+        for off, length, sample_rate, _ in _audio_frames(clip):
+            if rate is None:
+                rate = sample_rate
+            elif sample_rate != rate:
+                raise ValueError(f"No puedo pegar MP3 con sample rates distintos ({rate} vs {sample_rate})")
+            parts.append(clip[off:off + length])
+    if not parts:
+        raise ValueError("Ningún clip tenía frames MP3")
+    return b"".join(parts)
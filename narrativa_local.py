@@ -0,0 +1,173 @@
+"""
+Narrativas locales para cuando Gemini no llega a tiempo.
+
+Arma una lectura de tres cartas con bancos de frases (apertura, pasado,
+presente, futuro, cierre) y los significados de cartas.py; los nombres con
+artículo ("la Araña", "el Camarón") y las exclamaciones de cada carta se
+sacan de DESCRIPCIONES una sola vez al importar. Generar una lectura es
+escoger cinco frases y formatearlas: unos microsegundos.
+
+`Carrera` corre a Gemini contra un deadline y, si no contesta a tiempo (o
+falla), entrega la narrativa local; lo que Gemini mande tarde se puede
+guardar igual para la próxima.
+
+    python narrativa_local.py Sirena Gallo Muerte     # ejemplos + tiempo por lectura
+"""
+import random
+import re
+import sys
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from cartas import DESCRIPCIONES, SIGNIFICADOS
+
+APERTURAS = (
+    "",
+    "Uy, mi cuate, las cartas no mienten. ",
+    "A ver, a ver, déjame leerte la suerte. ",
+    "Híjole, aquí hay historia. ",
+    "Mira nomás lo que te tiene preparado el destino. ",
+    "Acércate, que esto está bueno. ",
+)
+PASADO = (
+    "Antes, {c1} ya te lo andaba diciendo: {s1}.",
+    "Todo empezó con {c1}, que te marcó con su sentencia: {s1}.",
+    "Desde atrás viene cargando {c1}, con su advertencia de siempre: {s1}.",
+    "{C1} te dejó huella, y su mensaje sigue vivo: {s1}.",
+    "Hace rato pasó por tu vida {c1} y te dejó dicho: {s1}.",
+)
+PRESENTE = (
+    " Ahorita {c2} te trae bien movido, y te avisa: {s2}.",
+    " Y hoy mismo {c2} está de tu lado de la mesa: {s2}.",
+    " En este momento manda {c2}, que te susurra al oído: {s2}.",
+    " Por eso ahorita {c2} se te aparece con su recado: {s2}.",
+    " Hoy por hoy {c2} es tu carta fuerte: {s2}.",
+)
+FUTURO = (
+    " Así que aguas, porque viene {c3}: {s3}.",
+    " Pero ojo, que en el camino ya te espera {c3}: {s3}.",
+    " Y lo que sigue lo dicta {c3}: {s3}.",
+    " Ponte trucha, que {c3} ya viene en camino: {s3}.",
+    " {excl3} Al final del camino te toca {c3}: {s3}.",
+)
+CIERRES = (
+    " ¡No digas que no te avisé!",
+    " Tú sabrás si le haces caso.",
+    " Así está escrito, mi rey.",
+    " El que avisa no es traidor.",
+    " ¡Ponte las pilas y que no te agarren dormido!",
+    " Las cartas ya hablaron; lo demás te toca a ti.",
+)
+SIGNIFICADO_DESCONOCIDO = "algo se mueve a tu alrededor que todavía no se deja ver"
+
+
+def _sin_acentos(texto):
+    return "".join(c for c in unicodedata.normalize("NFD", texto) if unicodedata.category(c) != "Mn").lower()
+
+
+def _nombre_con_articulo(carta):
+    """'la Araña' a partir de "... La Araña ..." en la descripción; si no aparece, 'el <carta>'."""
+    matches = re.findall(r"\b(El|La) ([A-ZÁÉÍÓÚÑ][\wáéíóúñ]+)", DESCRIPCIONES.get(carta, ""))
+    for articulo, nombre in matches:
+        if _sin_acentos(nombre) == _sin_acentos(carta):
+            return f"{articulo.lower()} {nombre}"
+    if matches:
+        articulo, nombre = matches[0]
+        return f"{articulo.lower()} {nombre}"
+    return f"el {carta}"
+
+
+def _exclamacion(carta):
+    """La exclamación corta con la que abre su descripción ("¡Aguas!"), o un comodín."""
+    m = re.match(r"(¡[^!]{1,20}!)", DESCRIPCIONES.get(carta, ""))
+    return m.group(1) if m else "¡Aguas!"
+
+
+# Precalculado al importar: generar no toca regex ni normalización
+NOMBRES = {carta: _nombre_con_articulo(carta) for carta in DESCRIPCIONES}
+EXCLAMACIONES = {carta: _exclamacion(carta) for carta in DESCRIPCIONES}
+
+
+def narrativa_local(c1, c2, c3, rng=random):
+    """Una lectura de tres cartas (pasado, presente, futuro) armada con los bancos de frases."""
+    n1, n2, n3 = (NOMBRES.get(c, f"el {c}") for c in (c1, c2, c3))
+    campos = {
+        "c1": n1, "C1": n1[:1].upper() + n1[1:], "c2": n2, "c3": n3,
+        "s1": SIGNIFICADOS.get(c1, SIGNIFICADO_DESCONOCIDO),
+        "s2": SIGNIFICADOS.get(c2, SIGNIFICADO_DESCONOCIDO),
+        "s3": SIGNIFICADOS.get(c3, SIGNIFICADO_DESCONOCIDO),
+        "excl3": EXCLAMACIONES.get(c3, "¡Aguas!"),
+    }
+    plantilla = (rng.choice(APERTURAS) + rng.choice(PASADO) + rng.choice(PRESENTE)
+                 + rng.choice(FUTURO) + rng.choice(CIERRES))
+    return plantilla.format(**campos)
+
+
+class Carrera:
+    """
+    Corre `remota()` (p. ej. Gemini) con un deadline; si no termina a tiempo
+    o falla, regresa `local()`. Cuenta qué fuente ganó cada vez:
+    "remota", "local_deadline" o "local_error".
+    """
+
+    def __init__(self, deadline_s, max_workers=8):
+        self.deadline_s = deadline_s
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="carrera")
+        self._lock = threading.Lock()
+        self.fuentes = {"remota": 0, "local_deadline": 0, "local_error": 0}
+        self.tardias = 0        # respuestas remotas que llegaron después del deadline
+
+    def _contar(self, fuente):
+        with self._lock:
+            self.fuentes[fuente] += 1
+
+    def correr(self, remota, local, al_llegar_tarde=None):
+        """
+        Regresa (resultado, fuente). Si la remota pierde por tiempo sigue corriendo;
+        cuando termine bien se llama `al_llegar_tarde(resultado)` (p. ej. para guardarlo).
+        """
+        fut = self._pool.submit(remota)
+        try:
+            resultado = fut.result(timeout=self.deadline_s)
+        except FutureTimeout:
+            fut.add_done_callback(lambda f: self._tarde(f, al_llegar_tarde))
+            self._contar("local_deadline")
+            return local(), "local_deadline"
+        except Exception:
+            self._contar("local_error")
+            return local(), "local_error"
+        self._contar("remota")
+        return resultado, "remota"
+
+    def _tarde(self, fut, al_llegar_tarde):
+        if fut.exception() is not None:
+            return
+        with self._lock:
+            self.tardias += 1
+        if al_llegar_tarde is not None:
+            try:
+                al_llegar_tarde(fut.result())
+            except Exception:
+                pass        # ya se sirvió la local; guardar lo tardío es opcional
+
+    def stats(self):
+        with self._lock:
+            return {**self.fuentes, "tardias": self.tardias, "deadline_s": self.deadline_s}
+
+
+def main():
+    cartas = sys.argv[1:4] if len(sys.argv) >= 4 else random.sample(sorted(SIGNIFICADOS), 3)
+    for _ in range(3):
+        print(narrativa_local(*cartas), end="\n\n")
+
+    n = 20000
+    t0 = time.perf_counter()
+    for _ in range(n):
+        narrativa_local(*cartas)
+    print(f"{(time.perf_counter() - t0) / n * 1e6:.1f} µs por lectura")
+
+
+if __name__ == "__main__":
+    main()
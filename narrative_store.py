@@ -0,0 +1,183 @@
+"""
+Almacén persistente de narrativas del oráculo (SQLite), compartido entre
+procesos y reinicios. Cada tercia ordenada de cartas guarda hasta K variantes
+para conservar la variedad de `temperature: 1.0`; al servir se escoge una al azar.
+
+La llave es un hash del contenido que define la narrativa (versión del prompt,
+modelo de Gemini y las tres cartas), así que cambiar el prompt no mezcla textos viejos.
+
+Pre-generar todas las tercias (reanudable: sólo pide lo que falta):
+    python narrative_store.py pregen --k 3 --workers 8 --rps 4
+    python narrative_store.py stats
+"""
+import argparse
+import hashlib
+import itertools
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from oraculo import GEMINI_MODEL, PROMPT_VERSION
+
+DEFAULT_PATH = os.getenv("NARRATIVE_DB", "narrativas.sqlite")
+DEFAULT_VARIANTS = 3
+
+
+def triple_key(c1, c2, c3):
+    raw = f"v{PROMPT_VERSION}|{GEMINI_MODEL}|{c1}|{c2}|{c3}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+
+
+class NarrativeStore:
+    def __init__(self, path=DEFAULT_PATH, max_variants=DEFAULT_VARIANTS):
+        self.path = path
+        self.max_variants = max_variants
+        self._local = threading.local()   # una conexión por hilo
+        self.hits = 0
+        self.misses = 0
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS variants ("
+                " key TEXT NOT NULL, idx INTEGER NOT NULL, text TEXT NOT NULL, created REAL NOT NULL,"
+                " PRIMARY KEY (key, idx)) WITHOUT ROWID"
+            )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0)
+            conn.execute("PRAGMA journal_mode=WAL")      # lectores no se bloquean con el escritor
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, c1, c2, c3):
+        """Una variante al azar para la tercia, o None si no hay ninguna."""
+        # Las vacías que haya guardado una versión anterior no se sirven
+        rows = self._conn().execute("SELECT text FROM variants WHERE key = ? AND trim(text) != ''",
+                                    (triple_key(c1, c2, c3),)).fetchall()
+        if not rows:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return random.choice(rows)[0]
+
+    def add(self, c1, c2, c3, text):
+        """Guarda una variante si todavía hay lugar (máx. `max_variants`). Regresa True si se guardó."""
+        if not text or not text.strip():
+            return False        # una lectura vacía se serviría para siempre: mejor que se vuelva a generar
+        key = triple_key(c1, c2, c3)
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            (n,) = conn.execute("SELECT COUNT(*) FROM variants WHERE key = ?", (key,)).fetchone()
+            if n >= self.max_variants:
+                return False
+            conn.execute("INSERT INTO variants (key, idx, text, created) VALUES (?, ?, ?, ?)",
+                         (key, n, text, time.time()))
+        return True
+
+    def counts(self):
+        """{llave: variantes guardadas} de toda la base."""
+        return dict(self._conn().execute("SELECT key, COUNT(*) FROM variants GROUP BY key"))
+
+    def missing(self, cards, k=None):
+        """(c1, c2, c3, faltantes) de cada tercia ordenada con menos de k variantes."""
+        k = k or self.max_variants
+        have = self.counts()
+        for c1, c2, c3 in itertools.permutations(cards, 3):
+            n = have.get(triple_key(c1, c2, c3), 0)
+            if n < k:
+                yield c1, c2, c3, k - n
+
+
+class RateLimiter:
+    """Token bucket compartido entre hilos: a lo más `rps` llamadas por segundo."""
+
+    def __init__(self, rps):
+        self.interval = 1.0 / rps
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        time.sleep(max(0.0, slot - now))
+
+
+def pregenerate(store, client, cards, k, workers, rps, limit=None, retries=3):
+    from oraculo import generar_con_gemini
+
+    limiter = RateLimiter(rps)
+    jobs = list(itertools.islice(store.missing(cards, k), limit))
+    pending = sum(n for *_, n in jobs)
+    print(f"[PREGEN] {len(jobs)} tercias incompletas, {pending} narrativas por generar.")
+
+    def fill(c1, c2, c3, n):
+        done = 0
+        for _ in range(n):
+            for attempt in range(retries):
+                limiter.wait()
+                try:
+                    text = generar_con_gemini(client, c1, c2, c3)
+                    break
+                except Exception as e:
+                    wait = 2 ** attempt + random.random()
+                    print(f"[PREGEN] {c1}/{c2}/{c3}: {e} (reintento en {wait:.1f}s)")
+                    time.sleep(wait)
+            else:
+                return done
+            if store.add(c1, c2, c3, text):
+                done += 1
+        return done
+
+    t0 = time.perf_counter()
+    generated = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(fill, *job) for job in jobs]
+        for i, fut in enumerate(as_completed(futures), 1):
+            generated += fut.result()
+            if i % 100 == 0 or i == len(futures):
+                rate = generated / max(time.perf_counter() - t0, 1e-9)
+                print(f"[PREGEN] {i}/{len(futures)} tercias, {generated} narrativas ({rate:.1f}/s)")
+    return generated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["pregen", "stats"])
+    parser.add_argument("--db", default=DEFAULT_PATH)
+    parser.add_argument("--k", type=int, default=DEFAULT_VARIANTS, help="variantes por tercia")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rps", type=float, default=4.0, help="máximo de llamadas a Gemini por segundo")
+    parser.add_argument("--limit", type=int, default=None, help="máximo de tercias en esta corrida")
+    args = parser.parse_args()
+
+    from cartas import SIGNIFICADOS
+
+    store = NarrativeStore(args.db, max_variants=args.k)
+    cards = sorted(SIGNIFICADOS)
+
+    if args.command == "stats":
+        counts = store.counts()
+        total = len(cards) * (len(cards) - 1) * (len(cards) - 2)
+        full = sum(1 for n in counts.values() if n >= args.k)
+        print(f"{len(counts)}/{total} tercias con al menos una narrativa, {full} completas (k={args.k}), "
+              f"{sum(counts.values())} narrativas en {args.db}")
+        return
+
+    from dotenv import load_dotenv
+    from google import genai
+
+    load_dotenv()
+    client = genai.Client(api_key=os.environ["GEMINI_API_KEY"])
+    pregenerate(store, client, cards, args.k, args.workers, args.rps, args.limit)
+
+
+if __name__ == "__main__":
+    main()
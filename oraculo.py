@@ -0,0 +1,91 @@
+from narrativa_local import narrativa_local
+
+GEMINI_MODEL = "gemini-2.5-flash"
+PROMPT_VERSION = 1        # súbelo si cambias el prompt: las narrativas guardadas con el anterior dejan de usarse
+
+
+class RespuestaVacia(ValueError):
+    """Gemini no escribió nada (respuesta bloqueada o sin candidatos): se usa el fallback, no se guarda."""
+
+
+def construir_prompt(c1, c2, c3):
+    # PROMPT DE INGENIERÍA NARRATIVA
+    # El truco aquí es pedirle que actúe como un personaje y prohibirle estructuras rígidas.
+    return f"""
+    Actúa como un brujo místico de feria mexicana, sabio pero con jerga de barrio.
+    
+    Tienes 3 cartas de la lotería que representan la línea temporal de una persona:
+    1. PASADO (Causa): {c1}
+    2. PRESENTE (Situación actual): {c2}
+    3. FUTURO (Consecuencia/Advertencia): {c3}
+    
+    TU TAREA:
+    Escribe UNA SOLA predicción de máximo 100 palabras que conecte estas tres cartas en una historia fluida.
+    
+    REGLAS DE ORO:
+    - NO empieces las oraciones con "Tu pasado fué", "Tu presente es" o "Tu futuro será". Usa conectores como "antes", "ahorita", "por eso", "así que aguas".
+    - NO hagas listas. Debe ser un párrafo corrido.
+    - Menciona las cartas por su nombre.
+    - Tono: Divertido, místico.
+    - Termina con una advertencia o consejo contundente basado en la tercera carta.
+    - Crea historias coherentes.
+    Ejemplo de estilo deseado:
+    "Uy, se ve que el Apache te trajo problemas, y aunque ahorita el Gallo te tiene muy despierto y movido, bájale dos rayitas porque la Sirena te quiere endulzar el oído con mentiras."
+    """
+
+
+def limpiar_texto(texto):
+    # Limpieza extra
+    return texto.strip().replace('"', '').replace('*', '')
+
+
+def limpiar_fragmento(fragmento):
+    # Igual que limpiar_texto pero sin strip: los espacios entre pedazos del stream importan
+    return fragmento.replace('"', '').replace('*', '')
+
+
+def generar_con_gemini(client, c1, c2, c3):
+    """Una llamada a Gemini. Las excepciones suben: quien llama decide el fallback."""
+    response = client.models.generate_content(
+        model=GEMINI_MODEL,
+        contents=construir_prompt(c1, c2, c3),
+        config={'temperature': 1.0}  # Alta temperatura para más creatividad
+    )
+    texto = limpiar_texto(response.text or "")
+    if not texto:
+        raise RespuestaVacia("Gemini regresó una respuesta sin texto")
+    return texto
+
+
+def stream_con_gemini(client, c1, c2, c3):
+    """
+    Como generar_con_gemini, pero regresa los pedazos de texto conforme Gemini
+    los escribe. El primero ya trae texto; si no escribe nada, RespuestaVacia.
+    """
+    stream = client.models.generate_content_stream(
+        model=GEMINI_MODEL,
+        contents=construir_prompt(c1, c2, c3),
+        config={'temperature': 1.0}
+    )
+    vacio = True
+    for chunk in stream:
+        fragmento = limpiar_fragmento(chunk.text or "")
+        if vacio and not fragmento.strip():
+            continue
+        vacio = False
+        yield fragmento
+    if vacio:
+        raise RespuestaVacia("Gemini regresó un stream sin texto")
+
+
+def primer_pedazo(stream):
+    """El primer pedazo de un stream de texto; RespuestaVacia si termina sin escribir nada."""
+    primero = next(stream, "")
+    if not primero.strip():
+        raise RespuestaVacia("Gemini regresó un stream sin texto")
+    return primero
+
+
+def prediccion_fallback(c1, c2, c3):
+    # Fallback local (plantillas + significados), variado y en microsegundos
+    return narrativa_local(c1, c2, c3)
@@ -0,0 +1,282 @@
+"""
+Caché de detecciones por hash perceptual, para fotos casi iguales.
+
+Cuando alguien vuelve a tomar foto a la misma carta, la imagen nueva no es
+idéntica byte por byte pero se ve igual. El pHash (DCT de una miniatura gris
+de 32x32, los 8x8 coeficientes de baja frecuencia menos el DC contra su
+mediana) da 63 bits que cambian poco con ruido, compresión o un movimiento
+chico.
+
+El hash de la foto completa no basta: la carta es una parte chica del cuadro,
+y tres cartas distintas en el mismo encuadre pueden quedar a distancia 0 (ver
+`python phash_cache.py --verificar`). Así que cada entrada guarda también el
+pHash de cada carta detectada (su caja recortada de la miniatura), y una foto
+nueva sólo reusa las detecciones si:
+
+  1. el hash de la foto completa está a distancia de Hamming <= `max_distance`
+  2. en esas mismas cajas, la foto nueva tiene hashes a <= `max_distance_carta`
+
+La miniatura sale de `cv2.IMREAD_REDUCED_GRAYSCALE_8`: el JPEG se decodifica a
+1/8 de resolución, así un acierto también se ahorra el imdecode completo.
+
+    python phash_cache.py fotos_cartas/     # distancias entre fotos y tiempo por hash
+    python phash_cache.py --verificar       # cartas distintas en el mismo encuadre no deben acertar
+"""
+import argparse
+import glob
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+HASH_SIZE = 8           # 8x8 coeficientes menos el DC -> 63 bits
+DCT_SIZE = 32
+REDUCCION = 8           # la miniatura es 1/8 de la foto
+MIN_LADO = 8            # px de la miniatura: una caja más chica no da un hash confiable
+
+
+def phash(img):
+    """pHash de 63 bits (int) de una imagen BGR o gris."""
+    if img.ndim == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(img, (DCT_SIZE, DCT_SIZE), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:HASH_SIZE, :HASH_SIZE].flatten()
+    # El coeficiente DC (brillo promedio) no entra a la mediana ni al hash
+    bits = low[1:] > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def miniatura(data):
+    """Imagen codificada (JPEG/PNG) -> gris a 1/8 de tamaño, o None si no se pudo decodificar."""
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+
+
+def phash_bytes(data):
+    """pHash de una imagen codificada decodificándola a 1/8 de tamaño, o None si no se pudo."""
+    img = miniatura(data)
+    return None if img is None else phash(img)
+
+
+def phash_cajas(gris, cajas):
+    """
+    pHash de cada caja (x1, y1, x2, y2 en coordenadas de la foto original)
+    recortada de su miniatura, o None si alguna queda muy chica para hashearla.
+    """
+    alto, ancho = gris.shape[:2]
+    hashes = []
+    for x1, y1, x2, y2 in np.asarray(cajas, np.float32).reshape(-1, 4) / REDUCCION:
+        x1, y1 = max(0, int(x1)), max(0, int(y1))
+        x2, y2 = min(ancho, int(np.ceil(x2))), min(alto, int(np.ceil(y2)))
+        if min(x2 - x1, y2 - y1) < MIN_LADO:
+            return None
+        hashes.append(phash(gris[y1:y2, x1:x2]))
+    return tuple(hashes)
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+class PHashCache:
+    """
+    LRU de (hash -> valor) con tolerancia de Hamming y TTL, segura entre hilos.
+
+    La búsqueda recorre las entradas (a lo más `max_entries`, unos µs cada
+    una) y prueba las que quedan dentro de `max_distance`, de la más cercana a
+    la más lejana, contra los hashes de sus cajas. `put` recibe lo que costó
+    calcular el valor para reportar cuánto tiempo se ahorró con los aciertos.
+    """
+
+    def __init__(self, max_entries=512, max_distance=4, max_distance_carta=8, ttl_s=600.0):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.max_distance_carta = max_distance_carta
+        self.ttl_s = ttl_s
+        self._entries = OrderedDict()       # hash -> (valor, creado, costo_ms, cajas, hashes de las cajas)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0       # foto completa parecida pero otra carta en las cajas
+        self.expired = 0
+        self.evictions = 0
+        self.saved_ms = 0.0
+
+    def get(self, h, gris=None):
+        """
+        El valor guardado para una foto como ésta (`h` su hash, `gris` su
+        miniatura), o None. Una entrada con cajas sólo acierta si `gris` se
+        ve igual dentro de ellas.
+        """
+        if h is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            candidatas = []
+            for key, (_, created, *_) in list(self._entries.items()):
+                if now - created > self.ttl_s:
+                    del self._entries[key]
+                    self.expired += 1
+                    continue
+                d = hamming(h, key)
+                if d <= self.max_distance:
+                    candidatas.append((d, key))
+            for _, key in sorted(candidatas):
+                value, _, cost_ms, cajas, huellas = self._entries[key]
+                if huellas and not self._mismas_cajas(gris, cajas, huellas):
+                    self.rejected += 1
+                    continue
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.saved_ms += cost_ms
+                return value
+            self.misses += 1
+            return None
+
+    def _mismas_cajas(self, gris, cajas, huellas):
+        if gris is None:
+            return False
+        nuevas = phash_cajas(gris, cajas)
+        return nuevas is not None and all(hamming(a, b) <= self.max_distance_carta for a, b in zip(nuevas, huellas))
+
+    def put(self, h, value, cost_ms=0.0, gris=None, cajas=()):
+        """
+        Guarda `value` bajo `h`. Con `cajas` (y la miniatura `gris`) se guarda
+        también el hash de cada una; si alguna es muy chica para hashearla no
+        se guarda nada.
+        """
+        if h is None:
+            return
+        huellas = ()
+        if len(cajas):
+            huellas = phash_cajas(gris, cajas) if gris is not None else None
+            if huellas is None:
+                return
+        with self._lock:
+            self._entries[h] = (value, time.monotonic(), cost_ms, cajas, huellas)
+            self._entries.move_to_end(h)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "rejected": self.rejected,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "saved_ms": round(self.saved_ms, 1),
+                "expired": self.expired,
+                "evictions": self.evictions,
+            }
+
+
+def _carta_sintetica(i, ancho=120, alto=180):
+    """Una "carta" distinta por `i`: marco y figuras de colores sobre fondo claro."""
+    rng = np.random.default_rng(100 + i)
+    carta = np.full((alto, ancho, 3), 235, np.uint8)
+    cv2.rectangle(carta, (4, 4), (ancho - 5, alto - 5), (30, 30, 30), 2)
+    for _ in range(6):
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        centro = (int(rng.integers(15, ancho - 15)), int(rng.integers(20, alto - 20)))
+        cv2.circle(carta, centro, int(rng.integers(8, 30)), color, -1)
+    return carta
+
+
+def verificar(n_cartas=12):
+    """
+    Cartas distintas pegadas en el mismo lugar de un mismo fondo: ninguna debe
+    regresar las detecciones de otra. Reporta también cuántas fotos repetidas
+    de la misma carta (movida unos px, otra calidad de JPEG, ruido) aciertan.
+    Regresa el número de aciertos equivocados.
+    """
+    fondo = cv2.GaussianBlur(np.random.default_rng(0).integers(60, 200, (480, 640, 3), dtype=np.uint8), (0, 0), 25)
+    x, y = 260, 150
+
+    def foto(i, dx=0, dy=0, calidad=85, ruido=0.0):
+        img = fondo.copy()
+        carta = _carta_sintetica(i)
+        img[y + dy:y + dy + carta.shape[0], x + dx:x + dx + carta.shape[1]] = carta
+        if ruido:
+            img = np.clip(img + np.random.default_rng(i).normal(0, ruido, img.shape), 0, 255).astype(np.uint8)
+        return cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, calidad])[1].tobytes()
+
+    caja = np.array([[x, y, x + 120, y + 180]], np.float32)
+    cache = PHashCache(max_entries=n_cartas)
+    minis = [miniatura(foto(i)) for i in range(n_cartas)]
+    hashes = [phash(m) for m in minis]
+    for i, (h, mini) in enumerate(zip(hashes, minis)):
+        cache.put(h, i, gris=mini, cajas=caja)
+
+    distancias, equivocadas = [], 0
+    for i in range(n_cartas):
+        for j in range(i + 1, n_cartas):
+            distancias.append(hamming(hashes[i], hashes[j]))
+    repetidas = [dict(dx=2, dy=1, calidad=80, ruido=3), dict(dx=-3, dy=2, calidad=70, ruido=3),
+                 dict(dx=0, dy=0, calidad=60), dict(dx=1, dy=-2, calidad=90, ruido=3)]
+    aciertos = 0
+    for i in range(n_cartas):
+        for variante in repetidas:
+            mini = miniatura(foto(i, **variante))
+            valor = cache.get(phash(mini), mini)
+            if valor is not None and valor != i:
+                equivocadas += 1
+                print(f"  ✗ la carta {i} regresó las detecciones de la carta {valor}")
+            aciertos += valor == i
+    # Sin las otras cartas guardadas: que cada carta no acierte con ninguna otra
+    for i in range(n_cartas):
+        solo = PHashCache()
+        solo.put(hashes[i], i, gris=minis[i], cajas=caja)
+        for j in range(n_cartas):
+            if j != i and solo.get(hashes[j], minis[j]) is not None:
+                equivocadas += 1
+                print(f"  ✗ la carta {j} acertó con la entrada de la carta {i}")
+    print(f"{n_cartas} cartas en el mismo encuadre: distancia entre fotos completas "
+          f"mín {min(distancias)}, mediana {int(np.median(distancias))}; "
+          f"{sum(d <= cache.max_distance for d in distancias)} pares dentro de max_distance={cache.max_distance}")
+    print(f"fotos repetidas de la misma carta que aciertan: {aciertos}/{n_cartas * len(repetidas)}")
+    print(f"aciertos con otra carta: {equivocadas}  {cache.stats()}")
+    return equivocadas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("imagenes", nargs="*", default=["."], help="fotos (archivos, carpetas o globs)")
+    parser.add_argument("--verificar", action="store_true",
+                        help="cartas sintéticas distintas en el mismo encuadre no deben acertar entre sí")
+    args = parser.parse_args()
+    if args.verificar:
+        raise SystemExit(1 if verificar() else 0)
+
+    rutas = []
+    for arg in args.imagenes:
+        rutas += sorted(glob.glob(os.path.join(arg, "*"))) if os.path.isdir(arg) else glob.glob(arg)
+    datos = {}
+    for ruta in rutas:
+        if ruta.lower().endswith((".jpg", ".jpeg", ".png")):
+            with open(ruta, "rb") as f:
+                datos[os.path.basename(ruta)] = f.read()
+    if not datos:
+        raise SystemExit("no encontré imágenes")
+
+    t0 = time.perf_counter()
+    hashes = {nombre: phash_bytes(data) for nombre, data in datos.items()}
+    ms = (time.perf_counter() - t0) * 1000.0 / len(datos)
+    nombres = list(hashes)
+    for i, a in enumerate(nombres):
+        cercana = min(((hamming(hashes[a], hashes[b]), b) for b in nombres if b != a), default=(None, None))
+        print(f"{a:30} {hashes[a]:016x}  más cercana: {cercana[1]} (distancia {cercana[0]})")
+    print(f"{ms:.2f} ms por hash (decodificando a 1/8)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import threading
+import time
+
+
+class LatestSlot:
+    """
+    Buzón de un solo lugar: siempre guarda el elemento más reciente.
+    Si el consumidor va lento, los elementos viejos se tiran (nunca se encolan).
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self._seq = 0           # cuántos elementos se han publicado
+        self._taken_seq = 0     # último seq que se consumió
+        self.dropped = 0        # elementos sobrescritos sin que nadie los leyera
+        self.closed = False
+
+    def put(self, item):
+        with self._cond:
+            if self._seq > self._taken_seq:
+                self.dropped += 1
+            self._item = item
+            self._seq += 1
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """Espera un elemento más nuevo que el último consumido. Regresa None si hay timeout o se cerró."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > self._taken_seq or self.closed, timeout):
+                return None
+            if self._seq == self._taken_seq:
+                return None
+            self._taken_seq = self._seq
+            return self._item
+
+    def depth(self):
+        """0 o 1: si hay un elemento pendiente por consumir."""
+        with self._cond:
+            return 1 if self._seq > self._taken_seq else 0
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class StageStats:
+    """FPS de una etapa medido en ventanas de ~1 s."""
+
+    def __init__(self, name, window_s=1.0):
+        self.name = name
+        self.window_s = window_s
+        self.fps = 0.0
+        self.total = 0
+        self._count = 0
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def tick(self):
+        with self._lock:
+            self.total += 1
+            self._count += 1
+            now = time.perf_counter()
+            dt = now - self._t0
+            if dt >= self.window_s:
+                self.fps = self._count / dt
+                self._count = 0
+                self._t0 = now
+
+    def __str__(self):
+        return f"{self.name} {self.fps:.1f}fps"
@@ -0,0 +1,262 @@
+"""
+Camino rápido de decodificación y letterbox para las fotos que suben a app.py.
+
+Antes cada foto se decodificaba a resolución completa (una foto de celular
+4032x3024 son ~36 MB de BGR) y ultralytics la volvía a copiar, escalar y
+rellenar a `imgsz`. Aquí:
+
+  1. el tamaño se lee del encabezado (SOF del JPEG / IHDR del PNG), sin decodificar
+  2. si la imagen es mucho más grande que `imgsz`, se decodifica ya reducida
+     (`cv2.IMREAD_REDUCED_COLOR_2/4/8`: el JPEG escala en la DCT, casi gratis)
+  3. se escala y rellena directo dentro de un buffer preasignado y reusado, a la
+     forma que ultralytics usaría (lado largo = imgsz, el corto a múltiplo de
+     32), así ultralytics ya no reescala ni agrega relleno
+
+Las cajas que regresa el modelo están en coordenadas del letterbox;
+`Letterbox.a_original()` las regresa a la foto original.
+
+    python preproceso.py fotos_cartas/                          # tiempos: camino rápido vs imdecode completo
+    python preproceso.py fotos_cartas/ --verificar --model best.pt
+"""
+import argparse
+import glob
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+import metricas
+from detector import IMGSZ, Detections, Detector
+from tracker import iou_matrix
+
+STRIDE = 32
+PAD_VALUE = 114         # el gris del relleno de ultralytics
+_REDUCED = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+# Marcadores SOF de JPEG (C4 = DHT, C8 = JPG y CC = DAC no son SOF)
+_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+class Letterbox(namedtuple("Letterbox", "scale pad_x pad_y reduccion")):
+    """Cómo se pasó de la foto original a la entrada del modelo: x_modelo = x_original * scale + pad_x."""
+
+    __slots__ = ()
+
+    def a_original(self, dets):
+        """Detections en coordenadas del letterbox -> coordenadas de la foto original."""
+        if len(dets.conf) == 0:
+            return dets
+        pad = np.array([self.pad_x, self.pad_y, self.pad_x, self.pad_y], np.float32)
+        return Detections((dets.xyxy - pad) / self.scale, dets.conf, dets.cls)
+
+
+def tamano_imagen(data):
+    """(ancho, alto) leídos del encabezado JPEG o PNG, o None si no se reconoce."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if data[:2] != b"\xff\xd8":
+        return None
+    i, n = 2, len(data)
+    while i + 4 <= n:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:              # bytes de relleno antes del marcador
+            i += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:     # sin longitud
+            i += 2
+            continue
+        if marker in (0xD9, 0xDA):      # fin o inicio de los datos: ya no hay SOF
+            return None
+        length = struct.unpack(">H", data[i + 2:i + 4])[0]
+        if marker in _SOF and i + 9 <= n:
+            alto, ancho = struct.unpack(">HH", data[i + 5:i + 9])
+            return ancho, alto
+        i += 2 + length
+    return None
+
+
+def factor_reduccion(tamano, imgsz):
+    """El mayor factor (2, 4 u 8) que deja el lado largo todavía >= imgsz; 1 si no conviene reducir."""
+    if tamano is None:
+        return 1
+    lado = max(tamano)
+    for f in (8, 4, 2):
+        if lado // f >= imgsz:
+            return f
+    return 1
+
+
+class Preproceso:
+    """
+    bytes de la foto -> (imagen lista para el modelo, Letterbox).
+
+    La imagen vive en un buffer de `imgsz`x`imgsz`x3 que se toma de un pool y
+    regresa al salir de `preparar()`; Streamlit corre cada re-ejecución en otro
+    hilo, así que el pool es compartido y no por hilo.
+
+        with preproceso.preparar(data) as (img, lb):
+            dets = lb.a_original(detector.predict(img))
+    """
+
+    PASOS = ("encabezado", "decode", "letterbox")
+
+    def __init__(self, imgsz=IMGSZ, stride=STRIDE, max_libres=8):
+        self.imgsz = imgsz
+        self.stride = stride
+        self.max_libres = max_libres
+        self._libres = []
+        self._lock = threading.Lock()
+        self._ms = dict.fromkeys(self.PASOS, 0.0)
+        self.imagenes = 0
+        self.reducidas = 0
+        self.bytes_decodificados = 0
+        self.buffers = 0        # cuántos buffers se han creado en total
+
+    def _tomar_buffer(self):
+        with self._lock:
+            if self._libres:
+                return self._libres.pop()
+            self.buffers += 1
+        return np.empty(self.imgsz * self.imgsz * 3, np.uint8)
+
+    def _devolver_buffer(self, buf):
+        with self._lock:
+            if len(self._libres) < self.max_libres:
+                self._libres.append(buf)
+
+    def letterbox(self, img, buf):
+        """Escala (lado largo = imgsz) y rellena al múltiplo de `stride`, dentro de `buf`."""
+        h, w = img.shape[:2]
+        r = self.imgsz / max(h, w)
+        nw, nh = max(1, round(w * r)), max(1, round(h * r))
+        pw = -(-nw // self.stride) * self.stride
+        ph = -(-nh // self.stride) * self.stride
+        # Vista contigua del inicio del buffer, con la forma exacta de esta foto
+        out = buf[:ph * pw * 3].reshape(ph, pw, 3)
+        x0, y0 = (pw - nw) // 2, (ph - nh) // 2
+        if (nw, nh) == (w, h):
+            out[y0:y0 + nh, x0:x0 + nw] = img
+        else:
+            # Lineal como ultralytics; tras la decodificación reducida el factor que falta es < 2
+            cv2.resize(img, (nw, nh), dst=out[y0:y0 + nh, x0:x0 + nw], interpolation=cv2.INTER_LINEAR)
+        # Sólo las franjas de relleno se pintan (el resto ya lo escribió el resize)
+        if y0 or ph - nh:
+            out[:y0] = PAD_VALUE
+            out[y0 + nh:] = PAD_VALUE
+        if x0 or pw - nw:
+            out[:, :x0] = PAD_VALUE
+            out[:, x0 + nw:] = PAD_VALUE
+        return out, r, x0, y0
+
+    @contextmanager
+    def preparar(self, data):
+        """Levanta ValueError si `data` no es una imagen."""
+        t0 = time.perf_counter()
+        factor = factor_reduccion(tamano_imagen(data), self.imgsz)
+        t1 = time.perf_counter()
+        img = cv2.imdecode(np.frombuffer(data, np.uint8), _REDUCED.get(factor, cv2.IMREAD_COLOR))
+        if img is None:
+            raise ValueError("No pude decodificar la imagen")
+        t2 = time.perf_counter()
+        buf = self._tomar_buffer()
+        out, r, x0, y0 = self.letterbox(img, buf)
+        t3 = time.perf_counter()
+
+        with self._lock:
+            self.imagenes += 1
+            self.reducidas += factor > 1
+            self.bytes_decodificados += img.nbytes
+            for paso, ms in zip(self.PASOS, (t1 - t0, t2 - t1, t3 - t2)):
+                self._ms[paso] += ms * 1000.0
+        metricas.observar("decode", (t2 - t0) * 1000.0)
+        metricas.observar("letterbox", (t3 - t2) * 1000.0)
+        yield out, Letterbox(r / factor, x0, y0, factor)
+        # Si la inferencia falló (p. ej. timeout) el buffer no regresa: el modelo aún podría estar leyéndolo
+        self._devolver_buffer(buf)
+
+    def stats(self):
+        """Promedio en ms de cada paso y cuántas fotos se decodificaron reducidas."""
+        with self._lock:
+            n = self.imagenes or 1
+            out = {f"{paso}_ms": round(ms / n, 3) for paso, ms in self._ms.items()}
+            out.update(imagenes=self.imagenes, reducidas=self.reducidas, buffers=self.buffers,
+                       mb_decodificados=round(self.bytes_decodificados / n / 2**20, 2))
+        return out
+
+
+def _comparar(detector, completa, rapida, min_iou):
+    """Mensaje de error si las detecciones del camino rápido no empatan con las de la imagen completa."""
+    if sorted(completa.cls.tolist()) != sorted(rapida.cls.tolist()):
+        return f"clases distintas: {sorted(map(detector.label, completa.cls.tolist()))} vs " \
+               f"{sorted(map(detector.label, rapida.cls.tolist()))}"
+    for box, cls_id in zip(completa.xyxy, completa.cls):
+        mismas = rapida.xyxy[rapida.cls == cls_id]
+        iou = float(iou_matrix(box[None], mismas).max()) if len(mismas) else 0.0
+        if iou < min_iou:
+            return f"{detector.label(int(cls_id))}: IoU {iou:.2f} < {min_iou}"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("imagenes", nargs="+", help="fotos (archivos, carpetas o globs)")
+    parser.add_argument("--imgsz", type=int, default=IMGSZ)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--verificar", action="store_true", help="comparar detecciones contra la imagen completa")
+    parser.add_argument("--model", default="best.pt")
+    parser.add_argument("--backend", default="torch")
+    parser.add_argument("--min-iou", type=float, default=0.85)
+    args = parser.parse_args()
+
+    rutas = []
+    for ruta in args.imagenes:
+        rutas += sorted(glob.glob(os.path.join(ruta, "*"))) if os.path.isdir(ruta) else sorted(glob.glob(ruta))
+    fotos = {}
+    for ruta in rutas:
+        if ruta.lower().endswith((".jpg", ".jpeg", ".png")):
+            with open(ruta, "rb") as f:
+                fotos[ruta] = f.read()
+    if not fotos:
+        parser.error("no encontré imágenes")
+
+    pre = Preproceso(args.imgsz)
+    completa_ms = completa_bytes = 0
+    for _ in range(args.repeticiones):
+        for data in fotos.values():
+            t0 = time.perf_counter()
+            completa_bytes += cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR).nbytes
+            completa_ms += (time.perf_counter() - t0) * 1000.0
+            with pre.preparar(data):
+                pass
+    n = args.repeticiones * len(fotos)
+    stats = pre.stats()
+    rapido_ms = sum(stats[f"{paso}_ms"] for paso in Preproceso.PASOS)
+    print(f"{len(fotos)} fotos, {stats['reducidas'] // args.repeticiones} decodificadas reducidas")
+    print(f"imdecode completo: {completa_ms / n:.2f} ms/foto, {completa_bytes / n / 2**20:.2f} MB decodificados")
+    print(f"camino rápido:     {rapido_ms:.2f} ms/foto, {stats['mb_decodificados']:.2f} MB decodificados  ("
+          + ", ".join(f"{paso} {stats[f'{paso}_ms']:.2f}" for paso in Preproceso.PASOS) + ")")
+
+    if not args.verificar:
+        return
+    detector = Detector(args.model, backend=args.backend, imgsz=args.imgsz, conf=0.5)
+    fallas = 0
+    for ruta, data in fotos.items():
+        completa = detector.predict(cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR))
+        with pre.preparar(data) as (img, lb):
+            rapida = lb.a_original(detector.predict(img))
+        error = _comparar(detector, completa, rapida, args.min_iou)
+        if error:
+            fallas += 1
+            print(f"  ✗ {os.path.basename(ruta)}: {error}")
+    print(f"verificación: {len(fotos) - fallas}/{len(fotos)} fotos con las mismas detecciones")
+    raise SystemExit(1 if fallas else 0)
+
+
+if __name__ == "__main__":
+    main()
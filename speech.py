@@ -0,0 +1,118 @@
+import hashlib
+import os
+import subprocess
+import sys
+import threading
+
+from pipeline import LatestSlot
+
+
+def _play_clip(path):
+    """Reproduce un archivo de audio ya generado (bloquea hasta que termina)."""
+    if sys.platform == "win32":
+        import winsound
+        winsound.PlaySound(path, winsound.SND_FILENAME)
+    elif sys.platform == "darwin":
+        subprocess.run(["afplay", path], check=True)
+    else:
+        subprocess.run(["aplay", "-q", path], check=True)
+
+
+class SpeechWorker:
+    """
+    Voz en segundo plano para que el loop de detección nunca se bloquee.
+
+    La cola es de un solo lugar con reemplazo: si llega una carta nueva mientras
+    otra sigue esperando turno, la vieja se descarta (la que ya está sonando sí termina).
+    Opcionalmente pre-sintetiza un clip por etiqueta al arrancar, así anunciar
+    es sólo reproducir un archivo.
+    """
+
+    def __init__(self, rate=175, prerender=(), cache_dir=".tts_cache"):
+        self.rate = rate
+        self.cache_dir = cache_dir
+        self.clips = {}               # texto -> ruta del clip pre-sintetizado
+        self.spoken = 0
+        self._pending = LatestSlot()
+        self._engine = None
+        self._thread = threading.Thread(target=self._run, args=(list(prerender),), daemon=True)
+        self._thread.start()
+
+    @property
+    def coalesced(self):
+        """Anuncios reemplazados antes de empezar a sonar."""
+        return self._pending.dropped
+
+    def say(self, text):
+        """No bloquea: deja el texto pendiente (reemplazando al anterior si no ha empezado)."""
+        self._pending.put(text)
+
+    def close(self):
+        self._pending.close()
+
+    # -------------------------
+    # Hilo de voz (dueño del motor pyttsx3)
+    # -------------------------
+    def _run(self, prerender):
+        try:
+            import pyttsx3
+            self._engine = pyttsx3.init()
+            self._engine.setProperty("rate", self.rate)
+        except Exception:
+            print("[AVISO] No pude iniciar TTS (pyttsx3). Sigo solo con texto.")
+            return
+
+        if prerender:
+            self._prerender(prerender)
+
+        while True:
+            text = self._pending.get()
+            if text is None:
+                break
+            self._speak(text)
+
+    def _clip_path(self, text):
+        ext = ".aiff" if sys.platform == "darwin" else ".wav"
+        key = hashlib.sha1(f"{self.rate}|{text}".encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, key + ext)
+
+    def _prerender(self, texts):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        todo = []
+        for text in dict.fromkeys(texts):
+            path = self._clip_path(text)
+            if os.path.exists(path) and os.path.getsize(path) > 0:
+                self.clips[text] = path
+            else:
+                self._engine.save_to_file(text, path)
+                todo.append((text, path))
+
+        if todo:
+            try:
+                self._engine.runAndWait()
+            except Exception:
+                print("[AVISO] No pude pre-sintetizar los anuncios. Uso voz en vivo.")
+                return
+            for text, path in todo:
+                if os.path.exists(path) and os.path.getsize(path) > 0:
+                    self.clips[text] = path
+
+        print(f"[TTS] {len(self.clips)} anuncios pre-sintetizados en {self.cache_dir}/")
+
+    def _speak(self, text):
+        path = self.clips.get(text)
+        if path is not None:
+            try:
+                _play_clip(path)
+                self.spoken += 1
+                return
+            except Exception:
+                # Sin reproductor disponible: nos quedamos con la voz en vivo
+                self.clips.pop(text, None)
+
+        try:
+            self._engine.say(text)
+            self._engine.runAndWait()
+            self.spoken += 1
+        except Exception:
+            pass
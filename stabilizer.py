@@ -0,0 +1,170 @@
+"""
+Estabilizadores de etiqueta: deciden qué carta está "confirmada" a partir
+de la detección de cada frame, para que el nombre no parpadee.
+
+Todos guardan su estado en arreglos de tamaño fijo indexados por id de clase
+y se actualizan en O(1) por frame (sólo se recorre el arreglo completo cuando
+la carta confirmada se pierde, lo cual es raro).
+
+Uso:
+    stab = make_stabilizer("hysteresis", num_classes=len(model.names))
+    stable_id = stab.update(cls_id, conf)   # cls_id=None si no se detectó nada
+"""
+
+
+class MajorityStabilizer:
+    """
+    La regla original de Vision.py: la clase con más apariciones en los últimos
+    `history` frames, siempre que llegue a `min_hits`. Los empates se rompen por
+    la suma de confianzas. Con `min_score` > 0 también se exige esa suma mínima.
+    """
+
+    def __init__(self, num_classes, history=12, min_hits=7, min_score=0.0):
+        self.num_classes = num_classes
+        self.history = history
+        self.min_hits = min_hits
+        self.min_score = min_score
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * self.num_classes
+        self.scores = [0.0] * self.num_classes   # suma de confianzas dentro de la ventana
+        self._ring_cls = [-1] * self.history
+        self._ring_conf = [0.0] * self.history
+        self._pos = 0
+        self.stable = None
+
+    def _qualifies(self, c):
+        return self.counts[c] >= self.min_hits and self.scores[c] >= self.min_score
+
+    def _beats(self, a, b):
+        return (self.counts[a], self.scores[a]) > (self.counts[b], self.scores[b])
+
+    def update(self, cls_id, conf=1.0):
+        pos = self._pos
+        old = self._ring_cls[pos]
+        if old >= 0:
+            self.counts[old] -= 1
+            self.scores[old] -= self._ring_conf[pos]
+
+        new = -1 if cls_id is None else int(cls_id)
+        self._ring_cls[pos] = new
+        self._ring_conf[pos] = conf if new >= 0 else 0.0
+        self._pos = (pos + 1) % self.history
+        if new >= 0:
+            self.counts[new] += 1
+            self.scores[new] += conf
+
+        stable = self.stable
+        # Sólo la clase que salió de la ventana puede perder la confirmación...
+        if stable is not None and not self._qualifies(stable):
+            stable = self._rescan()
+        # ...y sólo la que entró puede ganarla o rebasar a la actual.
+        if new >= 0 and self._qualifies(new) and (stable is None or self._beats(new, stable)):
+            stable = new
+        self.stable = stable
+        return stable
+
+    def _rescan(self):
+        best = None
+        for c in range(self.num_classes):
+            if self._qualifies(c) and (best is None or self._beats(c, best)):
+                best = c
+        return best
+
+    def snapshot(self):
+        """{clase: apariciones} de lo que hay en la ventana (para depurar)."""
+        return {c: n for c, n in enumerate(self.counts) if n}
+
+
+class EmaStabilizer:
+    """
+    Promedio móvil exponencial de la confianza por clase. Cada frame todas las
+    clases decaen por (1 - alpha) y la detectada suma alpha * conf; se confirma
+    la clase líder cuando su puntaje llega a `threshold`.
+
+    El decaimiento global se guarda como un factor de escala común, así que el
+    update no toca las demás clases.
+    """
+
+    def __init__(self, num_classes, alpha=0.3, threshold=0.35):
+        self.num_classes = num_classes
+        self.alpha = alpha
+        self.threshold = threshold
+        self.reset()
+
+    def reset(self):
+        self._raw = [0.0] * self.num_classes
+        self._scale = 1.0
+        self.leader = None
+        self.stable = None
+
+    def score(self, c):
+        return self._raw[c] * self._scale
+
+    def _step(self, cls_id, conf):
+        self._scale *= 1.0 - self.alpha
+        if self._scale < 1e-150:
+            # Renormaliza de vez en cuando para no caer en underflow
+            self._raw = [v * self._scale for v in self._raw]
+            self._scale = 1.0
+
+        if cls_id is not None:
+            c = int(cls_id)
+            self._raw[c] += self.alpha * conf / self._scale
+            # Todas decaen igual: sólo la que subió puede tomar el liderato
+            if self.leader is None or self._raw[c] > self._raw[self.leader]:
+                self.leader = c
+
+    def _decide(self):
+        if self.leader is not None and self.score(self.leader) >= self.threshold:
+            return self.leader
+        return None
+
+    def update(self, cls_id, conf=1.0):
+        self._step(cls_id, conf)
+        self.stable = self._decide()
+        return self.stable
+
+    def snapshot(self):
+        return {c: round(v * self._scale, 3) for c, v in enumerate(self._raw) if v * self._scale >= 0.01}
+
+
+class HysteresisStabilizer(EmaStabilizer):
+    """
+    Igual que el EMA pero con dos umbrales: una carta se confirma al llegar a
+    `enter` y sólo se suelta cuando baja de `exit`. Otra carta la reemplaza
+    únicamente si llega a `enter` y la supera. Así se puede confirmar rápido
+    sin que el nombre parpadee en los frames dudosos.
+    """
+
+    def __init__(self, num_classes, alpha=0.3, enter=0.45, exit=0.2):
+        self.exit = exit
+        super().__init__(num_classes, alpha=alpha, threshold=enter)
+
+    def _decide(self):
+        stable = self.stable
+        leader = self.leader
+        leader_in = leader is not None and self.score(leader) >= self.threshold
+
+        if stable is not None and self.score(stable) >= self.exit:
+            if leader_in and leader != stable and self.score(leader) > self.score(stable):
+                return leader
+            return stable
+        return leader if leader_in else None
+
+
+POLICIES = {
+    "majority": MajorityStabilizer,
+    "ema": EmaStabilizer,
+    "hysteresis": HysteresisStabilizer,
+}
+
+
+def make_stabilizer(policy, num_classes, **kwargs):
+    """Crea el estabilizador por nombre: "majority", "ema" o "hysteresis"."""
+    try:
+        cls = POLICIES[policy]
+    except KeyError:
+        raise ValueError(f"Política de estabilidad desconocida: {policy!r}. Usa una de {sorted(POLICIES)}") from None
+    return cls(num_classes, **kwargs)
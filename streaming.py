@@ -0,0 +1,163 @@
+"""
+Lectura del oráculo en streaming.
+
+El texto de Gemini llega por pedazos; se corta en oraciones y cada oración se
+manda a sintetizar en cuanto cierra, mientras el resto del texto sigue
+llegando. La primera palabra aparece con el primer pedazo y el primer audio
+tarda más o menos una oración, no "todo el texto + todo el audio".
+
+    lectura = LecturaEnStreaming(stream_con_gemini(client, c1, c2, c3), sintetizar)
+    for tipo, dato, oracion in lectura.eventos():
+        ...   # "texto" (delta), "audio" (mp3 de `oracion`), "error_audio", "espera"
+"""
+import queue
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import mp3
+
+# Fin de oración: puntuación (y comillas/paréntesis de cierre) seguida de espacio.
+# La última oración no trae espacio detrás: sale con flush().
+_FIN_ORACION = re.compile(r'[.!?…]+["»”)]*\s+')
+
+
+class SentenceChunker:
+    """
+    Acumula pedazos de texto y suelta oraciones completas. Las muy cortas
+    ("¡Uy!") se juntan con la siguiente para no pedir un TTS por interjección.
+    """
+
+    def __init__(self, min_chars=40):
+        self.min_chars = min_chars
+        self._buf = ""
+
+    def feed(self, text):
+        """Agrega un pedazo; regresa la lista de oraciones que cerraron con él."""
+        self._buf += text
+        out = []
+        while True:
+            cut = None
+            for m in _FIN_ORACION.finditer(self._buf):
+                if len(self._buf[:m.end()].strip()) >= self.min_chars:
+                    cut = m.end()
+                    break
+            if cut is None:
+                return out
+            out.append(self._buf[:cut].strip())
+            self._buf = self._buf[cut:]
+
+    def flush(self):
+        """Lo que quedó en el buffer (la última oración), o None."""
+        rest, self._buf = self._buf.strip(), ""
+        return rest or None
+
+
+class LecturaEnStreaming:
+    """
+    Un hilo consume `fragmentos` (cualquier iterable de str, p. ej.
+    stream_con_gemini) y cada oración completa se sintetiza en un pool de
+    `workers` hilos con `sintetizar(oracion) -> bytes`. eventos() entrega el
+    texto en cuanto llega y los audios en el orden de las oraciones.
+    """
+
+    def __init__(self, fragmentos, sintetizar, min_chars=40, workers=2):
+        self.texto = ""
+        self.error = None
+        self.t0 = time.perf_counter()
+        self.t_primer_texto = None
+        self.t_primer_audio = None
+        self._sintetizar = sintetizar
+        self._min_chars = min_chars
+        self._eventos = queue.Queue()
+        self._pendientes = deque()      # (oración, Future) en orden de lectura
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts")
+        self._hilo = threading.Thread(target=self._leer, args=(fragmentos,), name="oraculo-stream", daemon=True)
+        self._hilo.start()
+
+    def _leer(self, fragmentos):
+        chunker = SentenceChunker(self._min_chars)
+        try:
+            for delta in fragmentos:
+                self._eventos.put(delta)
+                for oracion in chunker.feed(delta):
+                    self._pendientes.append((oracion, self._pool.submit(self._sintetizar, oracion)))
+        except Exception as e:
+            self.error = e
+        resto = chunker.flush()
+        if resto:
+            self._pendientes.append((resto, self._pool.submit(self._sintetizar, resto)))
+        self._pool.shutdown(wait=False)
+        self._eventos.put(None)         # fin del texto
+
+    def eventos(self, poll_s=0.05):
+        """
+        Genera (tipo, dato, oración):
+          ("texto", delta, None)       pedazo nuevo de texto
+          ("audio", mp3, oración)      audio de la siguiente oración, en orden
+          ("error_audio", exc, oración)
+          ("espera", None, None)       nada nuevo en `poll_s` (para que quien
+                                       consume pueda avanzar la reproducción)
+        Termina cuando ya no hay texto ni audios pendientes.
+        """
+        leyendo = True
+        while True:
+            while self._pendientes and self._pendientes[0][1].done():
+                oracion, fut = self._pendientes.popleft()
+                try:
+                    audio = fut.result()
+                except Exception as e:
+                    yield "error_audio", e, oracion
+                    continue
+                if self.t_primer_audio is None:
+                    self.t_primer_audio = time.perf_counter() - self.t0
+                yield "audio", audio, oracion
+
+            if not leyendo and not self._pendientes:
+                return
+
+            try:
+                delta = self._eventos.get(timeout=poll_s)
+            except queue.Empty:
+                yield "espera", None, None
+                continue
+            if delta is None:
+                leyendo = False
+                continue
+            if self.t_primer_texto is None:
+                self.t_primer_texto = time.perf_counter() - self.t0
+            self.texto += delta
+            yield "texto", delta, None
+
+
+class ReproductorProgresivo:
+    """
+    Encadena clips MP3 en el navegador. Cada clip va a su propio reproductor
+    (`contenedor.audio`, con autoplay) precedido de silencio hasta que acabe
+    el anterior según su duración en frames: el script no espera a que nada
+    suene y un reproductor nuevo no reemplaza (ni corta) al que está sonando.
+    Como todos arrancan con el mismo retraso del navegador, el orden se
+    mantiene aunque ese retraso cambie.
+    """
+
+    def __init__(self, contenedor, margen_s=0.15):
+        self.contenedor = contenedor
+        self.margen_s = margen_s        # respiro entre un clip y el siguiente
+        self.clips = []                 # todo lo reproducido, en orden
+        self._libre_en = 0.0
+
+    def encolar(self, clip, pausa_s=0.0):
+        """Pone `clip` a sonar en cuanto termine lo anterior; `pausa_s` de silencio extra después de él."""
+        ahora = time.perf_counter()
+        espera = self._libre_en - ahora
+        datos = clip
+        if espera > 0:
+            try:
+                datos = mp3.concat(mp3.silence_like(clip, espera), clip)
+            except ValueError:
+                pass        # no es un MP3 que se pueda pegar: suena ya, encimado
+        self.contenedor.audio(datos, format="audio/mp3", autoplay=True)
+        self.clips.append(clip)
+        self._libre_en = max(ahora, self._libre_en) + mp3.duration(clip) + pausa_s + self.margen_s
@@ -0,0 +1,302 @@
+"""
+Benchmarks reproducibles, en CPU y sin red, con resultados en JSON para
+comparar antes/después de un cambio (IMGSZ, CONF, backend, estabilizador...).
+
+  vision   por cada frame de una carpeta fija toma el tiempo de: decode (imdecode
+           completo o preproceso.py, según --entrada), model.predict, post-proceso
+           a Detections, votación del estabilizador de Vision.py y r.plot()
+  oraculo  una lectura completa contra tools/fake_upstreams.py con latencias
+           fijas: narrativa (Upstream + Carrera, como generar_prediccion_ia sin
+           almacén), voz de la intro y de la predicción, y el empalme MP3
+           (como texto_a_audio_elevenlabs sin caché)
+  compare  compara dos JSON y marca regresiones en p50/p95 y throughput
+
+Cada paso reporta n, media, p50/p95/p99 (ms) y hay un throughput total.
+
+    python -m tools.bench vision --imagenes frames_bench/ --out antes.json
+    python -m tools.bench vision --imagenes frames_bench/ --imgsz 416 --out despues.json
+    python -m tools.bench oraculo --lecturas 30 --concurrencia 4 --out oraculo.json
+    python -m tools.bench compare antes.json despues.json --tolerancia 0.10
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from cartas import SIGNIFICADOS
+from detector import IMGSZ
+from tools import fake_upstreams
+
+PERCENTILES = (50, 95, 99)
+
+
+def _resumen(tiempos_ms):
+    arr = np.asarray(tiempos_ms, dtype=np.float64)
+    out = {"n": len(arr), "mean_ms": round(float(arr.mean()), 3)}
+    for q, v in zip(PERCENTILES, np.percentile(arr, PERCENTILES)):
+        out[f"p{q}_ms"] = round(float(v), 3)
+    return out
+
+
+def _versiones(*modulos):
+    out = {}
+    for nombre in modulos:
+        try:
+            out[nombre] = __import__(nombre).__version__
+        except Exception:
+            pass
+    return out
+
+
+def _meta(args, *modulos):
+    return {
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "versiones": _versiones("numpy", "cv2", *modulos),
+        "args": {k: v for k, v in vars(args).items() if k not in ("func", "out")},
+    }
+
+
+class _Cronometro:
+    """Junta los tiempos (ms) de cada paso con `with crono("paso"):`."""
+
+    def __init__(self):
+        self.ms = defaultdict(list)
+
+    def __call__(self, paso):
+        crono = self
+
+        class _Paso:
+            def __enter__(self):
+                self.t0 = time.perf_counter()
+
+            def __exit__(self, *exc):
+                crono.ms[paso].append((time.perf_counter() - self.t0) * 1000.0)
+
+        return _Paso()
+
+
+def _leer_frames(rutas):
+    archivos = []
+    for ruta in rutas:
+        archivos += sorted(glob.glob(os.path.join(ruta, "*"))) if os.path.isdir(ruta) else sorted(glob.glob(ruta))
+    frames = []
+    for archivo in archivos:
+        if archivo.lower().endswith((".jpg", ".jpeg", ".png")):
+            with open(archivo, "rb") as f:
+                frames.append(f.read())
+    return frames
+
+
+def bench_vision(args):
+    from config_captura import make_card_stabilizer
+    from detector import Detector
+    from preproceso import Preproceso
+
+    frames = _leer_frames(args.imagenes)
+    if not frames:
+        raise SystemExit("no encontré imágenes")
+    detector = Detector(args.model, backend=args.backend, imgsz=args.imgsz, conf=args.conf)
+    pre = Preproceso(args.imgsz)
+    stabilizer = make_card_stabilizer(detector.names)
+    crono = _Cronometro()
+
+    def inferir(c, entrada):
+        with c("predict"):
+            r = detector._predict(entrada, args.imgsz)[0]
+        with c("post"):
+            dets = detector._to_detections(r)
+        return r, dets
+
+    def paso(data, medir):
+        c = crono if medir else _Cronometro()
+        with c("total"):
+            if args.entrada == "completa":
+                with c("decode"):
+                    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+                r, dets = inferir(c, img)
+            else:
+                t0 = time.perf_counter()
+                with pre.preparar(data) as (img, lb):
+                    c.ms["preproceso"].append((time.perf_counter() - t0) * 1000.0)
+                    r, dets = inferir(c, img)
+                dets = lb.a_original(dets)
+            with c("votacion"):
+                best_id, best_conf, _ = detector.best(dets)
+                stabilizer.update(best_id, best_conf or 0.0)
+            if hasattr(r, "plot"):
+                with c("plot"):
+                    r.plot()
+
+    for data in frames[:args.warmup]:
+        paso(data, medir=False)
+    t0 = time.perf_counter()
+    for _ in range(args.rondas):
+        for data in frames:
+            paso(data, medir=True)
+    segundos = time.perf_counter() - t0
+
+    total = args.rondas * len(frames)
+    return {
+        "tipo": "vision",
+        "meta": _meta(args, "torch", "ultralytics"),
+        "pasos": {nombre: _resumen(ms) for nombre, ms in crono.ms.items()},
+        "throughput": {"frames": total, "segundos": round(segundos, 3), "por_s": round(total / segundos, 3)},
+    }
+
+
+def bench_oraculo(args):
+    from google import genai
+    from elevenlabs.client import ElevenLabs
+
+    import mp3
+    from narrativa_local import Carrera
+    from oraculo import generar_con_gemini, prediccion_fallback
+    from upstream import Upstream, pooled_httpx_client
+
+    random.seed(args.seed)      # también fija las fallas/lentas inyectadas del servidor falso
+    server, url = fake_upstreams.start(retrasos=fake_upstreams.retrasos_from_args(args))
+    gemini = genai.Client(api_key="fake", http_options={"base_url": url, "timeout": int(args.deadline_s * 1000)})
+    eleven = ElevenLabs(api_key="fake", base_url=url, httpx_client=pooled_httpx_client(args.deadline_s))
+    up_gemini = Upstream("gemini", deadline_s=args.deadline_s)
+    up_eleven = Upstream("elevenlabs", deadline_s=args.deadline_s)
+    carrera = Carrera(args.narrativa_deadline_s)
+    crono = _Cronometro()
+
+    def voz(texto):
+        return b"".join(eleven.text_to_speech.convert(
+            voice_id="bench", text=texto, model_id="eleven_v3", output_format="mp3_44100_128"))
+
+    def lectura(cartas, medir=True):
+        c = crono if medir else _Cronometro()
+        with c("lectura"):
+            with c("narrativa"):
+                texto, _ = carrera.correr(
+                    lambda: up_gemini.call(generar_con_gemini, gemini, *cartas),
+                    lambda: prediccion_fallback(*cartas))
+            with c("voz_intro"):
+                intro = up_eleven.call(voz, "¡Órale! El oráculo ha hablado.")
+            with c("voz_prediccion"):
+                audio = up_eleven.call(voz, texto)
+            with c("empalme"):
+                mp3.concat(intro, mp3.silence_like(audio, 0.5), audio)
+
+    nombres = sorted(SIGNIFICADOS)
+    tiradas = [tuple(random.sample(nombres, 3)) for _ in range(args.lecturas)]
+    try:
+        lectura(tiradas[0], medir=False)    # calentamiento: conexiones keep-alive abiertas
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrencia) as pool:
+            list(pool.map(lectura, tiradas))
+        segundos = time.perf_counter() - t0
+    finally:
+        server.shutdown()
+
+    return {
+        "tipo": "oraculo",
+        "meta": _meta(args, "httpx"),
+        "pasos": {nombre: _resumen(ms) for nombre, ms in crono.ms.items()},
+        "throughput": {"lecturas": args.lecturas, "segundos": round(segundos, 3),
+                       "por_s": round(args.lecturas / segundos, 3)},
+        "fuentes": carrera.stats(),
+    }
+
+
+def comparar(antes, despues, tolerancia, min_ms):
+    """[(paso, métrica, antes, después, cambio, regresión)] de los pasos que están en los dos."""
+    filas = []
+    for paso in antes["pasos"]:
+        if paso not in despues["pasos"]:
+            continue
+        for metrica in ("p50_ms", "p95_ms"):
+            a, d = antes["pasos"][paso][metrica], despues["pasos"][paso][metrica]
+            cambio = (d - a) / a if a else 0.0
+            # Un paso de microsegundos puede "duplicarse" por ruido: se pide también una diferencia absoluta
+            filas.append((paso, metrica, a, d, cambio, cambio > tolerancia and d - a > min_ms))
+    a, d = antes["throughput"]["por_s"], despues["throughput"]["por_s"]
+    cambio = (d - a) / a if a else 0.0
+    filas.append(("throughput", "por_s", a, d, cambio, cambio < -tolerancia))
+    return filas
+
+
+def cmd_compare(args):
+    with open(args.antes) as f:
+        antes = json.load(f)
+    with open(args.despues) as f:
+        despues = json.load(f)
+    if antes["tipo"] != despues["tipo"]:
+        raise SystemExit(f"no se pueden comparar {antes['tipo']} y {despues['tipo']}")
+
+    filas = comparar(antes, despues, args.tolerancia, args.min_ms)
+    print(f"{'paso':16}{'métrica':>9}{'antes':>11}{'después':>11}{'cambio':>9}")
+    for paso, metrica, a, d, cambio, regresion in filas:
+        print(f"{paso:16}{metrica:>9}{a:>11.2f}{d:>11.2f}{cambio:>+9.1%}{'  ✗ REGRESIÓN' if regresion else ''}")
+    regresiones = sum(1 for fila in filas if fila[-1])
+    print(f"{regresiones} regresión(es) con tolerancia {args.tolerancia:.0%}")
+    raise SystemExit(1 if regresiones else 0)
+
+
+def _escribir(resultado, out):
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if out:
+        with open(out, "w") as f:
+            f.write(texto + "\n")
+        print(f"resultados en {out}", file=sys.stderr)
+    else:
+        print(texto)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    vision = sub.add_parser("vision", help="decode, predict, post-proceso, votación y plot por frame")
+    vision.add_argument("--imagenes", nargs="+", required=True, help="frames fijos (archivos, carpetas o globs)")
+    vision.add_argument("--model", default="best.pt")
+    vision.add_argument("--backend", default="torch")
+    vision.add_argument("--imgsz", type=int, default=IMGSZ)
+    vision.add_argument("--conf", type=float, default=0.5)
+    vision.add_argument("--entrada", choices=("preproceso", "completa"), default="preproceso",
+                        help="cómo se decodifica: preproceso.py (como app.py) o imdecode completo")
+    vision.add_argument("--rondas", type=int, default=3, help="vueltas a la carpeta")
+    vision.add_argument("--warmup", type=int, default=5, help="frames sin medir al inicio")
+    vision.add_argument("--out")
+    vision.set_defaults(func=bench_vision)
+
+    oraculo = sub.add_parser("oraculo", help="narrativa + voz + empalme contra servidores falsos")
+    oraculo.add_argument("--lecturas", type=int, default=20)
+    oraculo.add_argument("--concurrencia", type=int, default=1)
+    oraculo.add_argument("--deadline-s", type=float, default=12.0)
+    oraculo.add_argument("--narrativa-deadline-s", type=float, default=4.0)
+    oraculo.add_argument("--seed", type=int, default=0)
+    oraculo.add_argument("--out")
+    fake_upstreams.add_arguments(oraculo)
+    oraculo.set_defaults(func=bench_oraculo)
+
+    compare = sub.add_parser("compare", help="compara dos resultados y marca regresiones")
+    compare.add_argument("antes")
+    compare.add_argument("despues")
+    compare.add_argument("--tolerancia", type=float, default=0.10, help="cambio relativo permitido")
+    compare.add_argument("--min-ms", type=float, default=0.5, help="diferencia absoluta mínima para contar")
+    compare.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args()
+    if args.cmd == "compare":
+        args.func(args)
+    else:
+        _escribir(args.func(args), args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Micro-benchmark: votación original de Vision.py (Counter sobre el deque en cada
+frame) contra los estabilizadores incrementales de stabilizer.py.
+
+    python -m tools.bench_stabilizer --frames 200000
+"""
+import argparse
+import random
+import time
+from collections import Counter, deque
+
+from stabilizer import make_stabilizer
+
+
+def synthetic_stream(n, num_classes, seed=0):
+    """
+    Cartas que se sostienen ~1-3 s con huecos y falsos positivos de vez en cuando.
+    Regresa (stream, starts): starts = [(frame, carta)] donde empieza cada carta.
+    """
+    rng = random.Random(seed)
+    stream, starts = [], []
+    card = rng.randrange(num_classes)
+    while len(stream) < n:
+        starts.append((len(stream), card))
+        for _ in range(rng.randint(30, 90)):
+            roll = rng.random()
+            if roll < 0.15:
+                stream.append((None, 0.0))
+            elif roll < 0.22:
+                stream.append((rng.randrange(num_classes), rng.uniform(0.5, 0.75)))
+            else:
+                stream.append((card, rng.uniform(0.7, 0.98)))
+        card = rng.randrange(num_classes)
+    return stream[:n], [s for s in starts if s[0] < n]
+
+
+def counter_baseline(stream, history, min_hits):
+    """Lo que hace Vision.py hoy, frame por frame."""
+    hist = deque(maxlen=history)
+    out = []
+    for cls_id, _conf in stream:
+        hist.append(cls_id)
+        stable = None
+        counts = Counter([x for x in hist if x is not None])
+        if counts:
+            label, hits = counts.most_common(1)[0]
+            if hits >= min_hits:
+                stable = label
+        out.append(stable)
+    return out
+
+
+def run_stabilizer(stream, stab):
+    update = stab.update
+    return [update(cls_id, conf) for cls_id, conf in stream]
+
+
+def _flips(labels):
+    return sum(1 for a, b in zip(labels, labels[1:]) if a != b)
+
+
+def _confirm_lag(starts, labels):
+    """Frames promedio entre que aparece una carta y que se confirma."""
+    lags = []
+    bounds = [f for f, _ in starts[1:]] + [len(labels)]
+    for (start, card), end in zip(starts, bounds):
+        for i in range(start, end):
+            if labels[i] == card:
+                lags.append(i - start)
+                break
+    return sum(lags) / len(lags) if lags else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=200_000)
+    parser.add_argument("--classes", type=int, default=38)
+    parser.add_argument("--history", type=int, default=12)
+    parser.add_argument("--min-hits", type=int, default=7)
+    args = parser.parse_args()
+
+    stream, starts = synthetic_stream(args.frames, args.classes)
+
+    cases = [
+        ("counter (actual)", lambda: counter_baseline(stream, args.history, args.min_hits)),
+        ("majority", lambda: run_stabilizer(stream, make_stabilizer(
+            "majority", args.classes, history=args.history, min_hits=args.min_hits))),
+        ("majority min_hits=4", lambda: run_stabilizer(stream, make_stabilizer(
+            "majority", args.classes, history=args.history, min_hits=4))),
+        ("ema", lambda: run_stabilizer(stream, make_stabilizer("ema", args.classes))),
+        ("hysteresis", lambda: run_stabilizer(stream, make_stabilizer("hysteresis", args.classes))),
+    ]
+
+    baseline = None
+    print(f"{'política':<22}{'ns/frame':>10}{'speedup':>9}{'cambios':>9}{'lag':>7}{'= actual':>10}")
+    for name, fn in cases:
+        t0 = time.perf_counter()
+        labels = fn()
+        ns = (time.perf_counter() - t0) / len(stream) * 1e9
+        if baseline is None:
+            baseline, base_ns = labels, ns
+        same = sum(a == b for a, b in zip(labels, baseline)) / len(stream)
+        print(f"{name:<22}{ns:>10.0f}{base_ns / ns:>8.1f}x{_flips(labels):>9}"
+              f"{_confirm_lag(starts, labels):>7.1f}{same:>9.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Verifica upstream.py contra tools/fake_upstreams.py con fallas inyectadas:
+
+  1. 503 y cola lenta: llamadas directas al SDK contra Upstream (reintentos + hedging)
+  2. caída total: el breaker abre y las llamadas fallan de inmediato al fallback
+
+Las fallas y lentas del servidor salen de --seed, igual que el jitter de los
+reintentos. Antes de medir, Upstream hace --calentar llamadas sin fallas para
+que el hedge ya tenga su p95 (con menos de `hedge_min_samples` no se lanza).
+
+Pasa si Upstream tiene más éxitos que el SDK directo y menos llamadas en la
+cola lenta (más de --slow-ms / 2); el p99 se reporta pero no se exige: con
+3% de lentas el de Upstream cae justo en el borde de las que ni el hedge
+salva (la copia también falla o también es lenta).
+
+    python -m tools.chaos_upstream --calls 500 --concurrency 8 --error-rate 0.15 --slow-rate 0.03
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from google import genai
+
+from oraculo import generar_con_gemini
+from tools import fake_upstreams
+from upstream import CircuitBreaker, CircuitOpen, RetryBudget, Upstream, pooled_httpx_client
+
+CARTAS = ("La Sirena", "El Gallo", "La Muerte")
+
+
+def _pct(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)] if values else 0.0
+
+
+def run(label, fn, calls, concurrency, lenta_ms):
+    def one(_):
+        t0 = time.perf_counter()
+        try:
+            fn()
+            ok = True
+        except Exception:
+            ok = False
+        return ok, (time.perf_counter() - t0) * 1000.0
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(calls)))
+    lats = [ms for _, ms in results]
+    ok = sum(1 for good, _ in results if good)
+    lentas = sum(1 for ms in lats if ms > lenta_ms)
+    print(f"{label:26}{ok / calls:>8.1%}{_pct(lats, 0.5):>9.0f}{_pct(lats, 0.95):>9.0f}{_pct(lats, 0.99):>9.0f}"
+          f"{lentas:>8}")
+    return ok / calls, lentas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--deadline-s", type=float, default=3.0)
+    parser.add_argument("--budget-ratio", type=float, default=0.5, help="reintentos+hedges por llamada original")
+    parser.add_argument("--hedge-min-samples", type=int, default=20)
+    parser.add_argument("--calentar", type=int, default=40, help="llamadas sin fallas antes de medir")
+    parser.add_argument("--seed", type=int, default=0)
+    fake_upstreams.add_arguments(parser)
+    parser.set_defaults(gemini_first_ms=80.0, gemini_chunk_ms=2.0, error_rate=0.15, slow_rate=0.03, slow_ms=2500.0)
+    args = parser.parse_args()
+    if args.calentar < args.hedge_min_samples:
+        parser.error("--calentar debe ser >= --hedge-min-samples, si no el hedge se prende a media medición")
+
+    random.seed(args.seed)      # el jitter de los reintentos
+    retrasos = fake_upstreams.retrasos_from_args(args)
+    server, url = fake_upstreams.start(retrasos=retrasos, semilla=args.seed)
+    client = genai.Client(api_key="fake", http_options={
+        "base_url": url, "timeout": int(args.deadline_s * 1000), "httpx_client": pooled_httpx_client(args.deadline_s)})
+
+    def directo():
+        return generar_con_gemini(client, *CARTAS)
+
+    # Con 15% de errores el presupuesto por defecto (20%) se agota; por eso --budget-ratio 0.5
+    resiliente = Upstream("gemini", deadline_s=args.deadline_s, retries=3, backoff_s=0.05, hedge=True,
+                          hedge_min_ms=50.0, hedge_min_samples=args.hedge_min_samples,
+                          breaker=CircuitBreaker(failure_threshold=1000), budget=RetryBudget(ratio=args.budget_ratio))
+
+    # Calentamiento sin fallas: el hedge necesita `hedge_min_samples` intentos buenos para tener su p95
+    error_rate, slow_rate = retrasos.error_rate, retrasos.slow_rate
+    retrasos.error_rate = retrasos.slow_rate = 0.0
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(lambda _: resiliente.call(directo), range(args.calentar)))
+    retrasos.error_rate, retrasos.slow_rate = error_rate, slow_rate
+
+    lenta_ms = retrasos.slow_ms / 2
+    print(f"errores {retrasos.error_rate:.0%}, lentas {retrasos.slow_rate:.0%} (+{retrasos.slow_ms:.0f} ms), "
+          f"semilla {args.seed}")
+    print(f"{'':26}{'éxito':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{f'>{lenta_ms:.0f}':>8}")
+    ok_directo, lentas_directo = run("SDK directo", directo, args.calls, args.concurrency, lenta_ms)
+    ok_res, lentas_res = run("Upstream (retry+hedge)", lambda: resiliente.call(directo), args.calls,
+                             args.concurrency, lenta_ms)
+    print(f"  {resiliente.stats()}  (incluye {args.calentar} de calentamiento)")
+
+    # Caída total: tras `failure_threshold` fallas el breaker abre y ya no se llama al servicio
+    retrasos.error_rate = 1.0
+    caido = Upstream("gemini-caido", deadline_s=args.deadline_s, retries=1, backoff_s=0.05,
+                     breaker=CircuitBreaker(failure_threshold=5, reset_s=60.0))
+    rechazadas = []
+    for _ in range(50):
+        t0 = time.perf_counter()
+        try:
+            caido.call(directo)
+        except CircuitOpen:
+            rechazadas.append((time.perf_counter() - t0) * 1000.0)
+        except Exception:
+            pass
+    server.shutdown()
+    print(f"caída total: breaker {caido.breaker.state}, {len(rechazadas)}/50 rechazadas sin llamar "
+          f"(p99 {_pct(rechazadas, 0.99):.2f} ms)")
+
+    ok = ok_res > ok_directo and lentas_res < lentas_directo and caido.breaker.state == "open" and len(rechazadas) >= 40
+    print("OK" if ok else "FALLA")
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Corre la captura continua de app.py sin navegador: una FuenteLocal (carpeta
+de fotos, video o webcam) manda frames a CapturaContinua con el modelo real
+detrás de un BatchingInferenceServer, como en la app.
+
+Reporta qué cartas se capturaron y cuándo, cuántos frames llegaron, cuántos
+se tiraron por ir la inferencia ocupada y a qué ritmo se infirió.
+
+    python -m tools.e2e_captura --fuente fotos_cartas/ --segundos 20
+    python -m tools.e2e_captura --fuente video_cartas.mp4 --fps-fuente 30 --max-fps 5
+"""
+import argparse
+import time
+
+from captura_continua import CapturaContinua, FuenteLocal
+from detector import Detector
+from inference_server import BatchingInferenceServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fuente", required=True, help="carpeta/imagen, video o índice de webcam")
+    parser.add_argument("--segundos", type=float, default=20.0)
+    parser.add_argument("--fps-fuente", type=float, default=15.0, help="frames por segundo que manda la fuente")
+    parser.add_argument("--max-fps", type=float, default=5.0, help="tope de inferencias por segundo")
+    parser.add_argument("--sostener-s", type=float, default=3.0, help="segundos por foto (fuente de carpeta)")
+    parser.add_argument("--model", default="best.pt")
+    parser.add_argument("--backend", default="torch")
+    parser.add_argument("--conf", type=float, default=0.5)
+    args = parser.parse_args()
+
+    detector = Detector(args.model, backend=args.backend, conf=args.conf)
+    server = BatchingInferenceServer(detector)
+    captura = CapturaContinua(detector, lambda frame: server.predict(frame, timeout=30), max_fps=args.max_fps)
+
+    t0 = time.perf_counter()
+    fuente = FuenteLocal(args.fuente, captura.recibir, fps=args.fps_fuente, sostener_s=args.sostener_s)
+    capturadas = []
+    while time.perf_counter() - t0 < args.segundos and fuente.activa():
+        for carta in captura.pendientes():
+            capturadas.append(carta)
+            print(f"{time.perf_counter() - t0:6.2f}s  capturada: {carta}")
+        time.sleep(0.05)
+    fuente.cerrar()
+    captura.cerrar()
+
+    stats = captura.stats()
+    segundos = time.perf_counter() - t0
+    print(f"\n{len(capturadas)} capturas en {segundos:.1f}s: {capturadas}")
+    print(f"frames recibidos {stats['recibidos']} ({stats['recibidos'] / segundos:.1f}/s), "
+          f"tirados {stats['tirados']}, inferencias {stats['inferencias']} ({stats['inferencias'] / segundos:.1f}/s), "
+          f"sin cambios (gate) {stats['saltados_gate']}, errores {stats['errores']}")
+    print(f"inferencia: {server.stats()}")
+
+
+if __name__ == "__main__":
+    main()
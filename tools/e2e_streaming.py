@@ -0,0 +1,86 @@
+"""
+Prueba de punta a punta de la lectura contra los servidores falsos de
+tools/fake_upstreams.py, con los SDK reales de Gemini y ElevenLabs.
+
+Compara el flujo secuencial (generate_content completo -> convert completo)
+con el streaming (generate_content_stream -> oraciones -> TTS por oración):
+tiempo a la primera palabra, al primer sonido y total.
+
+    python -m tools.e2e_streaming --gemini-first-ms 800 --tts-first-ms 400
+"""
+import argparse
+import sys
+import time
+
+from google import genai
+from elevenlabs.client import ElevenLabs
+
+import mp3
+from oraculo import generar_con_gemini, stream_con_gemini
+from streaming import LecturaEnStreaming
+from tools import fake_upstreams
+
+CARTAS = ("La Sirena", "El Gallo", "La Muerte")
+
+
+def _tts(client):
+    def sintetizar(texto):
+        return b"".join(client.text_to_speech.convert(
+            voice_id="fake", text=texto, model_id="eleven_v3", output_format="mp3_44100_128"))
+    return sintetizar
+
+
+def secuencial(gemini, sintetizar):
+    t0 = time.perf_counter()
+    texto = generar_con_gemini(gemini, *CARTAS)
+    t_texto = time.perf_counter() - t0
+    audio = sintetizar(texto)
+    t_audio = time.perf_counter() - t0
+    return {"texto": texto, "audio": audio, "primera_palabra": t_texto, "primer_sonido": t_audio, "total": t_audio}
+
+
+def en_streaming(gemini, sintetizar, workers):
+    lectura = LecturaEnStreaming(stream_con_gemini(gemini, *CARTAS), sintetizar, workers=workers)
+    clips = []
+    for tipo, dato, oracion in lectura.eventos():
+        if tipo == "audio":
+            clips.append(dato)
+        elif tipo == "error_audio":
+            raise dato
+    if lectura.error:
+        raise lectura.error
+    return {"texto": lectura.texto.strip(), "audio": mp3.concat(*clips), "oraciones": len(clips),
+            "primera_palabra": lectura.t_primer_texto, "primer_sonido": lectura.t_primer_audio,
+            "total": time.perf_counter() - lectura.t0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=2, help="hilos de TTS en streaming")
+    fake_upstreams.add_arguments(parser)
+    args = parser.parse_args()
+
+    server, url = fake_upstreams.start(retrasos=fake_upstreams.retrasos_from_args(args))
+    gemini = genai.Client(api_key="fake", http_options={"base_url": url})
+    sintetizar = _tts(ElevenLabs(api_key="fake", base_url=url))
+    try:
+        sec = secuencial(gemini, sintetizar)
+        stream = en_streaming(gemini, sintetizar, args.workers)
+    finally:
+        server.shutdown()
+
+    print(f"{'':18}{'secuencial':>12}{'streaming':>12}")
+    for k in ("primera_palabra", "primer_sonido", "total"):
+        print(f"{k:18}{sec[k]:>11.2f}s{stream[k]:>11.2f}s")
+    print(f"{stream['oraciones']} oraciones, audio {mp3.duration(stream['audio']):.1f}s "
+          f"(secuencial {mp3.duration(sec['audio']):.1f}s)")
+
+    ok = (stream["texto"] == sec["texto"]
+          and stream["primera_palabra"] < sec["primera_palabra"]
+          and stream["primer_sonido"] < sec["primer_sonido"])
+    print("OK" if ok else "FALLA: el streaming no mejoró la latencia o el texto no coincide")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Servidores falsos de Gemini y ElevenLabs para probar la lectura de punta a
+punta sin llaves ni red. Un solo servidor HTTP atiende las dos APIs:
+
+  POST /v1beta/models/<modelo>:generateContent           JSON completo
+  POST /v1beta/models/<modelo>:streamGenerateContent     SSE, un evento por pedazo
+  POST /v1/text-to-speech/<voz>[/stream]                 audio/mpeg (silencio)
+
+Los retrasos se configuran para imitar las APIs reales, y se pueden inyectar
+errores 503 y respuestas lentas (cola larga) para probar upstream.py:
+
+    python -m tools.fake_upstreams --port 8765 --gemini-first-ms 600 --gemini-chunk-ms 60
+    python -m tools.fake_upstreams --error-rate 0.2 --slow-rate 0.05 --slow-ms 5000
+    python -m tools.fake_upstreams --vacia-rate 1      # Gemini siempre bloqueado: se lee la narrativa local
+    GEMINI_BASE_URL=http://127.0.0.1:8765 ELEVENLABS_BASE_URL=http://127.0.0.1:8765 streamlit run app.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Un frame MPEG-1 Layer III, 128 kbps, 44.1 kHz, mono, sin CRC ni padding: 417 bytes, 1152 muestras
+_FRAME = b"\xff\xfb\x90\xc4" + bytes(413)
+_FRAME_S = 1152 / 44100
+
+
+@dataclass
+class Retrasos:
+    gemini_first_ms: float = 600.0     # hasta el primer pedazo de texto
+    gemini_chunk_ms: float = 60.0      # entre pedazos
+    chunk_words: int = 3               # palabras por pedazo
+    tts_first_ms: float = 350.0        # hasta el primer byte de audio
+    tts_realtime: float = 4.0          # segundos de audio generados por segundo de reloj
+    chars_per_s: float = 14.0          # velocidad de "habla" del audio falso
+    error_rate: float = 0.0            # fracción de peticiones que responden 503
+    slow_rate: float = 0.0             # fracción de peticiones con `slow_ms` extra antes de responder
+    slow_ms: float = 3000.0
+    vacia_rate: float = 0.0            # fracción de respuestas de Gemini bloqueadas: sin ningún texto
+
+
+def narrativa_falsa(c1, c2, c3):
+    return (f"Uy, se ve que {c1} te dejó marcado desde hace rato, mi cuate. "
+            f"Ahorita {c2} te trae dando vueltas como trompo, sin saber pa' dónde jalar. "
+            f"Por eso aguas, porque {c3} ya viene en camino y no perdona a los distraídos. "
+            f"¡Ponte trucha y no le des la espalda al destino!")
+
+
+def mp3_silencio(segundos):
+    return _FRAME * max(1, round(segundos / _FRAME_S))
+
+
+def _cartas_del_prompt(prompt):
+    cartas = [re.search(rf"{et}[^:]*:\s*(.+)", prompt) for et in ("PASADO", "PRESENTE", "FUTURO")]
+    return [m.group(1).strip() if m else "?" for m in cartas]
+
+
+def _pedazos(texto, palabras):
+    tokens = texto.split(" ")
+    for i in range(0, len(tokens), palabras):
+        yield " ".join(tokens[i:i + palabras]) + (" " if i + palabras < len(tokens) else "")
+
+
+def _respuesta_gemini(texto):
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": texto}]}, "index": 0}]}
+
+
+def _respuesta_bloqueada():
+    """Como cuando el filtro de seguridad corta la respuesta: un candidato sin contenido."""
+    return {"candidates": [{"finishReason": "SAFETY", "index": 0}]}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    retrasos = Retrasos()
+    azar = random       # de aquí salen las fallas/lentas inyectadas (ver `start`)
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(n) or b"{}")
+
+    def do_POST(self):
+        body = self._body()
+        r = self.retrasos
+        lenta, falla = self.azar.random() < r.slow_rate, self.azar.random() < r.error_rate
+        if lenta:
+            time.sleep(r.slow_ms / 1000.0)
+        if falla:
+            data = json.dumps({"error": {"code": 503, "message": "falla inyectada", "status": "UNAVAILABLE"}}).encode()
+            self.send_response(503)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        if ":streamGenerateContent" in self.path or ":generateContent" in self.path:
+            self._gemini(body, stream=":streamGenerateContent" in self.path)
+        elif self.path.startswith("/v1/text-to-speech/"):
+            self._tts(body)
+        else:
+            self.send_error(404)
+
+    def _gemini(self, body, stream):
+        r = self.retrasos
+        prompt = "".join(p.get("text", "") for c in body.get("contents", []) for p in c.get("parts", []))
+        texto = narrativa_falsa(*_cartas_del_prompt(prompt))
+        time.sleep(r.gemini_first_ms / 1000.0)
+        bloqueada = r.vacia_rate > 0 and self.azar.random() < r.vacia_rate
+
+        if not stream:
+            time.sleep(r.gemini_chunk_ms / 1000.0 * len(list(_pedazos(texto, r.chunk_words))))
+            data = json.dumps(_respuesta_bloqueada() if bloqueada else _respuesta_gemini(texto)).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        if bloqueada:
+            self._chunk(f"data: {json.dumps(_respuesta_bloqueada())}\r\n\r\n".encode())
+            self._chunk(b"")
+            return
+        for i, pedazo in enumerate(_pedazos(texto, r.chunk_words)):
+            if i:
+                time.sleep(r.gemini_chunk_ms / 1000.0)
+            self._chunk(f"data: {json.dumps(_respuesta_gemini(pedazo))}\r\n\r\n".encode())
+        self._chunk(b"")
+
+    def _tts(self, body):
+        r = self.retrasos
+        audio = mp3_silencio(len(body.get("text", "")) / r.chars_per_s)
+        time.sleep(r.tts_first_ms / 1000.0)
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        # Se "genera" más rápido que el tiempo real, en pedazos de ~0.25 s de audio
+        paso = max(1, round(0.25 / _FRAME_S)) * len(_FRAME)
+        for i in range(0, len(audio), paso):
+            pedazo = audio[i:i + paso]
+            time.sleep(len(pedazo) / len(_FRAME) * _FRAME_S / r.tts_realtime)
+            self._chunk(pedazo)
+        self._chunk(b"")
+
+    def _chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+def start(port=0, retrasos=None, semilla=None):
+    """
+    Arranca el servidor en un hilo. Regresa (server, base_url); detener con server.shutdown().
+
+    Con `semilla` las fallas/lentas inyectadas salen de su propio generador:
+    la secuencia es la misma en cada corrida aunque quien llama también use
+    `random` (p. ej. el jitter de upstream.py). Sin ella salen de `random`.
+    """
+    azar = random if semilla is None else random.Random(semilla)
+    handler = type("Handler", (_Handler,), {"retrasos": retrasos or Retrasos(), "azar": azar})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-upstreams", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def add_arguments(parser):
+    for name, default in vars(Retrasos()).items():
+        parser.add_argument("--" + name.replace("_", "-"), type=type(default), default=default)
+
+
+def retrasos_from_args(args):
+    return Retrasos(**{name: getattr(args, name) for name in vars(Retrasos())})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    add_arguments(parser)
+    args = parser.parse_args()
+    server, url = start(args.port, retrasos_from_args(args))
+    print(f"Gemini/ElevenLabs falsos en {url} (Ctrl+C para salir)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
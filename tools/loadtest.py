@@ -0,0 +1,357 @@
+"""
+Prueba de carga de app.py: ¿cuántas sesiones del oráculo aguanta un solo
+proceso de Streamlit antes de que la latencia de captura se dispare?
+
+Cada sesión simulada es un AppTest con su propio session_state, corriendo en
+su hilo dentro de este proceso (como las sesiones de un worker de Streamlit:
+mismo GIL, mismos cache_resource, mismo servidor de inferencia). Una lectura:
+
+  pagina    primera ejecución completa de app.py
+  foto      una foto de la cámara: re-ejecuta sólo el fragment de detección,
+            como el navegador; se repite hasta juntar 3 cartas distintas
+  lectura   la foto de la tercera carta: detección + página completa + modal
+            (mostrar_revelacion con Gemini y ElevenLabs)
+
+Las fotos son sintéticas: las de --imagenes con un pequeño giro, escala,
+desplazamiento, brillo y ruido, re-codificadas a JPEG de cámara (640 px).
+Gemini y ElevenLabs son tools/fake_upstreams.py con latencias configurables.
+También se reportan los spans del servidor (foto, modelo, narrativa,
+voz...): metricas.py se prende para la prueba. Las re-ejecuciones de un solo
+fragment parchan internos de AppTest (ver STREAMLIT_PROBADO en
+tools/measure_reruns.py): con otra versión de Streamlit se revisan antes de
+empezar y, si falta alguno, la prueba no corre.
+
+Por cada nivel de --sesiones (sesiones concurrentes, cada una haciendo
+--lecturas lecturas seguidas, una sesión nueva por lectura) se reporta:
+percentiles por paso, lecturas y fotos por segundo, y la memoria (RSS) al
+inicio, el pico y lo que queda después de soltar las sesiones.
+
+El almacén de narrativas y el caché de audio van a una carpeta temporal (no
+se ensucian los de la app); el caché de fotos por pHash se apaga para que
+cada foto pase por el modelo (--cache-fotos lo deja prendido).
+
+    python -m tools.loadtest --imagenes fotos_cartas/ --sesiones 1 2 4 8
+    python -m tools.loadtest --imagenes fotos_cartas/ --sesiones 4 --gemini-first-ms 1500 --tts-first-ms 800
+    ORACULO_STREAMING=1 python -m tools.loadtest --imagenes fotos_cartas/ --sesiones 1 4 --out carga.json
+"""
+import argparse
+import gc
+import os
+import random
+import tempfile
+import threading
+import time
+import traceback
+
+import cv2
+import numpy as np
+import streamlit as st
+from streamlit.runtime.secrets import Secrets
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+import metricas
+from tools import fake_upstreams
+from tools.bench import PERCENTILES, _escribir, _meta, _resumen
+from tools.measure_reruns import _imagenes, forzar_fragment, verificar_internos
+
+CLAVE_FOTO = "_loadtest_foto"       # session_state: la foto que regresa st.camera_input en esta sesión
+SPANS = ("foto", "modelo", "fragment_deteccion", "rerun", "narrativa", "voz", "revelacion_streaming")
+LLAVES = {"GEMINI_API_KEY": "fake", "ELEVENLABS_API_KEY": "fake"}
+
+_forzar = {}        # id(session_state) -> fragment_id a correr en la siguiente run() de esa sesión
+_fragmentos = {}    # id(session_state) -> fragment_ids que aparecieron en su última run()
+
+
+class _Foto:
+    """Lo mínimo de UploadedFile que usa app.py."""
+
+    def __init__(self, data):
+        self._data = data
+
+    def getvalue(self):
+        return self._data
+
+
+def _camera_input(*args, **kwargs):
+    data = st.session_state.get(CLAVE_FOTO)
+    return None if data is None else _Foto(data)
+
+
+class _ArbolIncompleto(Exception):
+    """
+    app.py sí corrió pero AppTest no pudo armar el árbol de elementos (le pasa
+    cuando la página termina en st.balloons() + st.rerun() + st.dialog).
+    `error` es el mensaje de la excepción de app.py en esa ejecución, si hubo.
+    """
+
+    def __init__(self, error):
+        super().__init__(error)
+        self.error = error
+
+
+def _del_arbol(exc):
+    """True si `exc` salió de armar el árbol de AppTest (parse_tree_from_messages), no de app.py ni del runner."""
+    return any(frame.f_code.co_name == "parse_tree_from_messages" for frame, _ in traceback.walk_tb(exc.__traceback__))
+
+
+def _instrumentar():
+    """Con `_forzar`, la siguiente run() de esa sesión re-ejecuta sólo un fragment (como un clic en la cámara)."""
+    secretos = Secrets()
+    verificar_internos(("Secrets._secrets", hasattr(secretos, "_secrets")))
+    run_original = LocalScriptRunner.run
+    rerun_original = LocalScriptRunner.request_rerun
+
+    def run(self, *args, **kwargs):
+        self._fragmento_carga = _forzar.pop(id(self.session_state), None)
+        try:
+            return run_original(self, *args, **kwargs)
+        except AttributeError as e:
+            if not _del_arbol(e):
+                raise
+            # Sin árbol no hay at.exception: los errores de app.py se buscan en los mensajes
+            errores = [m.delta.new_element.exception.message for m in self.forward_msgs()
+                       if m.HasField("delta") and m.delta.HasField("new_element")
+                       and m.delta.new_element.HasField("exception")]
+            raise _ArbolIncompleto(errores[0] if errores else None) from e
+        finally:
+            _fragmentos[id(self.session_state)] = {
+                m.delta.fragment_id for m in self.forward_msgs() if m.HasField("delta") and m.delta.fragment_id}
+
+    def request_rerun(self, rerun_data):
+        ok = rerun_original(self, rerun_data)
+        fragmento = getattr(self, "_fragmento_carga", None)
+        if fragmento is not None:
+            # Sólo la primera petición: un st.rerun() dentro del fragment (tercera carta) sí es de página completa
+            self._fragmento_carga = None
+            forzar_fragment(self, fragmento)
+        return ok
+
+    LocalScriptRunner.run = run
+    LocalScriptRunner.request_rerun = request_rerun
+    st.camera_input = _camera_input
+    # AppTest cambia st.secrets global en cada run(): con las mismas llaves de antes y después
+    # no importa cuál sesión lo restaure primero
+    secretos._secrets = dict(LLAVES)
+    st.secrets = secretos
+
+
+def variantes(img, n, rng, lado=640):
+    """`n` JPEGs "de cámara" de `img`: giro, escala, desplazamiento, brillo y ruido al azar."""
+    h, w = img.shape[:2]
+    escala = lado / max(h, w)
+    img = cv2.resize(img, (round(w * escala), round(h * escala)), interpolation=cv2.INTER_AREA)
+    h, w = img.shape[:2]
+    out = []
+    for _ in range(n):
+        m = cv2.getRotationMatrix2D((w / 2, h / 2), rng.uniform(-4, 4), rng.uniform(0.92, 1.08))
+        m[:, 2] += (rng.uniform(-0.03, 0.03) * w, rng.uniform(-0.03, 0.03) * h)
+        v = cv2.warpAffine(img, m, (w, h), borderMode=cv2.BORDER_REFLECT)
+        ruido = np.random.default_rng(rng.getrandbits(32)).normal(rng.uniform(-20, 20), 4.0, v.shape)
+        v = np.clip(v.astype(np.float32) + ruido, 0, 255).astype(np.uint8)
+        out.append(cv2.imencode(".jpg", v, [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes())
+    return out
+
+
+def _run(at):
+    """Una run() de la sesión. Regresa el mensaje de la excepción de app.py, o None si corrió bien."""
+    try:
+        at.run()
+    except _ArbolIncompleto as e:
+        return e.error
+    return at.exception[0].message if at.exception else None
+
+
+def lectura(app, fotos, rng, timeout_s, max_fotos):
+    """Una sesión nueva de principio a fin. Regresa ([(paso, ms)], completa, fotos usadas, error)."""
+    at = AppTest.from_file(app, default_timeout=timeout_s)
+    at.secrets.update(LLAVES)
+    pasos = []
+
+    t0 = time.perf_counter()
+    error = _run(at)
+    pasos.append(("pagina", (time.perf_counter() - t0) * 1000.0))
+    if error:
+        return pasos, False, 0, error
+    fragmentos = _fragmentos.get(id(at._session_state), set())
+    if len(fragmentos) != 1:
+        return pasos, False, 0, f"esperaba un fragment (panel_deteccion), hay {len(fragmentos)}"
+    fragmento = next(iter(fragmentos))
+
+    orden = rng.sample(range(len(fotos)), len(fotos))
+    usadas = 0
+    while len(at.session_state["cartas_vistas"]) < 3 and usadas < max_fotos:
+        at.session_state[CLAVE_FOTO] = fotos[orden[usadas % len(orden)]]
+        usadas += 1
+        _forzar[id(at._session_state)] = fragmento
+        t0 = time.perf_counter()
+        error = _run(at)
+        ms = (time.perf_counter() - t0) * 1000.0
+        pasos.append(("lectura" if len(at.session_state["cartas_vistas"]) >= 3 else "foto", ms))
+        if error:
+            return pasos, False, usadas, error
+
+    completa = "prediccion_cartas" in at.session_state
+    _fragmentos.pop(id(at._session_state), None)
+    return pasos, completa, usadas, None if completa else "no juntó 3 cartas distintas"
+
+
+class _Memoria:
+    """Muestrea el RSS del proceso para quedarse con el pico."""
+
+    def __init__(self, intervalo_s=0.1):
+        self.pico = metricas.rss_bytes()
+        self._stop = threading.Event()
+        self._hilo = threading.Thread(target=self._run, args=(intervalo_s,), daemon=True)
+        self._hilo.start()
+
+    def _run(self, intervalo_s):
+        while not self._stop.wait(intervalo_s):
+            self.pico = max(self.pico, metricas.rss_bytes())
+
+    def detener(self):
+        self._stop.set()
+        self._hilo.join()
+        return self.pico
+
+
+def nivel(args, fotos, sesiones, semilla):
+    """`sesiones` hilos, cada uno haciendo `args.lecturas` lecturas seguidas."""
+    metricas.reiniciar()
+    gc.collect()
+    rss_inicio = metricas.rss_bytes()
+    memoria = _Memoria()
+    resultados = [[] for _ in range(sesiones)]
+
+    def sesion(i):
+        rng = random.Random(semilla * 1000 + i)
+        for _ in range(args.lecturas):
+            resultados[i].append(lectura(args.app, fotos, rng, args.timeout_s, args.max_fotos))
+
+    t0 = time.perf_counter()
+    hilos = [threading.Thread(target=sesion, args=(i,), name=f"sesion-{i}") for i in range(sesiones)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    segundos = time.perf_counter() - t0
+    rss_pico = memoria.detener()
+    spans = {nombre: hist for nombre, hist in metricas.histogramas().items() if nombre in SPANS and hist.count}
+
+    lecturas = [r for rs in resultados for r in rs]
+    del resultados
+    gc.collect()
+    rss_fin = metricas.rss_bytes()
+
+    ms = {}
+    for pasos, _, _, _ in lecturas:
+        for paso, t in pasos:
+            ms.setdefault(paso, []).append(t)
+    completas = sum(1 for r in lecturas if r[1])
+    n_fotos = sum(r[2] for r in lecturas)
+    errores = sorted({r[3] for r in lecturas if r[3]})
+    mb = 2 ** 20
+    return {
+        "sesiones": sesiones,
+        "pasos": {paso: _resumen(t) for paso, t in ms.items()},
+        # Del lado del servidor (histogramas de metricas.py: percentiles interpolados por cubeta)
+        "spans": {nombre: {"n": h.count, **{f"p{q}_ms": round(h.percentile(q / 100.0), 1) for q in PERCENTILES}}
+                  for nombre, h in sorted(spans.items())},
+        "throughput": {"segundos": round(segundos, 3), "lecturas": len(lecturas), "completas": completas,
+                       "lecturas_por_s": round(completas / segundos, 3), "fotos": n_fotos,
+                       "fotos_por_s": round(n_fotos / segundos, 3)},
+        "memoria_mb": {"inicio": round(rss_inicio / mb, 1), "pico": round(rss_pico / mb, 1),
+                       "fin": round(rss_fin / mb, 1), "crecimiento": round((rss_fin - rss_inicio) / mb, 1)},
+        "errores": errores,
+    }
+
+
+def _imprimir(niveles):
+    print(f"\n{'sesiones':>8}{'lect/s':>8}{'fotos/s':>9}{'página p50':>12}{'foto p50':>10}{'p95':>8}{'p99':>8}"
+          f"{'lectura p50':>13}{'p95':>8}{'RSS MB inicio/pico/fin':>25}")
+    for r in niveles:
+        p, t, m = r["pasos"], r["throughput"], r["memoria_mb"]
+        vacio = {"p50_ms": float("nan"), "p95_ms": float("nan"), "p99_ms": float("nan")}
+        pagina, foto, lect = p.get("pagina", vacio), p.get("foto", vacio), p.get("lectura", vacio)
+        print(f"{r['sesiones']:>8}{t['lecturas_por_s']:>8.2f}{t['fotos_por_s']:>9.2f}{pagina['p50_ms']:>12.0f}"
+              f"{foto['p50_ms']:>10.0f}{foto['p95_ms']:>8.0f}{foto['p99_ms']:>8.0f}"
+              f"{lect['p50_ms']:>13.0f}{lect['p95_ms']:>8.0f}"
+              f"{m['inicio']:>11.0f} / {m['pico']:.0f} / {m['fin']:.0f}")
+    print("\nspans del servidor, p50/p95 ms:")
+    for r in niveles:
+        print(f"{r['sesiones']:>8}  " + "  ".join(f"{n} {s['p50_ms']:.0f}/{s['p95_ms']:.0f}" for n, s in r["spans"].items()))
+    for r in niveles:
+        if r["throughput"]["completas"] < r["throughput"]["lecturas"]:
+            print(f"⚠️ {r['sesiones']} sesiones: {r['throughput']['lecturas'] - r['throughput']['completas']} "
+                  f"lecturas incompletas: {r['errores']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--imagenes", nargs="+", required=True,
+                        help="fotos de cartas (archivos, carpetas o globs); se necesitan al menos 3 cartas distintas")
+    parser.add_argument("--sesiones", type=int, nargs="+", default=[1, 2, 4, 8], help="niveles de concurrencia")
+    parser.add_argument("--lecturas", type=int, default=2, help="lecturas seguidas por sesión en cada nivel")
+    parser.add_argument("--variantes", type=int, default=6, help="fotos sintéticas por imagen")
+    parser.add_argument("--max-fotos", type=int, default=30, help="fotos por lectura antes de darla por perdida")
+    parser.add_argument("--timeout-s", type=float, default=120.0, help="por ejecución de app.py")
+    parser.add_argument("--cache-fotos", action="store_true", help="dejar prendido el caché de fotos por pHash")
+    parser.add_argument("--caches-reales", action="store_true", help="usar el almacén y el caché de audio de la app")
+    parser.add_argument("--app", default="app.py")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="resultados en JSON")
+    fake_upstreams.add_arguments(parser)
+    args = parser.parse_args()
+    args.app = os.path.abspath(args.app)
+
+    rng = random.Random(args.seed)
+    fotos = []
+    for ruta in _imagenes(args.imagenes):
+        img = cv2.imread(ruta, cv2.IMREAD_COLOR)
+        if img is not None:
+            fotos += variantes(img, args.variantes, rng)
+    if not fotos:
+        parser.error("no encontré imágenes")
+
+    random.seed(args.seed)      # las fallas/lentas inyectadas del servidor falso
+    server, url = fake_upstreams.start(retrasos=fake_upstreams.retrasos_from_args(args))
+    temporal = tempfile.TemporaryDirectory(prefix="loadtest-")
+    os.environ.update({
+        "GEMINI_BASE_URL": url,
+        "ELEVENLABS_BASE_URL": url,
+        "MODELO_EN_FONDO": "0",         # el modelo se carga en el calentamiento, no dentro de un nivel
+        "CAMARA_CONTINUA": "0",
+        "TRES_EN_UNA": "0",
+        "METRICAS_PUERTO": "0",         # /metrics en un puerto libre: aquí se leen los histogramas directo
+    })
+    if not args.cache_fotos:
+        os.environ["PHASH_MAX_DISTANCE"] = "-1"
+    if not args.caches_reales:
+        os.environ["NARRATIVE_DB"] = os.path.join(temporal.name, "narrativas.sqlite")
+        os.environ["AUDIO_CACHE_DIR"] = os.path.join(temporal.name, "audio")
+    # Los spans se deciden al decorar: antes de que app.py se importe por primera vez
+    metricas.activar()
+    _instrumentar()
+
+    try:
+        print(f"{len(fotos)} fotos sintéticas; calentando (modelo, SDKs, intros)...")
+        _, completa, _, error = lectura(args.app, fotos, random.Random(args.seed), args.timeout_s, args.max_fotos)
+        if not completa:
+            raise SystemExit(f"la lectura de calentamiento no terminó: {error}")
+        niveles = []
+        for i, sesiones in enumerate(args.sesiones):
+            r = nivel(args, fotos, sesiones, args.seed + i + 1)
+            niveles.append(r)
+            print(f"  {sesiones} sesiones: {r['throughput']['completas']}/{r['throughput']['lecturas']} lecturas "
+                  f"en {r['throughput']['segundos']:.1f}s")
+    finally:
+        server.shutdown()
+        temporal.cleanup()
+
+    _imprimir(niveles)
+    if args.out:
+        _escribir({"tipo": "carga", "meta": _meta(args, "streamlit"), "niveles": niveles}, args.out)
+
+
+if __name__ == "__main__":
+    main()
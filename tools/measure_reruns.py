@@ -0,0 +1,188 @@
+"""
+Mide cuánto cuesta una foto en app.py: CPU del servidor, tiempo y bytes que
+se mandan al navegador por re-ejecución.
+
+Corre app.py con AppTest (modelo real, best.pt en la carpeta) con Gemini y
+ElevenLabs apuntando a tools/fake_upstreams.py. st.camera_input se reemplaza
+por las fotos dadas y se comparan:
+
+  - página completa: toda la app se re-ejecuta (lo que pasaba con cada foto
+    antes de los fragments)
+  - fragment: sólo panel_deteccion, lo que el navegador pide ahora al tomar una foto
+
+AppTest siempre re-ejecuta la página completa; el modo fragment parcha sus
+internos, probados con la versión de Streamlit de STREAMLIT_PROBADO (si
+faltan, la medición para con un mensaje en vez de medir otra cosa).
+
+    python -m tools.measure_reruns --imagenes fotos_cartas/ --runs 20
+    git show HEAD~1:app.py > app_antes.py && python -m tools.measure_reruns --imagenes fotos_cartas/ --app app_antes.py
+"""
+import argparse
+import dataclasses
+import glob
+import os
+import statistics
+import sys
+import time
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+from tools import fake_upstreams
+
+# AppTest no tiene API pública para re-ejecutar sólo un fragment: aquí y en tools/loadtest.py
+# se parchan internos (LocalScriptRunner.run/request_rerun, ScriptRequests._rerun_data,
+# RerunData.fragment_id_queue) que pueden cambiar en cualquier versión. Se probaron con ésta
+STREAMLIT_PROBADO = "1.66"
+
+_medidas = []
+_fragmento = None      # fragment_id a re-ejecutar en lugar de toda la página
+
+
+class _Foto:
+    """Lo mínimo de UploadedFile que usa app.py."""
+
+    def __init__(self, path):
+        self.name = os.path.basename(path)
+        with open(path, "rb") as f:
+            self._data = f.read()
+
+    def getvalue(self):
+        return self._data
+
+
+def _sin_internos(que):
+    return (f"streamlit {st.__version__} no tiene {que}: las re-ejecuciones de un solo fragment usan "
+            f"internos de AppTest probados con streamlit {STREAMLIT_PROBADO} (pip install 'streamlit=={STREAMLIT_PROBADO}.*')")
+
+
+def verificar_internos(*extra):
+    """
+    Para con un mensaje claro si esta versión de Streamlit ya no tiene los
+    internos que se parchan (`extra`: (descripción, bool) de quien llama).
+    """
+    from streamlit.testing.v1 import local_script_runner
+
+    faltan = [f"LocalScriptRunner.{n}" for n in ("run", "request_rerun", "forward_msgs")
+              if not callable(getattr(LocalScriptRunner, n, None))]
+    rerun_data = getattr(local_script_runner, "RerunData", None)
+    if not (dataclasses.is_dataclass(rerun_data)
+            and "fragment_id_queue" in {f.name for f in dataclasses.fields(rerun_data)}):
+        faltan.append("RerunData.fragment_id_queue")
+    faltan += [que for que, ok in extra if not ok]
+    if faltan:
+        raise SystemExit(_sin_internos(", ".join(faltan)))
+    if ".".join(st.__version__.split(".")[:2]) != STREAMLIT_PROBADO:
+        print(f"⚠️ streamlit {st.__version__}: los internos que se parchan se probaron con {STREAMLIT_PROBADO}",
+              file=sys.stderr)
+
+
+def forzar_fragment(runner, fragment_id):
+    """Convierte el rerun que `runner` ya tiene pendiente en uno de sólo `fragment_id`."""
+    peticiones = getattr(runner, "_requests", None)
+    pendiente = getattr(peticiones, "_rerun_data", None)
+    if pendiente is None:
+        raise RuntimeError(_sin_internos("ScriptRunner._requests._rerun_data"))
+    peticiones._rerun_data = dataclasses.replace(pendiente, fragment_id_queue=[fragment_id])
+
+
+def _instrumentar():
+    verificar_internos()
+    run_original = LocalScriptRunner.run
+    rerun_original = LocalScriptRunner.request_rerun
+
+    def run(self, *args, **kwargs):
+        cpu0, t0 = time.process_time(), time.perf_counter()
+        tree = run_original(self, *args, **kwargs)
+        msgs = self.forward_msgs()
+        _medidas.append({
+            "cpu_ms": (time.process_time() - cpu0) * 1000.0,
+            "wall_ms": (time.perf_counter() - t0) * 1000.0,
+            "bytes": sum(m.ByteSize() for m in msgs),
+            "deltas": sum(1 for m in msgs if m.HasField("delta")),
+            "fragment_ids": {m.delta.fragment_id for m in msgs if m.HasField("delta") and m.delta.fragment_id},
+        })
+        return tree
+
+    def request_rerun(self, rerun_data):
+        ok = rerun_original(self, rerun_data)
+        if _fragmento is not None:
+            # Se junta con el rerun completo que AppTest ya pidió: la cola se fuerza en la petición pendiente
+            forzar_fragment(self, _fragmento)
+        return ok
+
+    LocalScriptRunner.run = run
+    LocalScriptRunner.request_rerun = request_rerun
+
+
+def _imagenes(rutas):
+    out = []
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            out += sorted(p for ext in ("jpg", "jpeg", "png") for p in glob.glob(os.path.join(ruta, f"*.{ext}")))
+        else:
+            out += sorted(glob.glob(ruta))
+    return out
+
+
+def _resumen(nombre, medidas):
+    print(f"{nombre:16}{statistics.median(m['cpu_ms'] for m in medidas):>10.1f}"
+          f"{statistics.median(m['wall_ms'] for m in medidas):>10.1f}"
+          f"{statistics.mean(m['bytes'] for m in medidas) / 1024:>10.1f}"
+          f"{statistics.mean(m['deltas'] for m in medidas):>9.1f}")
+
+
+def main():
+    global _fragmento
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--imagenes", nargs="+", required=True, help="fotos de cartas (archivos, carpetas o globs)")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--app", default="app.py")
+    args = parser.parse_args()
+
+    fotos = [_Foto(p) for p in _imagenes(args.imagenes)]
+    if not fotos:
+        parser.error("no encontré imágenes")
+
+    server, url = fake_upstreams.start(retrasos=fake_upstreams.Retrasos(gemini_first_ms=0, tts_first_ms=0))
+    os.environ["GEMINI_BASE_URL"] = os.environ["ELEVENLABS_BASE_URL"] = url
+    # Carga bloqueante: aquí se miden las fotos, no el arranque (ver tools/medir_arranque.py)
+    os.environ.setdefault("MODELO_EN_FONDO", "0")
+    _instrumentar()
+    actual = [fotos[0]]
+    st.camera_input = lambda *a, **k: actual[0]
+
+    at = AppTest.from_file(os.path.abspath(args.app), default_timeout=300)
+    at.secrets["GEMINI_API_KEY"] = at.secrets["ELEVENLABS_API_KEY"] = "fake"
+    at.run()            # arranque: carga el modelo y los recursos compartidos
+    if at.exception:
+        raise SystemExit(f"app.py falló: {at.exception[0].message}")
+    fragmentos = _medidas[-1]["fragment_ids"]
+    if len(fragmentos) > 1:
+        raise SystemExit(f"esperaba a lo más un fragment en la página, encontré {len(fragmentos)}")
+
+    def medir(n):
+        _medidas.clear()
+        for i in range(n):
+            actual[0] = fotos[i % len(fotos)]
+            at.session_state["cartas_vistas"] = []      # cada foto captura a lo más una carta
+            at.run()
+        return list(_medidas)
+
+    completa = medir(args.runs)
+    fragment = None
+    if fragmentos:      # una versión de app.py sin fragments sólo tiene el modo completo
+        _fragmento = fragmentos.pop()
+        fragment = medir(args.runs)
+    server.shutdown()
+
+    print(f"{len(fotos)} fotos, {args.runs} re-ejecuciones por modo (mediana de CPU y tiempo, promedio de bytes)")
+    print(f"{'':16}{'CPU ms':>10}{'tiempo ms':>10}{'KB':>10}{'deltas':>9}")
+    _resumen("página completa", completa)
+    if fragment:
+        _resumen("fragment", fragment)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Mide el arranque en frío de app.py: cuánto tarda la primera página y cuánto
+la primera detección, cada medición en un proceso nuevo (imports, modelo y
+cachés de Streamlit desde cero).
+
+Cada proceso corre app.py con AppTest (modelo real, best.pt en la carpeta;
+Gemini y ElevenLabs contra tools/fake_upstreams.py):
+
+  1. primera ejecución sin foto         -> primera página
+  2. a los --espera-s, una foto         -> primera detección (si el modelo
+     aún no está listo, esa ejecución lo espera)
+
+y reporta además los hitos de arranque.py (modelo_listo, calentamiento,
+cuánto tardó la primera inferencia en sí). Se comparan la carga en segundo
+plano (MODELO_EN_FONDO=1) y la bloqueante (=0), o dos versiones de app.py.
+
+    python -m tools.medir_arranque --imagen fotos_cartas/gallo.jpg --repeticiones 3
+    python -m tools.medir_arranque --imagen foto.jpg --espera-s 2      # alguien que tarda 2 s en tomar la foto
+    git show HEAD~1:app.py > app_antes.py && python -m tools.medir_arranque --imagen foto.jpg --app app_antes.py
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MODOS = {"fondo": {"MODELO_EN_FONDO": "1"}, "bloqueante": {"MODELO_EN_FONDO": "0"}}
+
+
+def _hijo(args):
+    """Una medición (en este proceso, que debe ser nuevo). Imprime una línea JSON."""
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    from tools import fake_upstreams
+    from tools.measure_reruns import _Foto
+
+    server, url = fake_upstreams.start(retrasos=fake_upstreams.Retrasos(gemini_first_ms=0, tts_first_ms=0))
+    os.environ["GEMINI_BASE_URL"] = os.environ["ELEVENLABS_BASE_URL"] = url
+    foto = [None]
+    st.camera_input = lambda *a, **k: foto[0]
+    at = AppTest.from_file(os.path.abspath(args.app), default_timeout=300)
+    at.secrets["GEMINI_API_KEY"] = at.secrets["ELEVENLABS_API_KEY"] = "fake"
+    sdks_antes = {m for m in ("google.genai", "elevenlabs") if m in sys.modules}
+
+    t0 = time.perf_counter()
+    at.run()
+    primera_pagina = time.perf_counter() - t0
+    if at.exception:
+        raise SystemExit(f"app.py falló: {at.exception[0].message}")
+    sdks = sorted(m for m in ("google.genai", "elevenlabs") if m in sys.modules and m not in sdks_antes)
+
+    time.sleep(args.espera_s)
+    foto[0] = _Foto(args.imagen)
+    t1 = time.perf_counter()
+    at.run()
+    fin = time.perf_counter()
+    server.shutdown()
+
+    try:
+        import arranque
+        hitos = arranque.reporte()
+    except ImportError:         # una versión de app.py sin arranque.py
+        hitos = {}
+    print(json.dumps({
+        "primera_pagina_ms": round(primera_pagina * 1000.0, 1),
+        "foto_ms": round((fin - t1) * 1000.0, 1),
+        "primera_deteccion_s": round(fin - t0, 3),
+        "sdks_en_primera_pagina": sdks,
+        "cartas": at.session_state["cartas_vistas"],
+        "hitos": hitos,
+    }, ensure_ascii=False))
+
+
+def _medir(args, env_extra):
+    env = dict(os.environ, **env_extra)
+    cmd = [sys.executable, "-m", "tools.medir_arranque", "--hijo", "--imagen", args.imagen,
+           "--app", args.app, "--espera-s", str(args.espera_s)]
+    out = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    lineas = [l for l in out.stdout.splitlines() if l.startswith("{")]
+    if out.returncode or not lineas:
+        raise SystemExit(f"la medición falló:\n{out.stderr[-2000:]}")
+    return json.loads(lineas[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--imagen", required=True, help="foto de una carta")
+    parser.add_argument("--app", default="app.py")
+    parser.add_argument("--repeticiones", type=int, default=3, help="procesos por modo")
+    parser.add_argument("--espera-s", type=float, default=0.0, help="segundos entre la primera página y la foto")
+    parser.add_argument("--modos", nargs="+", choices=sorted(MODOS), default=["fondo", "bloqueante"])
+    parser.add_argument("--hijo", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.hijo:
+        _hijo(args)
+        return
+
+    print(f"{args.app}, {args.repeticiones} procesos por modo, foto a los {args.espera_s:.1f}s (medianas)")
+    print(f"{'modo':12}{'página ms':>11}{'foto ms':>10}{'detección s':>13}{'modelo s':>10}{'1a inferencia ms':>18}  SDKs en la 1a página")
+    for modo in args.modos:
+        medidas = [_medir(args, MODOS[modo]) for _ in range(args.repeticiones)]
+        med = lambda f: statistics.median(f(m) for m in medidas)
+        hitos = [m["hitos"] for m in medidas]
+        modelo_s = statistics.median(h["modelo_listo_s"] for h in hitos) if all("modelo_listo_s" in h for h in hitos) else None
+        inferencia = (statistics.median(h["primera_deteccion_ms"] for h in hitos)
+                      if all("primera_deteccion_ms" in h for h in hitos) else None)
+        print(f"{modo:12}{med(lambda m: m['primera_pagina_ms']):>11.0f}{med(lambda m: m['foto_ms']):>10.0f}"
+              f"{med(lambda m: m['primera_deteccion_s']):>13.2f}"
+              f"{modelo_s if modelo_s is not None else float('nan'):>10.2f}"
+              f"{inferencia if inferencia is not None else float('nan'):>18.0f}"
+              f"  {', '.join(medidas[0]['sdks_en_primera_pagina']) or '-'}")
+        if any(not m["cartas"] for m in medidas):
+            print(f"  ⚠️ {modo}: alguna foto no detectó carta")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Verifica que una respuesta vacía de Gemini (bloqueada por el filtro de
+seguridad, sin candidatos) nunca llegue al almacén de narrativas: si se
+guardara, cada lectura de esa tercia saldría sin texto y sin voz.
+
+Contra tools/fake_upstreams.py con --vacia-rate 1 y con los SDK reales, se
+arma cada camino como lo hace app.py (Upstream + Carrera + NarrativeStore):
+
+  1. completa:        generar_con_gemini -> RespuestaVacia, gana la local
+  2. streaming:       stream_con_gemini + primer_pedazo -> RespuestaVacia, gana la local
+  3. streaming tarde: la vacía llega después del deadline -> no se guarda
+  4. almacén:         NarrativeStore.add rechaza "" y sólo espacios; get no sirve
+                      las vacías que ya estuvieran guardadas
+
+    python -m tools.narrativa_vacia
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from google import genai
+
+from narrativa_local import Carrera
+from narrative_store import NarrativeStore, triple_key
+from oraculo import RespuestaVacia, generar_con_gemini, prediccion_fallback, primer_pedazo, stream_con_gemini
+from tools import fake_upstreams
+from upstream import Upstream
+
+CARTAS = ("La Sirena", "El Gallo", "La Muerte")
+
+
+def completa(gemini, upstream, carrera, store):
+    texto, fuente = carrera.correr(
+        lambda: upstream.call(generar_con_gemini, gemini, *CARTAS),
+        lambda: prediccion_fallback(*CARTAS),
+        al_llegar_tarde=lambda tarde: store.add(*CARTAS, tarde),
+    )
+    if fuente == "remota":
+        store.add(*CARTAS, texto)
+    return texto, fuente
+
+
+def streaming(gemini, upstream, carrera, store):
+    stream = upstream.stream(stream_con_gemini, gemini, *CARTAS)
+    primero, fuente = carrera.correr(
+        lambda: primer_pedazo(stream),
+        lambda: prediccion_fallback(*CARTAS),
+        al_llegar_tarde=lambda tarde: store.add(*CARTAS, tarde + "".join(stream)),
+    )
+    if fuente == "remota":
+        store.add(*CARTAS, primero + "".join(stream))
+    return primero, fuente
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gemini-first-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    retrasos = fake_upstreams.Retrasos(gemini_first_ms=args.gemini_first_ms, gemini_chunk_ms=1.0, vacia_rate=1.0)
+    server, url = fake_upstreams.start(retrasos=retrasos)
+    gemini = genai.Client(api_key="fake", http_options={"base_url": url})
+    upstream = Upstream("gemini", deadline_s=5.0, retries=0)
+    fallas = []
+
+    def revisar(nombre, ok, detalle=""):
+        print(f"  {'✓' if ok else '✗'} {nombre}{f': {detalle}' if detalle else ''}")
+        if not ok:
+            fallas.append(nombre)
+
+    with tempfile.TemporaryDirectory(prefix="narrativa-vacia-") as carpeta:
+        store = NarrativeStore(os.path.join(carpeta, "narrativas.sqlite"))
+        carrera = Carrera(deadline_s=2.0)
+        try:
+            generar_con_gemini(gemini, *CARTAS)
+            revisar("generar_con_gemini levanta RespuestaVacia", False, "regresó sin error")
+        except RespuestaVacia:
+            revisar("generar_con_gemini levanta RespuestaVacia", True)
+
+        for nombre, camino in (("completa", completa), ("streaming", streaming)):
+            texto, fuente = camino(gemini, upstream, carrera, store)
+            revisar(f"{nombre}: gana la local", fuente == "local_error" and bool(texto.strip()), f"fuente {fuente}")
+            revisar(f"{nombre}: nada en el almacén", store.get(*CARTAS) is None)
+
+        # Deadline más corto que el primer pedazo: la respuesta (vacía) llega tarde
+        tarde = Carrera(deadline_s=args.gemini_first_ms / 1000.0 / 5)
+        texto, fuente = streaming(gemini, upstream, tarde, store)
+        time.sleep(args.gemini_first_ms / 1000.0 * 4)
+        revisar("streaming tarde: gana la local", fuente == "local_deadline", f"fuente {fuente}")
+        revisar("streaming tarde: nada en el almacén", store.get(*CARTAS) is None)
+
+        revisar("add rechaza \"\" y sólo espacios", not store.add(*CARTAS, "") and not store.add(*CARTAS, " \n\t"))
+        # Una vacía que una versión anterior sí guardó
+        with sqlite3.connect(store.path) as conn:
+            conn.execute("INSERT INTO variants (key, idx, text, created) VALUES (?, 0, '', ?)",
+                         (triple_key(*CARTAS), time.time()))
+        revisar("get no sirve las vacías guardadas", store.get(*CARTAS) is None)
+        revisar("add guarda texto normal", store.add(*CARTAS, "Uy, se ve que la Sirena...") and bool(store.get(*CARTAS)))
+    server.shutdown()
+
+    print(f"carrera: {carrera.stats()} | tarde: {tarde.stats()} | upstream: {upstream.stats()['errors']} errores")
+    print("OK" if not fallas else f"FALLA: {', '.join(fallas)}")
+    sys.exit(1 if fallas else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+from collections import namedtuple
+
+import numpy as np
+
+# Lo que ve el resto del programa de cada track (copia inmutable, segura entre hilos)
+TrackState = namedtuple("TrackState", "id box cls_id conf stable_id detections")
+
+
+def iou_matrix(a, b):
+    """IoU entre todas las cajas xyxy de `a` (N,4) contra `b` (M,4) -> (N,M)."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(br - tl, 0, None).prod(axis=2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(axis=1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+class _Track:
+    def __init__(self, track_id, box, cls_id, conf, stabilizer):
+        self.id = track_id
+        self.box = box.astype(np.float32)
+        self.velocity = np.zeros(4, dtype=np.float32)   # px por frame, por coordenada
+        self.cls_id = cls_id
+        self.conf = conf
+        self.stabilizer = stabilizer
+        self.misses = 0             # corridas del detector seguidas sin encontrarlo
+        self.detections = 0
+        self.frames_since_detect = 0
+        self._observe(cls_id, conf)
+
+    def _observe(self, cls_id, conf):
+        self.stabilizer.update(cls_id, conf)
+        self.detections += 1
+
+    def advance(self):
+        """Modelo de velocidad constante: mueve la caja un frame."""
+        self.box += self.velocity
+        self.frames_since_detect += 1
+
+    def correct(self, box, cls_id, conf, smoothing):
+        # La velocidad se mide contra la posición predicha, repartida en los frames sin detector
+        steps = max(self.frames_since_detect, 1)
+        measured = (box - (self.box - self.velocity * steps)) / steps
+        self.velocity = smoothing * self.velocity + (1.0 - smoothing) * measured
+        self.box = box.astype(np.float32)
+        self.cls_id = cls_id
+        self.conf = conf
+        self.misses = 0
+        self.frames_since_detect = 0
+        self._observe(cls_id, conf)
+
+    def miss(self):
+        self.misses += 1
+        self.stabilizer.update(None, 0.0)
+
+    def state(self):
+        return TrackState(self.id, tuple(float(v) for v in self.box), self.cls_id, self.conf,
+                          self.stabilizer.stable, self.detections)
+
+
+class CardTracker:
+    """
+    Tracker ligero de varias cartas: asociación por IoU + velocidad constante.
+
+    - `update(xyxy, confs, clss)` en los frames donde sí corrió YOLO.
+    - `predict()` en los frames que se saltan: las cajas avanzan con su velocidad.
+
+    Cada track tiene su propio estabilizador (ver stabilizer.py), así que cada
+    carta en la mesa se confirma por separado y mantiene su id.
+    """
+
+    def __init__(self, stabilizer_factory, iou_threshold=0.3, max_misses=3, velocity_smoothing=0.5):
+        self.stabilizer_factory = stabilizer_factory
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.velocity_smoothing = velocity_smoothing
+        self.tracks = []
+        self._next_id = 1
+
+    def predict(self):
+        for t in self.tracks:
+            t.advance()
+        return self.states()
+
+    def update(self, xyxy, confs, clss):
+        for t in self.tracks:
+            t.advance()
+
+        xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        boxes = np.array([t.box for t in self.tracks], dtype=np.float32).reshape(-1, 4)
+        ious = iou_matrix(boxes, xyxy)
+
+        # Asociación greedy: primero los pares con más traslape
+        matched_t, matched_d = set(), set()
+        if ious.size:
+            order = np.argsort(-ious, axis=None)
+            for flat in order:
+                ti, di = divmod(int(flat), ious.shape[1])
+                if ious[ti, di] < self.iou_threshold:
+                    break
+                if ti in matched_t or di in matched_d:
+                    continue
+                matched_t.add(ti)
+                matched_d.add(di)
+                self.tracks[ti].correct(xyxy[di], int(clss[di]), float(confs[di]), self.velocity_smoothing)
+
+        for ti, t in enumerate(self.tracks):
+            if ti not in matched_t:
+                t.miss()
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+
+        for di in range(len(xyxy)):
+            if di not in matched_d:
+                self.tracks.append(_Track(self._next_id, xyxy[di], int(clss[di]), float(confs[di]),
+                                          self.stabilizer_factory()))
+                self._next_id += 1
+
+        return self.states()
+
+    def states(self):
+        return [t.state() for t in self.tracks]
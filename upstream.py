@@ -0,0 +1,317 @@
+"""
+Capa de resiliencia para las APIs externas (Gemini, ElevenLabs).
+
+Cada servicio es un `Upstream` que envuelve las llamadas bloqueantes del SDK con:
+  - deadline por llamada (el SDK sigue con su propio timeout HTTP por debajo)
+  - reintentos con backoff exponencial y jitter, limitados por un presupuesto
+    (a lo más `ratio` reintentos por llamada original, para no amplificar una caída)
+  - hedging opcional: si la llamada tarda más que el p95 observado se lanza un
+    duplicado y se usa la primera respuesta que llegue
+  - circuit breaker: tras varias fallas seguidas se falla de inmediato
+    (`CircuitOpen`) durante `reset_s`, y quien llama usa su fallback
+  - histograma de latencias para logs/métricas
+
+    gemini = Upstream("gemini", deadline_s=12, retries=2, hedge=True)
+    texto = gemini.call(generar_con_gemini, client, c1, c2, c3)
+"""
+import bisect
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import httpx
+
+# Límites (ms) de las cubetas del histograma, estilo Prometheus
+LATENCY_BUCKETS_MS = (25, 50, 75, 100, 150, 250, 400, 600, 1000, 1500, 2500, 4000, 6000, 10000, 16000, 32000)
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class CircuitOpen(Exception):
+    """El breaker está abierto: el servicio falló demasiado y no se intenta."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """La llamada (con reintentos) no terminó antes de su deadline."""
+
+
+def status_code(exc):
+    """Código HTTP de una excepción de google-genai (`code`), ElevenLabs (`status_code`) o httpx."""
+    for attr in ("code", "status_code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def is_retryable(exc):
+    """Fallas transitorias: red, timeouts, 429 y 5xx. Un 400/401 no mejora reintentando."""
+    if isinstance(exc, (httpx.TransportError, TimeoutError, ConnectionError)):
+        return True
+    return status_code(exc) in RETRYABLE_STATUS
+
+
+class LatencyHistogram:
+    """Histograma acumulado de latencias (ms) con cubetas fijas; los percentiles se interpolan."""
+
+    def __init__(self, buckets_ms=LATENCY_BUCKETS_MS):
+        self.bounds = tuple(buckets_ms)
+        self._counts = [0] * (len(self.bounds) + 1)    # la última es +Inf
+        self._lock = threading.Lock()
+        self.count = 0
+        self.sum_ms = 0.0
+
+    def observe(self, ms):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.bounds, ms)] += 1
+            self.count += 1
+            self.sum_ms += ms
+
+    def percentile(self, q):
+        with self._lock:
+            counts, total = list(self._counts), self.count
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for i, n in enumerate(counts):
+            if n and seen + n >= rank:
+                lo = self.bounds[i - 1] if i else 0.0
+                hi = self.bounds[i] if i < len(self.bounds) else self.bounds[-1] * 2
+                return lo + (hi - lo) * (rank - seen) / n
+            seen += n
+        return float(self.bounds[-1])
+
+    def buckets(self):
+        """[(límite_ms, cuenta acumulada)], terminando en (inf, total)."""
+        with self._lock:
+            counts = list(self._counts)
+        out, acc = [], 0
+        for bound, n in zip(self.bounds + (float("inf"),), counts):
+            acc += n
+            out.append((bound, acc))
+        return out
+
+
+class RetryBudget:
+    """
+    Cada llamada original deposita `ratio` fichas y cada reintento (o hedge) gasta una.
+    `min_per_s` deja algunos reintentos aunque haya poco tráfico.
+    """
+
+    def __init__(self, ratio=0.2, min_per_s=1.0, max_tokens=10.0):
+        self.ratio = ratio
+        self.min_per_s = min_per_s
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._last) * self.min_per_s)
+        self._last = now
+
+    def deposit(self):
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            self._refill()
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+
+class CircuitBreaker:
+    """closed -> (failure_threshold fallas seguidas) -> open -> (reset_s) -> half_open -> 1 prueba."""
+
+    def __init__(self, failure_threshold=5, reset_s=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_s = reset_s
+        self.state = "closed"
+        self.trips = 0
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_s:
+                self.state, self._probing = "half_open", False
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._probing:
+                self._probing = True            # sólo una llamada de prueba a la vez
+                return True
+            return False
+
+    def record(self, ok):
+        with self._lock:
+            if ok:
+                self.state, self._failures, self._probing = "closed", 0, False
+                return
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.trips += 1
+                self.state, self._opened_at, self._probing = "open", time.monotonic(), False
+
+
+class Upstream:
+    def __init__(self, name, deadline_s=15.0, retries=2, backoff_s=0.25, hedge=False, hedge_min_ms=200.0,
+                 hedge_min_samples=20, breaker=None, budget=None, max_workers=16):
+        self.name = name
+        self.deadline_s = deadline_s
+        self.retries = retries
+        self.backoff_s = backoff_s
+        self.hedge = hedge
+        self.hedge_min_ms = hedge_min_ms
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker()
+        self.budget = budget or RetryBudget()
+        self.latency = LatencyHistogram()            # por llamada, con reintentos
+        self.attempt_latency = LatencyHistogram()    # por intento exitoso: de aquí sale el umbral del hedge
+        # Las llamadas corren en este pool para poder abandonarlas al vencer el deadline
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"upstream-{name}")
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.retried = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.rejected = 0
+        self.deadlines = 0
+
+    def _count(self, attr, n=1):
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + n)
+
+    def _hedge_after_s(self):
+        if not self.hedge or self.attempt_latency.count < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_ms, self.attempt_latency.percentile(0.95)) / 1000.0
+
+    def _attempt(self, fn, args, kwargs, deadline, on_discard):
+        """Un intento (con su posible hedge). Regresa el resultado o levanta la excepción del intento."""
+        t0 = time.monotonic()
+        futures = [self._pool.submit(fn, *args, **kwargs)]
+        hedge_after = self._hedge_after_s()
+        if hedge_after is not None:
+            done, _ = wait(futures, timeout=min(hedge_after, max(0.0, deadline - time.monotonic())))
+            if not done and time.monotonic() < deadline and self.budget.withdraw():
+                self._count("hedges")
+                futures.append(self._pool.submit(fn, *args, **kwargs))
+
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for fut in done:
+                if fut.exception() is not None:
+                    error = fut.exception()
+                    continue
+                if fut is not futures[0]:
+                    self._count("hedge_wins")
+                self.attempt_latency.observe((time.monotonic() - t0) * 1000.0)
+                for other in pending:   # la otra copia se abandona; si llega a terminar se descarta
+                    if on_discard is not None:
+                        other.add_done_callback(lambda f: f.exception() is None and on_discard(f.result()))
+                return fut.result()
+
+        if error is not None and not pending:
+            raise error
+        for fut in pending:
+            if on_discard is not None:
+                fut.add_done_callback(lambda f: f.exception() is None and on_discard(f.result()))
+        raise DeadlineExceeded(f"{self.name}: sin respuesta en {self.deadline_s:.1f}s")
+
+    def call(self, fn, *args, on_discard=None, **kwargs):
+        """
+        Corre `fn(*args, **kwargs)` con deadline, reintentos, hedging y breaker.
+        `on_discard(resultado)` se llama con las respuestas de hedges perdedores
+        (p. ej. para cerrar un stream). Levanta CircuitOpen, DeadlineExceeded o
+        la última excepción de `fn`.
+        """
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise CircuitOpen(f"{self.name}: circuito abierto")
+        self._count("calls")
+        self.budget.deposit()
+
+        t0 = time.monotonic()
+        deadline = t0 + self.deadline_s
+        attempt = 0
+        while True:
+            try:
+                result = self._attempt(fn, args, kwargs, deadline, on_discard)
+            except DeadlineExceeded:
+                self._count("deadlines")
+                self._count("errors")
+                self.breaker.record(False)
+                raise
+            except Exception as e:
+                retryable = is_retryable(e)
+                sleep_s = random.uniform(0, self.backoff_s * 2 ** attempt)     # full jitter
+                if (retryable and attempt < self.retries and time.monotonic() + sleep_s < deadline
+                        and self.budget.withdraw()):
+                    attempt += 1
+                    self._count("retried")
+                    time.sleep(sleep_s)
+                    continue
+                self._count("errors")
+                # Un 4xx es culpa de la petición, no del servicio: no abre el circuito
+                self.breaker.record(not retryable)
+                raise
+            self.latency.observe((time.monotonic() - t0) * 1000.0)
+            self.breaker.record(True)
+            return result
+
+    def stream(self, fn, *args, **kwargs):
+        """
+        Como call() para funciones que regresan un iterador (p. ej. stream_con_gemini):
+        el deadline, los reintentos y el hedge cubren hasta el primer elemento;
+        el resto se entrega tal cual llega.
+        """
+        def first():
+            it = iter(fn(*args, **kwargs))
+            return next(it, None), it
+
+        def discard(result):
+            close = getattr(result[1], "close", None)
+            if close is not None:
+                close()
+
+        head, it = self.call(first, on_discard=discard)
+        if head is None:
+            return
+        yield head
+        yield from it
+
+    def stats(self):
+        with self._lock:
+            out = {k: getattr(self, k) for k in
+                   ("calls", "errors", "retried", "hedges", "hedge_wins", "rejected", "deadlines")}
+        out.update({
+            "breaker": self.breaker.state,
+            "breaker_trips": self.breaker.trips,
+            "latency_ms_p50": round(self.latency.percentile(0.50), 1),
+            "latency_ms_p95": round(self.latency.percentile(0.95), 1),
+            "latency_ms_p99": round(self.latency.percentile(0.99), 1),
+        })
+        return out
+
+
+def pooled_httpx_client(timeout_s=30.0, connect_s=5.0, max_connections=20, keepalive=10):
+    """httpx.Client con keep-alive para compartir entre sesiones (una conexión TLS viva por host)."""
+    return httpx.Client(
+        timeout=httpx.Timeout(timeout_s, connect=connect_s),
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=keepalive),
+    )
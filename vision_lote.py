@@ -0,0 +1,475 @@
+"""
+Modo por lotes de Vision.py: re-evaluar videos grabados y carpetas de fotos
+sin cámara ni ventana, a todo lo que dé la máquina.
+
+  archivos -> decode (hilo lector + pool de hilos para fotos) -> cola acotada
+           -> lotes de --lote frames -> Detector.predict_batch
+           -> estabilizador por fuente -> JSONL o Parquet
+
+Una fila por frame: fuente, archivo, frame, t (segundos, sólo videos),
+ancho/alto, detecciones (carta, cls, conf, caja en píxeles), la más segura y
+la etiqueta estable. El estabilizador es el de Vision.py y empieza de cero en
+cada fuente: cada video, y cada carpeta de fotos tomada en orden de nombre,
+es una secuencia. No hay tracking, motion gate ni ROI: aquí todo frame pasa
+por el modelo.
+
+Con --procesos N los archivos se reparten en N shards balanceados por tamaño;
+cada proceso carga su modelo, escribe su parte y al final se juntan en --out.
+--shard i/N corre sólo una parte (p. ej. repartido en varias máquinas).
+
+    python Vision.py grabaciones/*.mp4 --out detecciones.jsonl
+    python Vision.py dataset/ --out detecciones.parquet --lote 16 --procesos 4
+    python Vision.py "videos/**/*.mp4" --shard 0/2 --out parte0.jsonl    # otra máquina: --shard 1/2
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import cv2
+
+from config_captura import make_card_stabilizer
+from detector import Detector
+from pipeline import StageStats
+import Vision
+
+VIDEO_EXT = (".mp4", ".avi", ".mov", ".mkv", ".webm", ".m4v", ".mpg", ".mpeg")
+IMAGE_EXT = (".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff")
+PARQUET_EXT = (".parquet", ".pq")
+PARQUET_FILAS = 2048        # filas por row group al escribir Parquet
+
+# Un frame decodificado. `fuente` es la secuencia a la que pertenece (el video o la carpeta de fotos)
+Frame = namedtuple("Frame", "fuente archivo indice t img")
+
+
+# =========================
+# ENTRADAS
+# =========================
+def _es_video(ruta):
+    return ruta.lower().endswith(VIDEO_EXT)
+
+
+def _es_imagen(ruta):
+    return ruta.lower().endswith(IMAGE_EXT)
+
+
+def _de_carpeta(carpeta):
+    archivos = []
+    for raiz, dirs, nombres in os.walk(carpeta):
+        dirs.sort()
+        archivos += [os.path.join(raiz, n) for n in sorted(nombres)]
+    return archivos
+
+
+def listar(rutas):
+    """Videos y fotos de archivos, carpetas (recursivo) o globs (`**` incluido), sin repetidos y en orden."""
+    vistos, archivos = set(), []
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            candidatos = _de_carpeta(ruta)
+        elif glob.has_magic(ruta):
+            candidatos = []
+            for r in sorted(glob.glob(ruta, recursive=True)):
+                candidatos += _de_carpeta(r) if os.path.isdir(r) else [r]
+        else:
+            candidatos = [ruta]
+        for r in candidatos:
+            if (_es_video(r) or _es_imagen(r)) and r not in vistos:
+                vistos.add(r)
+                archivos.append(r)
+    return archivos
+
+
+def repartir(archivos, n):
+    """
+    `n` shards balanceados por bytes (el más grande al shard más vacío).
+    Las fotos de una misma carpeta van juntas para no partir su secuencia;
+    dentro de cada shard se conserva el orden original.
+    """
+    grupos = {}
+    for i, ruta in enumerate(archivos):
+        llave = ruta if _es_video(ruta) else os.path.dirname(ruta)
+        grupos.setdefault(llave, []).append(i)
+    peso = {llave: sum(os.path.getsize(archivos[i]) for i in idx) for llave, idx in grupos.items()}
+
+    shards = [[] for _ in range(n)]
+    carga = [0] * n
+    for llave in sorted(grupos, key=lambda k: (-peso[k], k)):
+        destino = carga.index(min(carga))
+        shards[destino] += grupos[llave]
+        carga[destino] += peso[llave]
+    return [[archivos[i] for i in sorted(idx)] for idx in shards]
+
+
+# =========================
+# DECODE
+# =========================
+def _leer_video(ruta, cada):
+    cap = cv2.VideoCapture(ruta)
+    if not cap.isOpened():
+        print(f"[LOTE] no pude abrir el video {ruta}", file=sys.stderr)
+        return
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    try:
+        indice = 0
+        while True:
+            # grab() avanza sin convertir el frame; sólo se decodifica a BGR uno de cada `cada`
+            if not cap.grab():
+                break
+            if indice % cada == 0:
+                ok, img = cap.retrieve()
+                if not ok:
+                    break
+                yield Frame(ruta, ruta, indice, round(indice / fps, 3) if fps else None, img)
+            indice += 1
+    finally:
+        cap.release()
+
+
+def _frames(archivos, pool, en_vuelo, cada):
+    """
+    Frames en orden. Las fotos se decodifican en `pool` con hasta `en_vuelo`
+    lecturas adelantadas; los videos se leen en orden (el decoder de FFmpeg ya
+    usa varios hilos por su cuenta).
+    """
+    pendientes = deque()        # (fuente, archivo, indice, future)
+    indices = {}                # carpeta -> siguiente índice de foto
+
+    def sacar():
+        fuente, archivo, indice, futuro = pendientes.popleft()
+        img = futuro.result()
+        if img is None:
+            print(f"[LOTE] no pude leer {archivo}", file=sys.stderr)
+            return None
+        return Frame(fuente, archivo, indice, None, img)
+
+    for ruta in archivos:
+        if _es_video(ruta):
+            while pendientes:
+                frame = sacar()
+                if frame is not None:
+                    yield frame
+            yield from _leer_video(ruta, cada)
+            continue
+        carpeta = os.path.dirname(ruta)
+        indice = indices.get(carpeta, 0)
+        indices[carpeta] = indice + 1
+        pendientes.append((carpeta, ruta, indice, pool.submit(cv2.imread, ruta, cv2.IMREAD_COLOR)))
+        while len(pendientes) >= en_vuelo:
+            frame = sacar()
+            if frame is not None:
+                yield frame
+    while pendientes:
+        frame = sacar()
+        if frame is not None:
+            yield frame
+
+
+def _en_hilo(gen, maxsize):
+    """Corre el generador `gen` en un hilo aparte detrás de una cola acotada (el decode no espera al modelo)."""
+    cola = queue.Queue(maxsize)
+    stop = threading.Event()
+    fin = object()
+    error = []
+
+    def productor():
+        try:
+            for item in gen:
+                while not stop.is_set():
+                    try:
+                        cola.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+                if stop.is_set():
+                    return
+        except Exception as e:
+            error.append(e)
+        finally:
+            while not stop.is_set():
+                try:
+                    cola.put(fin, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+
+    hilo = threading.Thread(target=productor, name="lote-decode", daemon=True)
+    hilo.start()
+    try:
+        while True:
+            item = cola.get()
+            if item is fin:
+                break
+            yield item
+        if error:
+            raise error[0]
+    finally:
+        stop.set()
+
+
+def _lotes(items, n):
+    lote = []
+    for item in items:
+        lote.append(item)
+        if len(lote) == n:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+# =========================
+# SALIDA
+# =========================
+class _EscritorJSONL:
+    def __init__(self, ruta):
+        self._f = sys.stdout if ruta == "-" else open(ruta, "w", encoding="utf-8")
+
+    def escribir(self, fila):
+        self._f.write(json.dumps(fila, ensure_ascii=False) + "\n")
+
+    def cerrar(self):
+        if self._f is not sys.stdout:
+            self._f.close()
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("para escribir Parquet instala pyarrow (pip install pyarrow) o usa --out *.jsonl")
+    return pa, pq
+
+
+def _esquema(pa):
+    deteccion = pa.struct([
+        ("carta", pa.string()),
+        ("cls", pa.int32()),
+        ("conf", pa.float32()),
+        ("caja", pa.list_(pa.float32(), 4)),
+    ])
+    return pa.schema([
+        ("fuente", pa.string()),
+        ("archivo", pa.string()),
+        ("frame", pa.int64()),
+        ("t", pa.float64()),
+        ("ancho", pa.int32()),
+        ("alto", pa.int32()),
+        ("detecciones", pa.list_(deteccion)),
+        ("mejor", pa.string()),
+        ("mejor_conf", pa.float32()),
+        ("estable", pa.string()),
+    ])
+
+
+class _EscritorParquet:
+    def __init__(self, ruta):
+        self._pa, pq = _pyarrow()
+        self._schema = _esquema(self._pa)
+        self._writer = pq.ParquetWriter(ruta, self._schema)
+        self._filas = []
+
+    def escribir(self, fila):
+        self._filas.append(fila)
+        if len(self._filas) >= PARQUET_FILAS:
+            self._vaciar()
+
+    def _vaciar(self):
+        if self._filas:
+            self._writer.write_table(self._pa.Table.from_pylist(self._filas, schema=self._schema))
+            self._filas = []
+
+    def cerrar(self):
+        self._vaciar()
+        self._writer.close()
+
+
+def abrir_escritor(ruta):
+    """Parquet si `ruta` termina en .parquet/.pq; si no, JSONL ("-" = stdout)."""
+    if ruta.lower().endswith(PARQUET_EXT):
+        return _EscritorParquet(ruta)
+    return _EscritorJSONL(ruta)
+
+
+def juntar(partes, ruta):
+    """Concatena las salidas de cada shard en `ruta` y borra las partes."""
+    if ruta.lower().endswith(PARQUET_EXT):
+        pa, pq = _pyarrow()
+        with pq.ParquetWriter(ruta, _esquema(pa)) as writer:
+            for parte in partes:
+                writer.write_table(pq.read_table(parte))
+    else:
+        with open(ruta, "wb") as out:
+            for parte in partes:
+                with open(parte, "rb") as f:
+                    shutil.copyfileobj(f, out)
+    for parte in partes:
+        os.remove(parte)
+
+
+# =========================
+# PROCESO
+# =========================
+def _fila(frame, dets, detector, best_id, best_conf, stable_id):
+    h, w = frame.img.shape[:2]
+    return {
+        "fuente": frame.fuente,
+        "archivo": frame.archivo,
+        "frame": frame.indice,
+        "t": frame.t,
+        "ancho": w,
+        "alto": h,
+        "detecciones": [
+            {"carta": detector.label(c), "cls": c, "conf": round(float(conf), 4),
+             "caja": [round(float(v), 1) for v in box]}
+            for box, conf, c in zip(dets.xyxy, dets.conf, dets.cls.tolist())
+        ],
+        "mejor": detector.label(best_id),
+        "mejor_conf": None if best_conf is None else round(best_conf, 4),
+        "estable": detector.label(stable_id),
+    }
+
+
+def procesar(detector, archivos, escritor, lote=8, hilos=4, en_vuelo=32, cada=1, etiqueta="lote"):
+    """Corre todos los frames de `archivos` por el modelo y escribe una fila por frame. Regresa un resumen."""
+    names = detector.names
+    stats = StageStats(etiqueta)
+    fuente_actual, stabilizer = None, None
+    fuentes = frames = 0
+    inferencia_s = 0.0
+    t0 = last_report = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="lote-imread") as pool:
+        for grupo in _lotes(_en_hilo(_frames(archivos, pool, en_vuelo, cada), maxsize=lote * 4), lote):
+            t_inf = time.perf_counter()
+            resultados = detector.predict_batch([f.img for f in grupo])
+            inferencia_s += time.perf_counter() - t_inf
+
+            for frame, dets in zip(grupo, resultados):
+                if frame.fuente != fuente_actual:
+                    fuente_actual, stabilizer = frame.fuente, make_card_stabilizer(names)
+                    fuentes += 1
+                best_id, best_conf, _ = detector.best(dets)
+                stable_id = stabilizer.update(best_id, best_conf or 0.0)
+                escritor.escribir(_fila(frame, dets, detector, best_id, best_conf, stable_id))
+                stats.tick()
+            frames += len(grupo)
+
+            now = time.perf_counter()
+            if now - last_report >= Vision.STATS_EVERY_S:
+                print(f"[LOTE] {stats} | {frames} frames, {fuentes} fuentes | "
+                      f"modelo {inferencia_s * 1000.0 / frames:.1f} ms/frame", file=sys.stderr)
+                last_report = now
+
+    segundos = time.perf_counter() - t0
+    return {
+        "frames": frames,
+        "fuentes": fuentes,
+        "segundos": round(segundos, 3),
+        "fps": round(frames / segundos, 2) if segundos else 0.0,
+        "modelo_ms_por_frame": round(inferencia_s * 1000.0 / frames, 2) if frames else 0.0,
+    }
+
+
+def _detector(args):
+    # dynamic: los backends exportados necesitan batch variable (el último lote puede venir incompleto)
+    return Detector(args.model, args.backend, args.imgsz, args.conf, args.iou, args.device,
+                    int8=Vision.INT8, calib_dir=Vision.CALIB_DIR, dynamic=True)
+
+
+def _correr_shard(args, archivos, out, etiqueta, hilos_modelo=None):
+    """Un shard completo en este proceso: carga el modelo, procesa y escribe `out`."""
+    if hilos_modelo:
+        # Con varios procesos, cada uno se queda con su parte de los núcleos
+        cv2.setNumThreads(hilos_modelo)
+        try:
+            import torch
+            torch.set_num_threads(hilos_modelo)
+        except ImportError:
+            pass
+    detector = _detector(args)
+    escritor = abrir_escritor(out)
+    try:
+        return procesar(detector, archivos, escritor, lote=args.lote, hilos=args.hilos,
+                        en_vuelo=args.en_vuelo, cada=args.cada, etiqueta=etiqueta)
+    finally:
+        escritor.cerrar()
+
+
+def _parte(out, i, n):
+    base, ext = os.path.splitext(out)
+    return f"{base}.shard{i}de{n}{ext}"
+
+
+def _shard(texto):
+    try:
+        i, n = (int(x) for x in texto.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("usa i/N, p. ej. 0/4")
+    if not 0 <= i < n:
+        raise argparse.ArgumentTypeError("se necesita 0 <= i < N")
+    return i, n
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="Vision.py", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("entradas", nargs="+", help="videos, fotos, carpetas o globs")
+    parser.add_argument("--out", default="-", help="salida .jsonl o .parquet (- = JSONL a stdout)")
+    parser.add_argument("--model", default=Vision.MODEL_PATH)
+    parser.add_argument("--backend", default=Vision.BACKEND)
+    parser.add_argument("--imgsz", type=int, default=Vision.IMGSZ)
+    parser.add_argument("--conf", type=float, default=Vision.CONF)
+    parser.add_argument("--iou", type=float, default=Vision.IOU)
+    parser.add_argument("--device", default=Vision.DEVICE)
+    parser.add_argument("--lote", type=int, default=8, help="frames por llamada al modelo")
+    parser.add_argument("--hilos", type=int, default=4, help="hilos de decode de fotos por proceso")
+    parser.add_argument("--en-vuelo", type=int, default=32, help="fotos decodificándose por adelantado")
+    parser.add_argument("--cada", type=int, default=1, help="en videos, procesar 1 de cada N frames")
+    parser.add_argument("--procesos", type=int, default=1, help="shards en paralelo en esta máquina")
+    parser.add_argument("--shard", type=_shard, help="i/N: procesar sólo el shard i de N")
+    args = parser.parse_args(argv)
+
+    archivos = listar(args.entradas)
+    if args.shard:
+        i, n = args.shard
+        archivos = repartir(archivos, n)[i]
+    if not archivos:
+        parser.error("no encontré videos ni fotos")
+    if args.procesos > 1 and args.out == "-":
+        parser.error("con --procesos hace falta --out (cada proceso escribe su parte)")
+
+    t0 = time.perf_counter()
+    if args.procesos <= 1:
+        resumenes = [_correr_shard(args, archivos, args.out, "lote")]
+    else:
+        shards = [s for s in repartir(archivos, args.procesos) if s]
+        partes = [_parte(args.out, i, len(shards)) for i in range(len(shards))]
+        hilos_modelo = max(1, (os.cpu_count() or 1) // len(shards))
+        # spawn en todas las plataformas: el modelo se carga en cada hijo y nada se hereda a medias de un fork
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=len(shards), mp_context=ctx) as pool:
+            futuros = [pool.submit(_correr_shard, args, s, p, f"shard{i}", hilos_modelo)
+                       for i, (s, p) in enumerate(zip(shards, partes))]
+            resumenes = [f.result() for f in futuros]
+        juntar(partes, args.out)
+    segundos = time.perf_counter() - t0
+
+    frames = sum(r["frames"] for r in resumenes)
+    print(f"[LOTE] {len(archivos)} archivos, {frames} frames en {segundos:.1f}s = {frames / segundos:.1f} fps"
+          + (f" ({args.procesos} procesos: " + ", ".join(f"{r['fps']:.1f}" for r in resumenes) + " fps c/u)"
+             if len(resumenes) > 1 else "")
+          + f" | modelo {max(r['modelo_ms_por_frame'] for r in resumenes):.1f} ms/frame", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()